@@ -67,15 +67,38 @@ class Assignment(CanvasEntity):
                                                                    % (ANSI.format(u"Assignment", formatting=u"assignment"),
                                                                       self.name)
 
+    def html_needs_update(self, html_path):
+        """
+        Returns True if the HTML description page is not present locally or, according to the SyncState database, the
+        assignment has changed on the server since it was last synced
+
+        html_path : string | The path of the local HTML page
+        """
+        if not os.path.exists(html_path):
+            return True
+
+        sync_state = self.get_sync_state()
+        if sync_state is None:
+            return False
+
+        record = sync_state.get(u"assignment", self.id, html_path)
+        if record is None:
+            # Pages synced before the SyncState database was introduced are adopted
+            sync_state.record(u"assignment", self.id, html_path, updated_at=self.assignment_info.get(u"updated_at"))
+            return False
+
+        return record[u"updated_at"] != self.assignment_info.get(u"updated_at")
+
     def make_html(self):
-        """ Create the main HTML description page of the assignment """
+        """ Create the main HTML description page of the assignment if not present or changed on the server """
 
         # Create URL pointing to Canvas live version of the assignment
         url = self.settings.domain + u"/courses/%s/assignments/%s" % (self.get_parent().get_parent().get_id(),
                                                                       self.get_id())
 
-        if not os.path.exists(self.sync_path + self.name + u".html"):
-            with io.open(self.sync_path + self.name + u".html", u"w", encoding=u"utf-8") as out_file:
+        html_path = self.sync_path + self.name + u".html"
+        if self.html_needs_update(html_path):
+            with io.open(html_path, u"w", encoding=u"utf-8") as out_file:
                 out_file.write(u"<h1><strong>%s</strong></h1>" % self.name)
                 out_file.write(u"<big><a href=\"%s\">Click here to "
                                u"open the live page in Canvas</a></big>" % url)
@@ -83,22 +106,30 @@ class Assignment(CanvasEntity):
                 out_file.write(self.assignment_info.get(u"description")
                                or u"No description")
 
-    def add_files(self):
+            if self.get_sync_state() is not None:
+                self.get_sync_state().record(u"assignment", self.id, html_path,
+                                             updated_at=self.assignment_info.get(u"updated_at"))
+
+    def add_files(self, files_info=None):
         """
         Add all files that can be found in the description of the
         assignment to the list of children and sync
+
+        files_info : dict | A dictionary of information on the linked items stored under their API url.
+                            Information on items not in the dictionary is looked up in the indices of files
+                            and pages of the course or downloaded.
         """
+        files_info = files_info or {}
+
         # Get file URLs pointing to Canvas items
-        try:
-            canvas_file_urls = re.findall(r'data-api-endpoint=\"(.*?)\"',
-                                          self.assignment_info.get(u"description") or u"")
-        except:
-            canvas_file_urls = []
+        canvas_file_urls = helpers.find_api_endpoints(self.assignment_info.get(u"description"))
 
         # Download information on all found files and add File objects
         # to the children
         for url in canvas_file_urls:
-            file_info = self.api.download_item_information(url)
+            file_info = files_info.get(url)
+            if file_info is None:
+                file_info = self.get_course().get_item_information(url)
 
             if u'display_name' in file_info:
                 item = File(file_info, parent=self)
@@ -148,8 +179,7 @@ class Assignment(CanvasEntity):
         self.add_files()
         self.make_html()
 
-        for file in self:
-            file.sync()
+        self.sync_children()
 
     def show(self):
         """ Show the folder hierarchy by printing every level """
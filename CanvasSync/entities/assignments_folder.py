@@ -32,7 +32,7 @@ class AssignmentsFolder(CanvasEntity):
         """
         Constructor method, initializes base CanvasEntity class
 
-        assignments_info : dict   | A list of dictionaries of information on all Canvas assignments object under a course
+        assignments_info : iter   | An iterable of dictionaries of information on all Canvas assignments object under a course
         parent           : object | The parent object, a Course object
         """
 
@@ -85,8 +85,7 @@ class AssignmentsFolder(CanvasEntity):
 
         self.add_assignments()
 
-        for child in self:
-            child.sync()
+        self.sync_children()
 
     def show(self):
         """ Show the folder hierarchy by printing every level """
@@ -0,0 +1,368 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+async_synchronizer.py, CanvasEntity class
+
+The AsyncSynchronizer class is an asyncio based alternative to the Synchronizer class. It builds the exact same
+hierarchy of CanvasEntity objects and thus produces the same on-disk layout, but instead of propagating a blocking
+sync call down through the hierarchy it walks the tree with coroutines. All courses, modules, folders and assignments
+are processed concurrently, so hundreds of metadata requests and file downloads may be in flight on a single thread
+through an AsyncInstructureApi object.
+
+The information downloaded by the coroutines is handed to the regular add_* methods of the CanvasEntity objects, which
+then initialize the child objects without contacting the server themselves.
+
+Within a course, Modules and the AssignmentsFolder are completed before the 'Files' Folder is walked, as the Folder
+uses the files found in these to build its black list of duplicates.
+
+Work that blocks, such as file downloads, writing HTML pages, linking files from the BlobStore and reading or writing
+the SyncState database, is run in the pool of threads of the AsyncInstructureApi object, see run_blocking.
+
+An entity that could not be synced, e.g. because a request failed after all retries, is reported as failed without
+stopping the sync of its siblings, see CanvasEntity.report_failure.
+
+The AsyncSynchronizer requires the optional aiohttp dependency.
+"""
+
+# Future imports
+from __future__ import print_function
+
+# Inbuilt modules
+import asyncio
+import os
+import time
+
+# Third party
+from six import text_type
+
+# CanvasSync modules
+from CanvasSync.entities.synchronizer import Synchronizer
+from CanvasSync.entities.file import File
+from CanvasSync.entities.page import Page
+from CanvasSync.entities.linked_file import LinkedFile
+from CanvasSync.entities.sub_header import SubHeader
+from CanvasSync.entities.folder import Folder
+from CanvasSync.utilities.async_instructure_api import AsyncInstructureApi
+from CanvasSync.utilities import helpers
+from CanvasSync.utilities.link_policy import LinkedFileRejected
+
+
+class AsyncSynchronizer(Synchronizer):
+    def __init__(self, settings, api):
+        """
+        Constructor method, initializes the base Synchronizer class and the AsyncInstructureApi object
+
+        settings : object | A Settings object, has top-level sync path attribute
+        api      : object | An InstructureApi object, used by the CanvasEntity objects if information is missing
+        """
+        Synchronizer.__init__(self, settings=settings, api=api)
+
+        self.async_api = AsyncInstructureApi(settings)
+
+        # Limits the number of simultaneous downloads, initialized in the event loop
+        self.download_semaphore = None
+
+        # asyncio Lock objects held while a file is linked from or downloaded to the BlobStore, stored under the key
+        # of the file, see File.download
+        self.store_locks = {}
+
+    def sync(self):
+        """
+        1) Adding all Courses objects to the list of children
+        2) Synchronize all children objects concurrently in an asyncio event loop
+        """
+        print(text_type(self))
+
+        self.started_at = time.time()
+        self.open_sync_state()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._sync())
+        finally:
+            loop.run_until_complete(self.async_api.close())
+            loop.close()
+            self.close_sync_state()
+
+        self.print_failures()
+
+    async def _sync(self):
+        """ [PRIVATE] Coroutine adding all Course objects and synchronizing them concurrently """
+        self.download_semaphore = asyncio.Semaphore(self.settings.async_concurrency)
+
+        self.add_courses(await self.async_api.get_courses())
+        if self.start_incremental_sync():
+            self.skip_unchanged_courses(await self._download_activity_stream())
+
+        await asyncio.gather(*[self._report_failures(course, self._sync_course(course)) for course in self])
+
+        await self.run_blocking(self.record_synced_courses)
+
+    async def run_blocking(self, function, *args):
+        """
+        Returns the result of a function doing blocking work, called in a thread, see AsyncInstructureApi.run_blocking
+
+        function : callable | The function to call
+        args     : tuple    | The arguments passed to the function
+        """
+        return await self.async_api.run_blocking(function, *args)
+
+    async def _download_activity_stream(self):
+        """ [PRIVATE] Returns the items of the activity stream needed by an incremental sync, see
+        Synchronizer.download_activity_stream """
+        since = self.get_activity_since()
+        if since is None:
+            return []
+
+        try:
+            return await self.async_api.get_activity_stream(since)
+        except (IOError, ValueError) as e:
+            # A response that is not JSON raises a ValueError
+            self.print_activity_stream_error(e)
+            return None
+
+    @staticmethod
+    async def _report_failures(entity, coroutine):
+        """
+        [PRIVATE] Run a coroutine syncing an entity, reporting the entity as failed if the coroutine raises an IOError
+
+        entity    : object    | The CanvasEntity object synced by the coroutine
+        coroutine : coroutine | The coroutine syncing the entity
+        """
+        try:
+            await coroutine
+        except IOError as e:
+            entity.report_failure(e)
+
+    async def _get_items_info(self, course, urls):
+        """
+        [PRIVATE] Returns a dictionary of information on the items at the specified API urls stored under the url.
+        Files and pages are looked up in the indices of the course, other items are downloaded.
+        Items that could not be downloaded because of an error response are stored as empty dictionaries and will be
+        skipped, an InstructureApiError raised by a failed request is re-raised.
+
+        course : object | The Course object the items belong to
+        urls   : list   | A list of Canvas API urls pointing to items
+        """
+        items_info = {}
+        for url in set(urls):
+            item_info = course.lookup_item_information(url)
+            if item_info is not None:
+                items_info[url] = item_info
+
+        missing = [url for url in set(urls) if url not in items_info]
+        results = await asyncio.gather(*[self.async_api.download_item_information(url) for url in missing],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, IOError):
+                raise result
+        items_info.update({url: (info if isinstance(info, dict) else {}) for url, info in zip(missing, results)})
+
+        return items_info
+
+    async def _sync_course(self, course):
+        """ [PRIVATE] Add all Modules, the AssignmentsFolder and the 'Files' Folder to a Course and sync them """
+        print(text_type(course))
+
+        if not course.to_be_synced or course.unchanged:
+            return
+
+        sync_modules = not list(self.settings.modules_settings.values()) == [False, False, False]
+
+        async def nothing():
+            return None
+
+        async def listing(api_call, **kwargs):
+            try:
+                return await api_call(course.get_id(), strict=True, **kwargs)
+            except IOError:
+                return None
+
+        # The list of all files of the course is used to build the 'Other Files' folder and the index of files
+        list_files = self.settings.flat_file_listing or self.settings.use_file_index
+        list_pages = self.settings.bulk_page_bodies and (sync_modules or self.settings.sync_assignments)
+
+        modules_info, assignments_info, folders_info, files_info, pages_info = await asyncio.gather(
+            self.async_api.get_modules_in_course(course.get_id(), include_items=self.settings.inline_module_items)
+            if sync_modules else nothing(),
+            self.async_api.get_assignments_in_course(course.get_id()) if self.settings.sync_assignments else nothing(),
+            self.async_api.get_folders_in_course(course.get_id()),
+            listing(self.async_api.get_files_in_course) if list_files else nothing(),
+            listing(self.async_api.get_pages_in_course, include_body=True) if list_pages else nothing())
+
+        if list_files:
+            course.set_files_listing(files_info)
+            # The listing as stored by the course, compacted if the 'compact_entities' setting is active
+            files_info = course.get_files_listing()
+        if list_pages:
+            course.set_pages_listing(pages_info)
+
+        if sync_modules:
+            course.add_modules(modules_info)
+
+        if self.settings.sync_assignments:
+            course.add_assignments_folder(assignments_info)
+
+        # Modules and assignments must be completed before the Folder is walked, see module docstring
+        await asyncio.gather(*[self._report_failures(child, self._sync_child(child)) for child in course])
+
+        course.add_files_folder(folders_info, files_info)
+        await asyncio.gather(*[self._report_failures(child, self._sync_folder(child))
+                               for child in course if isinstance(child, Folder)])
+
+    async def _sync_child(self, child):
+        """ [PRIVATE] Sync a Module or AssignmentsFolder child of a Course object """
+        if child.get_identifier_string() == u"module":
+            await self._sync_module(child)
+        elif child.get_identifier_string() == u"assignment_folder":
+            await self._sync_assignments_folder(child)
+
+    async def _sync_module(self, module):
+        """ [PRIVATE] Add all items to a Module or SubHeader object and sync them """
+        print(text_type(module))
+
+        if isinstance(module, SubHeader):
+            items = module.items
+        else:
+            items = module.get_inline_items()
+            if items is None and await self.run_blocking(module.get_snapshot) is not None:
+                items = module.get_snapshot()[u"items"]
+            if items is None:
+                items = await self.async_api.get_items_in_module(module.get_course().get_id(), module.get_id())
+
+        files_info = {}
+        if self.settings.modules_settings[u"Files"]:
+            files_info = await self._get_items_info(module.get_course(),
+                                                    [item[u"url"] for item in items if item[u"type"] == u"File"])
+
+        module.add_items(items=items, files_info=files_info)
+
+        await asyncio.gather(*[self._report_failures(child, self._sync_item(child)) for child in module])
+
+        await self.run_blocking(module.save_snapshot, items)
+
+    async def _sync_item(self, item):
+        """ [PRIVATE] Sync any end point or sub-container object of the hierarchy """
+        if isinstance(item, SubHeader):
+            await self._sync_module(item)
+        elif isinstance(item, File):
+            await self._sync_file(item)
+        elif isinstance(item, Page):
+            await self._sync_page(item)
+        elif isinstance(item, LinkedFile):
+            await self._sync_linked_file(item)
+        else:
+            # ExternalUrl objects need no information from the server
+            await self.run_blocking(item.sync)
+
+    async def _sync_file(self, file):
+        """ [PRIVATE] Download a File object if not already present or changed on the server """
+        if file.locked:
+            file.print_status(u"LOCKED", color=u"red")
+            return
+
+        if await self.run_blocking(file.needs_download):
+            key = file.get_store_key()
+            if key not in self.store_locks:
+                self.store_locks[key] = asyncio.Lock()
+
+            # Other locations of the same file wait for the download and are then linked from the BlobStore
+            async with self.store_locks[key]:
+                if await self.run_blocking(file.link_from_store):
+                    validator = None
+                else:
+                    async with self.download_semaphore:
+                        try:
+                            validator = await self.async_api.download_file(file.file_info[u"url"], file.sync_path,
+                                                                           identity=file.get_download_identity())
+                        except Exception as e:
+                            file.report_failure(e)
+                            return
+                    await self.run_blocking(file.add_to_store)
+            await self.run_blocking(file.record_sync, validator)
+
+        file.print_status(u"SYNCED", color=u"green")
+
+    async def _sync_linked_file(self, linked_file):
+        """ [PRIVATE] Download a LinkedFile object if not already present """
+        if not await self.run_blocking(os.path.exists, linked_file.sync_path):
+            async with self.download_semaphore:
+                try:
+                    await self.async_api.download_linked_file(linked_file.download_url, linked_file.sync_path)
+                except LinkedFileRejected:
+                    linked_file.print_status(u"SKIPPED", color=u"yellow")
+                    return
+                except Exception as e:
+                    linked_file.report_failure(e)
+                    return
+
+        linked_file.print_status(u"SYNCED", color=u"green")
+
+    async def _sync_page(self, page):
+        """ [PRIVATE] Download the HTML body of a Page object and all files linked to in the body """
+        if not page.page_info:
+            page.page_info = page.get_course().lookup_item_information(page.page_item_info[u"url"])
+
+        if page.get_sync_state() is not None and not page.page_info:
+            # The page information is needed to determine if the page changed
+            page.page_info = await self.async_api.download_item_information(page.page_item_info[u"url"])
+
+        needs_download = await self.run_blocking(page.needs_download)
+        if needs_download and not page.page_info:
+            page.page_info = await self.async_api.download_item_information(page.page_item_info[u"url"])
+
+        if page.page_info:
+            files_info = await self._get_items_info(page.get_course(),
+                                                    helpers.find_api_endpoints(page.page_info.get(u"body")))
+            if needs_download:
+                await self.run_blocking(page.make_html, files_info)
+            else:
+                # The HTML page is current, the files linked in it are still synced, see Page.download
+                await self.run_blocking(page.add_linked_files, files_info)
+
+        page.print_status(u"SYNCED", color=u"green")
+
+        for file in page:
+            file.update_path()
+        await asyncio.gather(*[self._report_failures(file, self._sync_item(file)) for file in page])
+
+    async def _sync_assignments_folder(self, assignments_folder):
+        """ [PRIVATE] Add all Assignment objects to the AssignmentsFolder and sync them """
+        print(text_type(assignments_folder))
+
+        assignments_folder.add_assignments()
+        await asyncio.gather(*[self._report_failures(assignment, self._sync_assignment(assignment))
+                               for assignment in assignments_folder])
+
+    async def _sync_assignment(self, assignment):
+        """ [PRIVATE] Add all File and LinkedFile objects to an Assignment object and sync them """
+        print(text_type(assignment))
+
+        urls = helpers.find_api_endpoints(assignment.assignment_info.get(u"description"))
+        assignment.add_files(files_info=await self._get_items_info(assignment.get_course(), urls))
+        await self.run_blocking(assignment.make_html)
+
+        await asyncio.gather(*[self._report_failures(file, self._sync_item(file)) for file in assignment])
+
+    async def _sync_folder(self, folder):
+        """ [PRIVATE] Add all File and sub-Folder objects to a Folder object and sync them """
+        print(text_type(folder))
+
+        folder.set_black_list()
+
+        if folder.listing is not None:
+            # The files and sub-folders are taken from the course-wide listing
+            folder.add_files()
+            folder.add_sub_folders()
+        else:
+            files, folders = await asyncio.gather(self.async_api.get_files_in_folder(folder.get_id()),
+                                                  self.async_api.get_folders_in_folder(folder.get_id()))
+            folder.add_files(files)
+            folder.add_sub_folders(folders)
+
+        await asyncio.gather(*[self._report_failures(child, self._sync_folder(child) if isinstance(child, Folder)
+                                                     else self._sync_file(child))
+                               for child in folder])
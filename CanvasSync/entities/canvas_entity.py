@@ -12,8 +12,13 @@ This object implements basic functionality shared across all entities in CanvasE
 The CanvasEntity class holds information such as ID numbers, names and absolute sync path and the list of child objects.
 It implements various getter-methods used to access information on objects across the CanvasEntities.
 In addition, the object is tied to an identifier string representing what derived class it is tied to.
-This is used for methods such as 'get_course' that will transverse the CanvasEntities hierarchy to find the top
-level course object.
+Each object references the Course object it is located under, so that 'get_course' does not need to traverse the
+CanvasEntities hierarchy.
+
+A sync of a large account may hold hundreds of thousands of objects in memory. The attributes of the base class are
+therefore stored in __slots__ rather than an instance dictionary (the numerous end point classes File, Page, LinkedFile
+and ExternalUrl declare __slots__ as well), names are interned (on Python 3) and the list of children is only created
+when the first child is added.
 
 Any CanvasEntity object may be the parent object.
 
@@ -21,14 +26,22 @@ See developer_info.txt file for more information on the class hierarchy of Canva
 
 """
 
+# Future imports
+from __future__ import print_function
+
 # Inbuilt modules
 import os
+import sys
 
 # CanvasSync module imports
 from CanvasSync.utilities import helpers
+from CanvasSync.utilities.ANSI import ANSI
 
 
 class CanvasEntity(object):
+    __slots__ = ("id", "parent", "identifier", "course", "name", "folder", "api", "settings", "sync_path", "children",
+                 "indent", "synchronizer")
+
     def __init__(self, id_number, name, sync_path, parent=None,
                  folder=True, api=None, settings=None, identifier="",
                  synchronizer=None, add_to_list_of_entities=True):
@@ -48,9 +61,9 @@ class CanvasEntity(object):
         identifier   : string  | A string representing what derived class inherited from this instance of CanvasEntity
         synchronizer : object  | The CanvasSync Synchronizer object
         add_to...    : boolean | A boolean value representing if the instance of the CanvasEntity class should be added to the
-                                 list of entities that the Synchronizer object stores.
-                                 This value is False for items stored in Folder objects as the Synchronizer class
-                                 uses the list of entities to make a black list of files that are already stored
+                                 EntityIndex of its course that the Synchronizer object stores.
+                                 This value is False for items stored in Folder objects as the Folder class
+                                 uses the index of entities to make a black list of files that are already stored
                                  across the hierarchy to avoid duplicates when syncing the 'Files' section - items
                                  within this section should not be taken into account when the black list is made.
         """
@@ -64,8 +77,15 @@ class CanvasEntity(object):
         # Identifier, could be "course"
         self.identifier = identifier
 
+        # The Course object this entity is located under, referenced directly so that it is found without walking up
+        # the hierarchy. None for the Synchronizer object.
+        if identifier == u"course":
+            self.course = self
+        else:
+            self.course = parent.course if parent is not None else None
+
         # CanvasEntity name
-        self.name = name
+        self.name = helpers.intern_string(name)
 
         # Is this a folder or file?
         self.folder = folder
@@ -93,8 +113,9 @@ class CanvasEntity(object):
         self.sync_path = helpers.get_corrected_path(sync_path, parent_path, folder=folder)
 
         # Child objects, that is Entities that are located below this current level in the folder hierarchy
-        # E.g. this list could contain Item objects located under a Module object.
-        self.children = []
+        # E.g. this list could contain Item objects located under a Module object. None until a child is added, as
+        # most entities are end points without children.
+        self.children = None
 
         # Indent level
         if self.parent:
@@ -113,16 +134,16 @@ class CanvasEntity(object):
             self.synchronizer = self.get_parent().get_synchronizer()
 
             if add_to_list_of_entities:
-                # Add CanvasEntity to the list in the Synchronizer object
+                # Add CanvasEntity to the index of its course in the Synchronizer object
                 self.get_synchronizer().add_entity(self, self.get_course().get_id())
 
     def __getitem__(self, item):
         """ Container get-item method can be used to access a specific child object """
-        return self.children[item]
+        return self.get_children()[item]
 
     def __iter__(self):
         """ Iterator method yields all Entities contained by this CanvasEntity """
-        for child in self.children:
+        for child in self.get_children():
             yield child
 
     def __repr__(self):
@@ -131,7 +152,7 @@ class CanvasEntity(object):
 
     def __len__(self):
         """ len() method """
-        return len(self.children)
+        return len(self.get_children())
 
     def __nonzero__(self):
         """ Boolean representation method. Always returns True after initialization. """
@@ -146,17 +167,8 @@ class CanvasEntity(object):
         return self.identifier
 
     def get_course(self):
-        """ Go up one level until the Course object is reached, then return it """
-
-        if self.get_identifier_string() == u"course":
-            return self
-
-        parent = self.parent
-
-        while parent.get_identifier_string().lower() != u"course":
-            parent = parent.get_parent()
-
-        return parent
+        """ Getter method for the Course object this entity is located under """
+        return self.course
 
     def get_name(self):
         """ Getter method for the name """
@@ -166,6 +178,10 @@ class CanvasEntity(object):
         """ Getter method for the Synchronizer object """
         return self.synchronizer
 
+    def get_sync_state(self):
+        """ Getter method for the SyncState object of the Synchronizer, None if not available """
+        return self.get_synchronizer().get_sync_state()
+
     def get_id(self):
         """ Getter method for the ID number """
         return self.id
@@ -187,17 +203,63 @@ class CanvasEntity(object):
         return self.sync_path
 
     def add_child(self, child):
-        """ Add a child object to the list of children """
+        """ Add a child object to the list of children, created when the first child is added """
+        if self.children is None:
+            self.children = []
         self.children.append(child)
 
     def get_children(self):
-        """ Getter method for the list of children """
-        return self.children
+        """ Getter method for the list of children, empty if no child was added """
+        return self.children if self.children is not None else []
 
     def update_path(self):
         """ Update the path to the current parents sync path plus the current file name """
         self.sync_path = self.get_parent().get_path() + self.get_name()
 
+    def sync_children(self):
+        """
+        Synchronize all children objects. A child that could not be synced, e.g. because a request to the Canvas
+        server failed after all retries, is reported as failed and the remaining children are still synced.
+        """
+        for child in self:
+            try:
+                child.sync()
+            except IOError as e:
+                child.report_failure(e)
+
+    def report_failure(self, error, overwrite_previous_line=False):
+        """
+        Report that the entity could not be synced. The failure is printed in place of the status of the entity and
+        listed by the Synchronizer object when the sync is completed.
+
+        error                   : Exception | The error that stopped the sync of the entity
+        overwrite_previous_line : boolean   | Overwrite the DOWNLOADING status line of the entity
+        """
+        self.get_synchronizer().add_failure(self, error)
+
+        if self.folder:
+            print(ANSI.format(u"[FAILED]", formatting=u"red") + u" " * 7 + u"|   " + u"\t" * self.indent + self.name)
+            sys.stdout.flush()
+        else:
+            self.print_status(u"FAILED", color=u"red", overwrite_previous_line=overwrite_previous_line)
+
+    def print_status(self, status, color, overwrite_previous_line=False):
+        """ Print status to console """
+
+        if self.get_synchronizer().get_download_scheduler().is_concurrent():
+            # Status lines of concurrent downloads would overwrite each other, only the final status is printed
+            if status == u"DOWNLOADING":
+                return
+            overwrite_previous_line = False
+
+        if overwrite_previous_line:
+            # Move up one line
+            sys.stdout.write(ANSI.format(u"", formatting=u"lineup"))
+            sys.stdout.flush()
+
+        print(ANSI.format(u"[%s]" % status, formatting=color) + str(self)[len(status) + 2:])
+        sys.stdout.flush()
+
     def _make_folder(self):
         """ Create a folder on the sync path if not already present """
         if not os.path.exists(self.sync_path):
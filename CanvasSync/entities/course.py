@@ -22,6 +22,11 @@ See developer_info.txt file for more information on the class hierarchy of Canva
 # Future imports
 from __future__ import print_function
 
+# Inbuilt modules
+import itertools
+import re
+import threading
+
 # Third party
 from six import text_type
 
@@ -30,6 +35,7 @@ from CanvasSync.entities.canvas_entity import CanvasEntity
 from CanvasSync.entities.module import Module
 from CanvasSync.entities.assignments_folder import AssignmentsFolder
 from CanvasSync.entities.folder import Folder
+from CanvasSync.entities.file import File
 from CanvasSync.utilities.ANSI import ANSI
 from CanvasSync.utilities import helpers
 
@@ -56,6 +62,24 @@ class Course(CanvasEntity):
 
         self.to_be_synced = True if course_name in parent.settings.courses_to_sync else False
 
+        # Set by the Synchronizer if the course has not changed since it was last synced and is not walked during an
+        # incremental sync
+        self.unchanged = False
+
+        # The list of all files of the course, downloaded once when first needed (None if not accessible), and an
+        # index of the files stored under their ID built from it
+        self.files_listing = None
+        self.files_listing_downloaded = False
+        self.file_index = None
+        self.files_lock = threading.RLock()
+
+        # The list of all pages of the course including their HTML bodies, downloaded once when first needed (None if
+        # not accessible), and an index of the pages stored under their URL name built from it
+        self.pages_listing = None
+        self.pages_listing_downloaded = False
+        self.page_index = None
+        self.pages_lock = threading.RLock()
+
         # Initialize base class
         CanvasEntity.__init__(self,
                               id_number=course_id,
@@ -67,44 +91,191 @@ class Course(CanvasEntity):
 
     def __repr__(self):
         """ String representation, overwriting base class method """
-        status = ANSI.format(u"[SYNCED]" if self.to_be_synced else u"[SKIPPED]", formatting=u"green" if self.to_be_synced else u"yellow")
-        return status + u" " * (7 if self.to_be_synced else 6) + u"|   " + u"\t" * self.indent + u"%s: %s" \
-                                                        % (ANSI.format(u"Course", formatting=u"course"), self.name)
+        if self.to_be_synced and self.unchanged:
+            status = ANSI.format(u"[UNCHANGED]", formatting=u"green") + u" " * 4
+        else:
+            status = ANSI.format(u"[SYNCED]" if self.to_be_synced else u"[SKIPPED]", formatting=u"green" if self.to_be_synced else u"yellow")
+            status += u" " * (7 if self.to_be_synced else 6)
+        return status + u"|   " + u"\t" * self.indent + u"%s: %s" % (ANSI.format(u"Course", formatting=u"course"),
+                                                                   self.name)
+
+    def get_updated_at(self):
+        """ Returns the 'updated_at' time stamp of the course or None if not reported by the server """
+        return self.course_info.get(u"updated_at")
 
     def download_modules(self):
-        """ Returns a list of dictionaries representing module objects """
-        return self.api.get_modules_in_course(self.id)
+        """ Yields dictionaries representing module objects, with the items inline if the 'inline_module_items'
+        setting is active """
+        return self.api.get_modules_in_course(self.id, include_items=self.settings.inline_module_items)
+
+    def add_modules(self, modules_info=None):
+        """
+        [HIDDEN]  Method that adds all Module objects to the list of Module objects
 
-    def add_modules(self):
-        """ [HIDDEN]  Method that adds all Module objects to the list of Module objects """
+        modules_info : iter | An iterable of dictionaries representing modules, downloaded if not specified
+        """
+        if modules_info is None:
+            modules_info = self.download_modules()
 
-        # Download list of dictionaries representing modules and add them all to the list of children
-        for position, module_info in enumerate(self.download_modules()):
+        # Add all dictionaries representing modules to the list of children
+        for position, module_info in enumerate(modules_info):
             module = Module(module_info, position+1, parent=self)
             self.add_child(module)
 
     def download_assignemtns(self):
-        """ Return a list of dictionaries representing assignment objects """
+        """ Yields dictionaries representing assignment objects """
         return self.api.get_assignments_in_course(self.id)
 
-    def add_assignments_folder(self):
-        """ Add an AssigmentsFolder object to the children list """
+    def add_assignments_folder(self, assignments_info=None):
+        """
+        Add an AssigmentsFolder object to the children list
+
+        assignments_info : iter | An iterable of dictionaries representing assignments, downloaded if not specified
+        """
+        if assignments_info is None:
+            assignments_info = self.download_assignemtns()
 
-        # Download potential assignments
-        assignments_info_list = self.download_assignemtns()
+        # The stream of potential assignments is peeked to see if it holds at least one assignment
+        assignments_info_stream = iter(assignments_info)
+        first_assignment_info = next(assignments_info_stream, None)
 
-        if len(assignments_info_list) == 0:
+        if first_assignment_info is None:
             return
 
-        assignments = AssignmentsFolder(assignments_info_list, self)
+        assignments_info = itertools.chain([first_assignment_info], assignments_info_stream)
+        assignments = AssignmentsFolder(assignments_info, self)
         self.add_child(assignments)
 
-    def add_files_folder(self):
-        """ Add a SubFolder object representing the files folder of the course """
+    def download_files_listing(self):
+        """
+        Returns a list of dictionaries representing all files of the course, or None if the list could not be
+        downloaded (e.g. the files of the course are not accessible to the user)
+        """
+        try:
+            return list(self.api.get_files_in_course(self.id, strict=True))
+        except IOError:
+            return None
+
+    def get_files_listing(self):
+        """ Returns the list of all files of the course, downloaded on first call. None if not accessible. """
+        with self.files_lock:
+            if not self.files_listing_downloaded:
+                self.set_files_listing(self.download_files_listing())
+            return self.files_listing
+
+    def set_files_listing(self, files):
+        """
+        Set the list of all files of the course, e.g. when downloaded by the AsyncSynchronizer
+
+        files : list | A list of dictionaries representing all files of the course, None if not accessible
+        """
+        if files is not None and self.settings.compact_entities:
+            # The listing is kept along with the course, only the fields used by the File objects are stored
+            files = [File.compact_info(file) for file in files]
+
+        with self.files_lock:
+            self.files_listing = files
+            self.files_listing_downloaded = True
+            self.file_index = None
+
+    def get_file_index(self):
+        """ Returns a dictionary storing information on all files of the course under their ID """
+        with self.files_lock:
+            if self.file_index is None:
+                self.file_index = {file[u"id"]: file for file in self.get_files_listing() or []}
+            return self.file_index
+
+    def download_pages_listing(self):
+        """
+        Returns a list of dictionaries representing all pages of the course including their HTML bodies, or None if
+        the list could not be downloaded (e.g. the pages of the course are not accessible to the user)
+        """
+        try:
+            return list(self.api.get_pages_in_course(self.id, include_body=True, strict=True))
+        except IOError:
+            return None
+
+    def get_pages_listing(self):
+        """ Returns the list of all pages of the course, downloaded on first call. None if not accessible. """
+        with self.pages_lock:
+            if not self.pages_listing_downloaded:
+                self.set_pages_listing(self.download_pages_listing())
+            return self.pages_listing
+
+    def set_pages_listing(self, pages):
+        """
+        Set the list of all pages of the course, e.g. when downloaded by the AsyncSynchronizer
+
+        pages : list | A list of dictionaries representing all pages of the course, None if not accessible
+        """
+        with self.pages_lock:
+            self.pages_listing = pages
+            self.pages_listing_downloaded = True
+            self.page_index = None
+
+    def get_page_index(self):
+        """ Returns a dictionary storing information on all pages of the course under their URL name """
+        with self.pages_lock:
+            if self.page_index is None:
+                self.page_index = {page[u"url"]: page for page in self.get_pages_listing() or []
+                                   if u"body" in page}
+            return self.page_index
+
+    def lookup_item_information(self, url):
+        """
+        Returns a dictionary of information on the Canvas file or page that an API url points to if found in the
+        index of files or pages of the course, None otherwise
+
+        url : string | An API url pointing to a file or page, e.g. '/api/v1/courses/1/files/2'
+        """
+        match = re.search(r"/files/(\d+)", url or u"")
+        if match and self.settings.use_file_index:
+            return self.get_file_index().get(int(match.group(1)))
+
+        match = re.search(r"/courses/%s/pages/([^/?#]+)" % self.id, url or u"")
+        if match and self.settings.bulk_page_bodies:
+            return self.get_page_index().get(match.group(1))
+
+        return None
+
+    def get_item_information(self, url):
+        """
+        Returns a dictionary of information on the item that an API url points to. Files and pages are resolved
+        through the indices of files and pages of the course, other items and items not in the indices are downloaded.
+
+        url : string | An API url pointing to an item, e.g. '/api/v1/courses/1/files/2'
+        """
+        item_info = self.lookup_item_information(url)
+        if item_info is not None:
+            return item_info
+
+        return self.api.download_item_information(url)
+
+    def add_files_folder(self, folders=None, files=None):
+        """
+        Add a SubFolder object representing the files folder of the course
+
+        If the 'flat_file_listing' setting is active, the whole folder hierarchy is built from the list of all folders
+        and the list of all files of the course, instead of downloading the files and sub-folders of each folder. If
+        the list of files could not be downloaded the folders are downloaded one by one instead.
+
+        folders : iter | An iterable of dictionaries representing the folders of the course, downloaded if not specified
+        files   : list | A list of dictionaries representing the files of the course, downloaded if not specified and
+                         the 'flat_file_listing' setting is active. None if the list could not be downloaded.
+        """
 
         # The main file folder should always be the first in the list, but is there a better way to get this initial ID
         # than downloading the entire list of folders??
-        folders = self.api.get_folders_in_course(self.id)
+        if folders is None:
+            folders = self.api.get_folders_in_course(self.id)
+
+        listing = None
+        if self.settings.flat_file_listing:
+            folders = list(folders)
+            if files is None:
+                files = self.get_files_listing()
+            if files is not None:
+                listing = Folder.make_listing(folders, files)
 
         main_folder = None
         for folder in folders:
@@ -112,10 +283,13 @@ class Course(CanvasEntity):
                 main_folder = folder
                 break
 
+        if main_folder is None:
+            return
+
         # Change name of folder
         main_folder[u"name"] = u"Other Files"
 
-        folder = Folder(main_folder, self)
+        folder = Folder(main_folder, self, listing=listing)
         self.add_child(folder)
 
     def walk(self, counter):
@@ -146,7 +320,7 @@ class Course(CanvasEntity):
         """
         print(text_type(self))
 
-        if not self.to_be_synced:
+        if not self.to_be_synced or self.unchanged:
             return
 
         if not list(self.settings.modules_settings.values()) == [False, False, False]:
@@ -159,8 +333,7 @@ class Course(CanvasEntity):
         # Add Various Files folder
         self.add_files_folder()
 
-        for child in self:
-            child.sync()
+        self.sync_children()
 
     def show(self):
         """ Show the folder hierarchy by printing every level """
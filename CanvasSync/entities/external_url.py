@@ -33,6 +33,8 @@ from CanvasSync.utilities.url_shortcut_maker import make_url_shortcut
 
 
 class ExternalUrl(CanvasEntity):
+    __slots__ = ("url_info",)
+
     def __init__(self, url_info, parent):
         """
         Constructor method, initializes base CanvasEntity class and synchronizes the Item (downloads if not downloaded)
@@ -73,7 +75,17 @@ class ExternalUrl(CanvasEntity):
         Synchronize by creating a local URL shortcut file in in at the sync_pat
         ExternalUrl objects have no children objects and represents an end point of a folder traverse.
         """
-        make_url_shortcut(url=self.url_info[u"external_url"], path=self.sync_path)
+        url = self.url_info[u"external_url"]
+
+        # Replace the shortcut if the URL changed since it was last synced
+        sync_state = self.get_sync_state()
+        record = sync_state.get(u"external_url", self.id, self.sync_path) if sync_state is not None else None
+        overwrite = record is not None and record[u"validator"] != url
+
+        shortcut_path = make_url_shortcut(url=url, path=self.sync_path, overwrite=overwrite)
+
+        if sync_state is not None:
+            sync_state.record(u"external_url", self.id, self.sync_path, path=shortcut_path, validator=url)
 
         # As opposed to the File and Page classes we never write the "DOWNLOAD" status as we already have
         # all information needed to create the URL shortcut at this point. Here we just print the SYNCED status
@@ -8,7 +8,15 @@ file, CanvasEntity Class
 
 The File class stores information on files hosted on the Canvas server. It represents an end point in the hierarchy and
 contains no child objects. When the sync method is invoked the file will be downloaded or skipped depending on if it is
-already present in at the sync path.
+already present in at the sync path. Files that changed on the server since they were last synced, as recorded in the
+SyncState database, are downloaded again.
+
+If the BlobStore is enabled by the 'dedup_store' setting, a file already downloaded to another location is linked from
+the store instead of being downloaded again, and a downloaded file is added to the store. The store is only an
+optimization, a file is downloaded normally if it can not be linked.
+
+If the 'compact_entities' setting is active, only the fields of the file information used by the File object are kept
+(see compact_info), as a large sync holds many File objects in memory.
 
 A Module, SubHeader, Folder or Assignment object is the parent object.
 
@@ -21,7 +29,6 @@ from __future__ import print_function
 
 # Inbuilt modules
 import os
-import sys
 
 # Third party
 from six import text_type
@@ -29,9 +36,17 @@ from six import text_type
 from CanvasSync.entities.canvas_entity import CanvasEntity
 from CanvasSync.utilities.ANSI import ANSI
 from CanvasSync.utilities import helpers
+from CanvasSync.utilities.blob_store import BlobStore
 
 
 class File(CanvasEntity):
+    __slots__ = ("file_info", "locked")
+
+    # The fields of the information on a Canvas file object used by the File object and by the listing of files of a
+    # Folder object, see compact_info
+    FIELDS = (u"id", u"uuid", u"display_name", u"url", u"size", u"modified_at", u"updated_at", u"locked_for_user",
+              u"folder_id")
+
     def __init__(self, file_info, parent, add_to_list_of_entities=True):
         """
         Constructor method, initializes base CanvasEntity class
@@ -40,6 +55,9 @@ class File(CanvasEntity):
         parent          : object | The parent object, a Module, SubHeader, Folder or Assignment object
         """
 
+        if parent.get_settings().compact_entities:
+            file_info = self.compact_info(file_info)
+
         self.file_info = file_info
 
         self.locked = self.file_info["locked_for_user"]
@@ -58,47 +76,133 @@ class File(CanvasEntity):
                               identifier=u"file",
                               add_to_list_of_entities=add_to_list_of_entities)
 
+    @classmethod
+    def compact_info(cls, file_info):
+        """
+        Returns a dictionary holding only the FIELDS of a dictionary of information on a Canvas file object. A
+        dictionary that is already compact is returned as is, so that it is shared by the listing of files of the
+        course and all File objects of the file.
+
+        file_info : dict | A dictionary of information on the Canvas file object
+        """
+        return helpers.compact_info(file_info, cls.FIELDS)
+
     def __repr__(self):
         """ String representation, overwriting base class method """
         return u" " * 15 + u"|   " + u"\t" * self.indent + u"%s: %s" % (ANSI.format(u"File",
                                                                                     formatting=u"file"),
                                                                         self.name)
 
-    def download(self):
-        """ Download the file """
-        if os.path.exists(self.sync_path):
+    def get_version(self):
+        """ Returns the time stamp of the last change to the file on the Canvas server """
+        return self.file_info.get(u"modified_at") or self.file_info.get(u"updated_at")
+
+    def get_download_identity(self):
+        """
+        Returns a dictionary identifying the current version of the file. A partial download is only resumed if it
+        was made of a file with the same identity.
+        """
+        return {u"id": self.file_info.get(u"id"),
+                u"size": self.file_info.get(u"size"),
+                u"version": self.get_version()}
+
+    def needs_download(self):
+        """
+        Returns True if the file is not present at the sync path or, according to the SyncState database, has changed
+        on the server since it was last synced
+        """
+        if not os.path.exists(self.sync_path):
+            return True
+
+        sync_state = self.get_sync_state()
+        if sync_state is None:
             return False
 
-        self.print_status(u"DOWNLOADING", color=u"blue")
+        record = sync_state.get(u"file", self.id, self.sync_path)
+        if record is None:
+            # Files synced before the SyncState database was introduced are adopted if they have the expected size
+            size = self.file_info.get(u"size")
+            if size is not None and os.path.getsize(self.sync_path) != size:
+                return True
+
+            self.record_sync()
+            return False
 
-        # Download file payload from server
-        file_data = self.api.download_file_payload(self.file_info[u"url"])
+        return record[u"updated_at"] != self.get_version() or record[u"size"] != self.file_info.get(u"size")
+
+    def record_sync(self, validator=None):
+        """
+        Record the file as synced in the SyncState database
+
+        validator : string | The validator (ETag or Last-Modified header) of the download, if downloaded
+        """
+        sync_state = self.get_sync_state()
+        if sync_state is not None:
+            sync_state.record(u"file", self.id, self.sync_path,
+                              updated_at=self.get_version(),
+                              validator=validator)
+
+    def get_store_key(self):
+        """ Returns the key of the current version of the file in the BlobStore """
+        return BlobStore.get_key(self.file_info)
+
+    def link_from_store(self):
+        """ Place the file at the sync path from the BlobStore if stored there, returns True if placed """
+        blob_store = self.get_synchronizer().get_blob_store()
+        if blob_store is None:
+            return False
 
-        # Write data to file
         try:
-            with open(self.sync_path, u"wb") as out_file:
-                out_file.write(file_data)
+            return blob_store.link(self.get_store_key(), self.sync_path)
+        except (IOError, OSError):
+            return False
 
-        except KeyboardInterrupt as e:
-            # If interrupted mid-writing, delete the corrupted file
-            if os.path.exists(self.sync_path):
-                os.remove(self.sync_path)
+    def add_to_store(self):
+        """ Add the file downloaded to the sync path to the BlobStore, if enabled """
+        blob_store = self.get_synchronizer().get_blob_store()
+        if blob_store is None:
+            return
 
-            # Re-raise, will be catched in CanvasSync.py
-            raise e
+        try:
+            blob_store.add(self.get_store_key(), self.sync_path)
+        except (IOError, OSError):
+            # The file stays at the sync path, it is just not shared
+            pass
 
-        return True
+    def download(self):
+        """
+        Download the file if not present or changed on the server, or link it from the BlobStore if already stored.
+        Returns True or False depending on whether the file was downloaded, or -1 if the download failed.
+        """
+        if not self.needs_download():
+            return False
 
-    def print_status(self, status, color, overwrite_previous_line=False):
-        """ Print status to console """
+        blob_store = self.get_synchronizer().get_blob_store()
+        if blob_store is None:
+            return self.download_payload()
 
-        if overwrite_previous_line:
-            # Move up one line
-            sys.stdout.write(ANSI.format(u"", formatting=u"lineup"))
-            sys.stdout.flush()
+        # Other locations of the same file wait for the download and are then linked from the store
+        with blob_store.get_lock(self.get_store_key()):
+            if self.link_from_store():
+                self.record_sync()
+                return True
+            return self.download_payload()
 
-        print(ANSI.format(u"[%s]" % status, formatting=color) + str(self)[len(status) + 2:])
-        sys.stdout.flush()
+    def download_payload(self):
+        """ Download the file from the Canvas server, see download """
+        self.print_status(u"DOWNLOADING", color=u"blue")
+
+        # Stream the file payload from the server to the sync path, resuming a previously interrupted download
+        try:
+            validator = self.api.download_file(self.file_info[u"url"], self.sync_path,
+                                               identity=self.get_download_identity())
+        except IOError as e:
+            self.report_failure(e, overwrite_previous_line=True)
+            return -1
+        self.add_to_store()
+        self.record_sync(validator)
+
+        return True
 
     def walk(self, counter):
         """ Stop walking, endpoint """
@@ -112,10 +216,17 @@ class File(CanvasEntity):
         Synchronize the file by downloading it from the Canvas server and saving it to the sync path
         If the file has already been downloaded, skip downloading.
         File objects have no children objects and represents an end point of a folder traverse.
+
+        The download is submitted as a job to the download scheduler of the Synchronizer object.
         """
+        self.get_synchronizer().get_download_scheduler().submit(self.sync_payload)
+
+    def sync_payload(self):
+        """ Download job, download the file and print the status """
         if not self.locked:
             was_downloaded = self.download()
-            self.print_status(u"SYNCED", color=u"green", overwrite_previous_line=was_downloaded)
+            if was_downloaded != -1:
+                self.print_status(u"SYNCED", color=u"green", overwrite_previous_line=was_downloaded)
         else:
             self.print_status(u"LOCKED", color=u"red", overwrite_previous_line=False)
 
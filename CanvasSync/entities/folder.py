@@ -29,13 +29,15 @@ from CanvasSync.utilities import helpers
 
 
 class Folder(CanvasEntity):
-    def __init__(self, folder_info, parent, black_list=False):
+    def __init__(self, folder_info, parent, black_list=False, listing=None):
         """
         Constructor method, initializes base Module class and adds all children Folder and/or Item objects to
         the list of children
 
         folder_info     : dict   | A dictionary of information on the Canvas Folder object
         parent          : object | The parent object, a Folder or Course object
+        listing         : dict   | A course-wide listing of folders and files, see make_listing. If specified, the
+                                   files and sub-folders are taken from the listing instead of being downloaded.
         """
 
         self.folder_info = folder_info
@@ -53,6 +55,7 @@ class Folder(CanvasEntity):
                               identifier=u"folder")
 
         self.black_list = black_list
+        self.listing = listing
 
     def __repr__(self):
         """ String representation, overwriting base class method """
@@ -61,23 +64,58 @@ class Folder(CanvasEntity):
                                                                    % (ANSI.format(u"Folder", formatting=u"folder"),
                                                                       self.name)
 
+    @staticmethod
+    def make_listing(folders, files):
+        """
+        Returns a course-wide listing used to build the whole folder hierarchy without contacting the server, a
+        dictionary storing lists of sub-folders under the ID of their parent folder ('folders') and lists of files under
+        the ID of the folder they are located in ('files').
+
+        folders : iter | An iterable of dictionaries representing all folders of the course
+        files   : iter | An iterable of dictionaries representing all files of the course
+        """
+        listing = {u"folders": {}, u"files": {}}
+
+        for folder in folders:
+            listing[u"folders"].setdefault(folder.get(u"parent_folder_id"), []).append(folder)
+        for file in files:
+            listing[u"files"].setdefault(file.get(u"folder_id"), []).append(file)
+
+        return listing
+
     def initialize_black_list(self):
         """
         Some files may have been added to Module or Assignment objects already, so we do not need to store them again
-        This method initializes a list of all file names that exist in the hierarchy of the Course object so far
+        This method initializes a set of the IDs of all files that exist in the hierarchy of the Course object so far
         """
 
-        # Get all entities listed in the Synchronizer object under the course.
-        entities = self.get_synchronizer().get_entities(self.get_course().get_id())
+        # Get the EntityIndex of the entities added to the course in the Synchronizer object
+        index = self.get_synchronizer().get_entity_index(self.get_course().get_id())
 
-        # Get list of names of all the File objects of the entities list
-        black_list = [x.get_id() for x in entities if x.get_identifier_string() == u"file"]
+        # Get set of IDs of all the File objects of the index
+        return index.get_ids(u"file")
+
+    def set_black_list(self):
+        """
+        If avoid duplicated setting is active, initialize black list of files found in Modules and
+        Assignments if it was not passed to the object at initialization.
+        With the BlobStore duplicates are links to the same payload, so no files are skipped.
+        """
+        if not self.settings.avoid_duplicates or self.get_synchronizer().get_blob_store() is not None:
+            self.black_list = set()
+        elif not self.black_list:
+            self.black_list = self.initialize_black_list()
 
-        return black_list
+    def add_files(self, files=None):
+        """
+        Add all files stored by this folder to the list of children
 
-    def add_files(self):
-        """ Add all files stored by this folder to the list of children """
-        files = self.api.get_files_in_folder(self.id)
+        files : iter | An iterable of dictionaries representing the files in the folder, downloaded if not specified
+        """
+        if files is None and self.listing is not None:
+            files = self.listing[u"files"].get(self.id, [])
+        elif files is None:
+            files = self.api.get_files_in_folder(self.id)
 
         for file in files:
             # Skip duplicates if this settings is active
@@ -88,16 +126,23 @@ class Folder(CanvasEntity):
             file = File(file, self, add_to_list_of_entities=False)
             self.add_child(file)
 
-    def add_sub_folders(self):
-        """ Add all sub-folders stored by this folder to the list of children """
-        folders = self.api.get_folders_in_folder(self.id)
+    def add_sub_folders(self, folders=None):
+        """
+        Add all sub-folders stored by this folder to the list of children
+
+        folders : iter | An iterable of dictionaries representing the sub-folders, downloaded if not specified
+        """
+        if folders is None and self.listing is not None:
+            folders = self.listing[u"folders"].get(self.id, [])
+        elif folders is None:
+            folders = self.api.get_folders_in_folder(self.id)
 
         for folder in folders:
             if folder[u"name"] == u"course_image":
                 # Do we really need that course image?
                 continue
 
-            folder = Folder(folder, self, black_list=self.black_list)
+            folder = Folder(folder, self, black_list=self.black_list, listing=self.listing)
             self.add_child(folder)
 
     def walk(self, counter):
@@ -106,12 +151,7 @@ class Folder(CanvasEntity):
         """
         print(text_type(self))
 
-        # If avoid duplicated setting is active, initialize black list of files found in Modules and
-        # Assignments if it was not passed to the object at initialization.
-        if not self.black_list and self.settings.avoid_duplicates:
-            self.black_list = self.initialize_black_list()
-        elif not self.settings.avoid_duplicates:
-            self.black_list = []
+        self.set_black_list()
 
         self.add_files()
         self.add_sub_folders()
@@ -127,18 +167,12 @@ class Folder(CanvasEntity):
         """
         print(text_type(self))
 
-        # If avoid duplicated setting is active, initialize black list of files found in Modules and
-        # Assignments if it was not passed to the object at initialization.
-        if not self.black_list and self.settings.avoid_duplicates:
-            self.black_list = self.initialize_black_list()
-        elif not self.settings.avoid_duplicates:
-            self.black_list = []
+        self.set_black_list()
 
         self.add_files()
         self.add_sub_folders()
 
-        for item in self:
-            item.sync()
+        self.sync_children()
 
     def show(self):
         pass
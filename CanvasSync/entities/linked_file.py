@@ -10,6 +10,9 @@ Canvas entities. Instead, LinkedFile should be initialized with a direct downloa
 However, the LinkedFile is derived from the base entity class and the walk, sync and show methods are implemented
 and should be used in a similar fashion to other CanvasEntities objects.
 
+A file refused by the LinkPolicy object of the API (e.g. too large) is reported as skipped rather than failed, as
+retrying it would not change the outcome.
+
 An Assignment object is the parent object.
 
 See developer_info.txt file for more information on the class hierarchy of CanvasEntities objects.
@@ -21,18 +24,19 @@ from __future__ import print_function
 
 # Inbuilt modules
 import os
-import sys
 
 # Third party modules
-import requests
 from six import text_type
 
 # CanvasSync module imports
 from CanvasSync.entities.canvas_entity import CanvasEntity
 from CanvasSync.utilities.ANSI import ANSI
+from CanvasSync.utilities.link_policy import LinkedFileRejected
 
 
 class LinkedFile(CanvasEntity):
+    __slots__ = ("download_url", "valid_url")
+
     def __init__(self, download_url, parent):
         """
         Constructor method, initializes base CanvasEntity class
@@ -75,17 +79,6 @@ class LinkedFile(CanvasEntity):
     def url_is_valid(self):
         return self.valid_url
 
-    def print_status(self, status, color, overwrite_previous_line=False):
-        """ Print status to console """
-
-        if overwrite_previous_line:
-            # Move up one line
-            sys.stdout.write(ANSI.format(u"", formatting=u"lineup"))
-            sys.stdout.flush()
-
-        print(ANSI.format(u"[%s]" % status, formatting=color) + str(self)[len(status) + 2:])
-        sys.stdout.flush()
-
     def download(self):
         """
         Download the file, returns True or False depecting if the file was downloaded or not. Returns -1 if the file
@@ -96,23 +89,17 @@ class LinkedFile(CanvasEntity):
 
         self.print_status(u"DOWNLOADING", color=u"blue")
 
-        # Attempt to download the file
+        # Attempt to download the file, streaming it to disk and resuming a stalled transfer
         try:
-            response = requests.get(self.download_url)
-        except Exception:
-            # Could not download, catch any exception
-            self.print_status(u"FAILED", u"red", overwrite_previous_line=True)
+            self.api.download_linked_file(self.download_url, self.sync_path)
+        except LinkedFileRejected:
+            self.print_status(u"SKIPPED", color=u"yellow", overwrite_previous_line=True)
             return -1
-
-        # Check for OK 200 HTTP response
-        if not response.status_code == 200:
-            self.print_status(u"FAILED", u"red", overwrite_previous_line=True)
+        except Exception as e:
+            # Could not download, catch any exception
+            self.report_failure(e, overwrite_previous_line=True)
             return -1
 
-        # If here, download was successful, write to disk and print status
-        with open(self.sync_path, u"wb") as out_file:
-            out_file.write(response.content)
-
         return True
 
     def walk(self, counter):
@@ -126,7 +113,13 @@ class LinkedFile(CanvasEntity):
         """
         Attempt to download a file a the url 'download_url' to the path 'path'/filename while printing
         the status using an indent of print_indent to align with the parent object
+
+        The download is submitted as a job to the download scheduler of the Synchronizer object.
         """
+        self.get_synchronizer().get_download_scheduler().submit(self.sync_payload)
+
+    def sync_payload(self):
+        """ Download job, download the file and print the status """
         was_downloaded = self.download()
 
         if was_downloaded != - 1:
@@ -10,6 +10,16 @@ The Module class is the third level CanvasEntity object in the folder hierarchy.
 class and extends its functionality to allow downloading information on Items (files, URLs and HTML pages) as well as
 sub-headers, assignments and files located in the 'Files' section in Canvas.
 
+If the 'module_snapshots' setting is active, the items of a module are stored in the SyncState database along with a
+fingerprint of the module as listed in the list of modules (the number of items, publish state and, if returned
+inline, the IDs and positions of the items). As long as the fingerprint is unchanged the items are rebuilt from the
+snapshot instead of being downloaded. The fingerprint does not cover changes to the files the items point to, so the
+information on the files is not stored in the snapshot but looked up in the index of files of the course or
+downloaded on every sync.
+
+If the 'compact_entities' setting is active, only the fields of the module items used by the Module object and its
+children are kept (see compact_items), which also applies to the items stored in snapshots.
+
 A Course object is the parent object.
 
 See developer_info.txt file for more information on the class hierarchy of CanvasEntities objects.
@@ -19,6 +29,10 @@ See developer_info.txt file for more information on the class hierarchy of Canva
 # Future imports
 from __future__ import print_function
 
+# Inbuilt modules
+import hashlib
+import json
+
 # Third party
 from six import text_type
 
@@ -32,6 +46,11 @@ from CanvasSync.utilities import helpers
 
 
 class Module(CanvasEntity):
+    # The fields of the information on a module item used by the items of a module and its fingerprint, see
+    # compact_items
+    ITEM_FIELDS = (u"id", u"position", u"indent", u"type", u"title", u"content_id", u"url", u"page_url",
+                   u"external_url")
+
     def __init__(self, module_info, module_position, parent, identifier=u"module"):
         """, i
         Constructor method, initializes base CanvasEntity class and adds all children Folder and/or Item objects to the
@@ -44,10 +63,18 @@ class Module(CanvasEntity):
 
         self.module_info = module_info
 
+        # The items returned inline are kept along with the module
+        if parent.get_settings().compact_entities and self.module_info.get(u"items") is not None:
+            self.module_info[u"items"] = self.compact_items(self.module_info[u"items"])
+
         module_id = self.module_info[u"id"]
         module_name = helpers.get_corrected_name(self.module_info[u"name"])
         module_path = parent.get_path() + u"%s - %s" % (module_position, module_name)
 
+        # The snapshot of the module loaded from the SyncState database, see get_snapshot
+        self.snapshot = None
+        self.snapshot_loaded = False
+
         # Initialize base class
         CanvasEntity.__init__(self,
                               id_number=module_id,
@@ -63,9 +90,91 @@ class Module(CanvasEntity):
                                                                    % (ANSI.format(u"Module", formatting=u"module"),
                                                                       self.name))
 
+    def get_inline_items(self):
+        """
+        Returns the list of dictionaries of items returned inline with the module by the server, or None if the items
+        were not included or are incomplete (the server may omit or truncate the items of large modules)
+        """
+        items = self.module_info.get(u"items")
+        if items is None:
+            return None
+
+        items_count = self.module_info.get(u"items_count")
+        if items_count is not None and items_count != len(items):
+            return None
+
+        return items
+
+    @classmethod
+    def compact_items(cls, items):
+        """
+        Returns a list of dictionaries holding only the ITEM_FIELDS of a list of dictionaries of information on module
+        items. Anything else than a list (e.g. an error response) is returned as is.
+
+        items : list | A list of dictionaries of information on module items
+        """
+        if not isinstance(items, list):
+            return items
+        return [helpers.compact_info(item, cls.ITEM_FIELDS) for item in items]
+
+    def get_fingerprint(self):
+        """
+        Returns a fingerprint of the module as listed in the list of modules, it changes when items are added,
+        removed, moved or renamed (the latter two only detected if the items are returned inline)
+        """
+        fields = [self.module_info.get(key) for key in (u"name", u"position", u"items_count", u"published",
+                                                         u"workflow_state", u"unlock_at")]
+        items = [[item.get(key) for key in self.ITEM_FIELDS] for item in self.module_info.get(u"items") or []]
+
+        return hashlib.sha1(json.dumps([fields, items]).encode(u"utf-8")).hexdigest()
+
+    def get_snapshot(self):
+        """
+        Returns a dictionary of the items of the module ('items') as recorded when the module had the same fingerprint,
+        or None. Snapshots are not used if disabled by the
+        'module_snapshots' setting or if a full walk is due, see Synchronizer.start_incremental_sync.
+        """
+        if not self.snapshot_loaded:
+            sync_state = self.get_sync_state()
+            if self.settings.module_snapshots and sync_state is not None \
+                    and not self.get_synchronizer().is_full_walk():
+                self.snapshot = sync_state.get_module_snapshot(self.id, self.get_fingerprint())
+            self.snapshot_loaded = True
+
+        return self.snapshot
+
+    def save_snapshot(self, items):
+        """
+        Store a snapshot of the items of the module in the SyncState database under its fingerprint,
+        unless the items were rebuilt from a snapshot. Called when the module and its sub-headers have been synced.
+
+        items : list | A list of dictionaries of information on the items of the module
+        """
+        sync_state = self.get_sync_state()
+        if not self.settings.module_snapshots or sync_state is None or self.get_snapshot() is not None:
+            return
+
+        # An incomplete list of items, e.g. an error response, is not stored
+        if len(items) != self.module_info.get(u"items_count", len(items)):
+            return
+
+        sync_state.record_module_snapshot(self.id, self.get_fingerprint(), {u"items": items})
+
     def get_item_information(self):
-        """ Returns a dictionary of items from the Canvas server """
-        return self.api.get_items_in_module(self.get_course().get_id(), self.id)
+        """
+        Returns a list of dictionaries of items, as returned inline with the module, from the snapshot of the module or
+        from the Canvas server
+        """
+        items = self.get_inline_items()
+        if items is not None:
+            return items
+
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot[u"items"]
+
+        items = list(self.api.get_items_in_module(self.get_course().get_id(), self.id))
+        return self.compact_items(items) if self.settings.compact_entities else items
 
     def add_sub_header(self, folder_info, folder_position, folder_items):
         """
@@ -84,12 +193,16 @@ class Module(CanvasEntity):
         sub_folder = SubHeader(folder_info, folder_position, parent=self, items=folder_items)
         self.add_child(sub_folder)
 
-    def add_file(self, file_information):
+    def add_file(self, file_information, detailed_file_info=None):
         """
         Method that adds an Item object to the list of children and synchronizes it
-        """
 
-        detailed_file_info = self.api.download_item_information(file_information[u"url"])
+        file_information   : dict | A dictionary of information on the module item representing the file
+        detailed_file_info : dict | A dictionary of information on the file itself, looked up in the index of files
+                                    of the course or downloaded if not specified
+        """
+        if detailed_file_info is None:
+            detailed_file_info = self.get_course().get_item_information(file_information[u"url"])
 
         # Initialize Item object and add to list of children
         item = File(detailed_file_info, self)
@@ -113,19 +226,27 @@ class Module(CanvasEntity):
         url = ExternalUrl(url_information, self)
         self.add_child(url)
 
-    def add_items(self, items=None):
+    def add_items(self, items=None, files_info=None):
         """
         Method that adds all Items under the module to the list of children.
         If the item is a sub-folder it will be added as a Folder object instead.
 
-        items : list | A list of dictionaries of information on items
-                       SubFolders inherit from the Module class and use this feature
+        items      : list | A list of dictionaries of information on items
+                            SubFolders inherit from the Module class and use this feature
+        files_info : dict | A dictionary of detailed file information stored under the API url of the file items.
+                            Information on files not in the dictionary is downloaded when the File object is added.
         """
+        files_info = files_info or {}
+
 
         # If the Folder was initialized with an items dictionary, skip downloading
-        if not items:
+        if items is None:
             items = self.get_item_information()
 
+        # The items are kept by the Page and ExternalUrl objects
+        if self.settings.compact_entities:
+            items = self.compact_items(items)
+
         # Determine which items are in the outer-scope (located in the folder represented by this module) and which
         # items are located in sub-folders under this module.
         items_in_this_scope, sub_folders = helpers.reorganize(items)
@@ -133,7 +254,7 @@ class Module(CanvasEntity):
         # Add all non-sub-folder items to the list of children. Currently, files, HTML pages and URLs are added.
         for item in items_in_this_scope:
             if item[u"type"] == u"File" and self.settings.modules_settings[u"Files"]:
-                self.add_file(item)
+                self.add_file(item, files_info.get(item[u"url"]))
             elif item[u"type"] == u"Page" and self.settings.modules_settings[u"HTML pages"]:
                 self.add_page(item)
             elif item[u"type"] == u"ExternalUrl" and self.settings.modules_settings[u"External URLs"]:
@@ -163,10 +284,11 @@ class Module(CanvasEntity):
         """
         print(text_type(self))
 
-        self.add_items()
+        items = self.get_item_information()
+        self.add_items(items)
 
-        for child in self:
-            child.sync()
+        self.sync_children()
+        self.save_snapshot(items)
 
     def show(self):
         """ Show the folder hierarchy by printing every level """
@@ -9,7 +9,9 @@ page, CanvasEntity Class
 The Page class stores information on HTML pages hosted on the Canvas server. It represents an end point in the hierarchy
 and contains no child objects. When the sync method is invoked the HTML pages will be downloaded or skipped depending on
 if it is already present in at the sync path. The HTML page will be appended with the title of the page along with a
-URL pointing to the live version of the HTML page on the server.
+URL pointing to the live version of the HTML page on the server. Pages that changed on the server since they were last
+synced, as recorded in the SyncState database, are downloaded again. The files linked to in the page are added as
+children whether or not the page changed, so that they are synced (and retried if they failed) on every run.
 
 A Module or SubHeader object is the parent object.
 
@@ -22,7 +24,6 @@ from __future__ import print_function
 
 # Inbuilt modules
 import os
-import sys
 import io
 import re
 
@@ -37,6 +38,8 @@ from CanvasSync.entities.linked_file import LinkedFile
 
 
 class Page(CanvasEntity):
+    __slots__ = ("page_item_info", "page_info")
+
     def __init__(self, page_info, parent):
         """
         Constructor method, initializes base CanvasEntity class
@@ -71,19 +74,34 @@ class Page(CanvasEntity):
                                                                                     formatting=u"page"),
                                                                         self.name)
 
-    def download_linked_files(self, html_body):
+    def download_linked_files(self, html_body, files_info=None):
+        """
+        Add File and LinkedFile objects to the list of children for all files linked to in the HTML body.
+        Returns True if at least one file was found.
+
+        html_body  : string | The HTML body of the page
+        files_info : dict   | A dictionary of information on the linked Canvas files stored under their API url.
+                              Information on files not in the dictionary is looked up in the index of files of the
+                              course or downloaded.
+        """
         sub_files = False
+        files_info = files_info or {}
 
         # Look for files in the HTML body
         # Get file URLs pointing to Canvas items
-        canvas_file_urls = re.findall(r'data-api-endpoint=\"(.*?)\"', html_body or "")
+        canvas_file_urls = helpers.find_api_endpoints(html_body)
 
         # Download information on all found files and add File objects to the children
         for url in canvas_file_urls:
             try:
-                file_info = self.api.download_item_information(url)
+                file_info = files_info.get(url)
+                if file_info is None:
+                    file_info = self.get_course().get_item_information(url)
                 if u'display_name' not in file_info:
                     continue
+            except IOError:
+                # The request failed, report the page as failed rather than silently leaving out the file
+                raise
             except Exception:
                 continue
 
@@ -118,23 +136,87 @@ class Page(CanvasEntity):
         base, tail = os.path.split(self.sync_path)
         self.sync_path = self.sync_path + u"/" + tail
 
+    def get_location(self):
+        """ Returns the sync path of the page before it is pushed down into a sub-folder, identifies the page locally """
+        return self.get_parent().get_path() + self.name
+
+    def needs_download(self):
+        """
+        Returns True if the HTML page is not present locally or, according to the SyncState database, has changed on
+        the server since it was last synced. The page information must be downloaded if the SyncState is used.
+        """
+        sync_state = self.get_sync_state()
+        if sync_state is None:
+            return not os.path.exists(self.sync_path + u".html")
+
+        record = sync_state.get(u"page", self.id, self.get_location())
+        if record is None:
+            # Pages synced before the SyncState database was introduced are adopted, possibly pushed down
+            for html_path in (self.get_location() + u".html",
+                              self.get_location() + u"/" + self.name + u".html"):
+                if os.path.exists(html_path):
+                    self.record_sync(html_path)
+                    return False
+            return True
+
+        return not os.path.exists(record[u"path"]) or record[u"updated_at"] != self.page_info.get(u"updated_at")
+
+    def record_sync(self, html_path):
+        """
+        Record the page as synced in the SyncState database
+
+        html_path : string | The path of the local HTML page
+        """
+        sync_state = self.get_sync_state()
+        if sync_state is not None:
+            sync_state.record(u"page", self.id, self.get_location(),
+                              path=html_path,
+                              updated_at=self.page_info.get(u"updated_at"))
+
     def download(self):
-        """ Download the page """
-        if os.path.exists(self.sync_path + u".html"):
+        """ Download the page if not present or changed on the server """
+        if self.get_sync_state() is not None and not self.page_info:
+            # The page information is needed to determine if the page changed
+            self.page_info = self.get_course().get_item_information(self.page_item_info[u"url"])
+
+        if not self.needs_download():
+            if self.page_info:
+                # The HTML page is current, but the files linked in it are children of the page and are synced on
+                # every run, e.g. to retry a file that could not be downloaded
+                self.add_linked_files()
             return False
 
         # Print download status
         self.print_status(u"DOWNLOADING", color=u"blue")
 
-        # Download additional info and HTML body of the Page object if not already supplied
-        self.page_info = self.api.download_item_information(self.page_item_info[u"url"]) if not self.page_info else self.page_info
+        # Get additional info and HTML body of the Page object from the pages of the course if not already supplied
+        self.page_info = self.get_course().get_item_information(self.page_item_info[u"url"]) if not self.page_info else self.page_info
+
+        self.make_html()
+
+        return True
+
+    def add_linked_files(self, files_info=None):
+        """
+        Add File and LinkedFile objects for all files linked to in the HTML body to the list of children. If files are
+        linked to in the page the page is pushed down into a sub-folder along with the files.
 
-        # Create a HTML page locally and add a link leading to the live version
+        files_info : dict | A dictionary of information on the linked Canvas files stored under their API url
+        """
+        if self.download_linked_files(self.page_info.get(u"body", ""), files_info):
+            self.push_down()
+
+    def make_html(self, files_info=None):
+        """
+        Create a HTML page locally and add a link leading to the live version.
+        If files are linked to in the page the page is pushed down into a sub-folder along with the files.
+
+        files_info : dict | A dictionary of information on the linked Canvas files stored under their API url
+        """
         body = self.page_info.get(u"body", "")
         html_url = self.page_info.get(u"html_url", "")
 
-        if self.download_linked_files(body):
-            self.push_down()
+        self.add_linked_files(files_info)
 
         if not os.path.exists(self.sync_path):
             with io.open(self.sync_path + u".html", u"w", encoding=u"utf-8") as out_file:
@@ -143,17 +225,7 @@ class Page(CanvasEntity):
                 out_file.write(u"<hr>")
                 out_file.write(body or u"")
 
-        return True
-
-    def print_status(self, status, color, overwrite_previous_line=False):
-        """ Print status to console """
-        if overwrite_previous_line:
-            # Move up one line
-            sys.stdout.write(ANSI.format(u"", formatting=u"lineup"))
-            sys.stdout.flush()
-
-        print(ANSI.format(u"[%s]" % status, formatting=color) + str(self)[len(status) + 2:])
-        sys.stdout.flush()
+            self.record_sync(self.sync_path + u".html")
 
     def walk(self, counter):
         """ Stop walking, endpoint """
@@ -174,7 +246,7 @@ class Page(CanvasEntity):
 
         for file in self:
             file.update_path()
-            file.sync()
+        self.sync_children()
 
     def show(self):
         """ Show the folder hierarchy by printing every level """
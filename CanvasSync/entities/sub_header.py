@@ -57,6 +57,14 @@ class SubHeader(Module):
 
         self.items = items
 
+    def get_snapshot(self):
+        """ Returns the snapshot of the parent module, see Module.get_snapshot """
+        return self.get_parent().get_snapshot()
+
+    def save_snapshot(self, items):
+        """ Snapshots are stored by the parent module only """
+        pass
+
     def __repr__(self):
         """ String representation, overwriting base class method """
         status = ANSI.format(u"[SYNCED]", formatting=u"green")
@@ -90,5 +98,4 @@ class SubHeader(Module):
 
         self.add_items(items=self.items)
 
-        for child in self:
-            child.sync()
+        self.sync_children()
@@ -15,22 +15,50 @@ which in turn propagates the signal to all children objects.
 
 The Synchronizer encapsulates a list of children Course objects.
 
+Courses may be synchronized in parallel by a number of threads set by the 'course_workers' setting. The output of
+each course is then collected and printed as one block when the course is completed. The entities added to the
+hierarchy of each course are registered in an EntityIndex object, guarded by a lock as entities of different courses
+are added from different threads.
+
+If the 'incremental_sync' setting is active, only courses that may have changed since they were last completely synced
+are walked. A course may have changed if its 'updated_at' time stamp changed or if the activity stream of the user
+(announcements, discussions, submissions etc.) holds an item of the course updated since. As the activity stream does
+not report every change (e.g. a file added to a module), all courses are walked every 'full_sync_interval' runs, and
+whenever the settings deciding what is synced have changed. Such a full walk also ignores the snapshots of unchanged
+modules, see Module.get_snapshot.
+
 """
 
 # Future imports
 from __future__ import print_function
 
+# Inbuilt modules
+import json
+import sys
+import threading
+import time
+
 # Third party
 from six import text_type
+from six.moves import queue
 
 # CanvasSync modules
 from CanvasSync.entities.course import Course
 from CanvasSync.entities.canvas_entity import CanvasEntity
 from CanvasSync.utilities import helpers
+from CanvasSync.utilities import console
 from CanvasSync.utilities.ANSI import ANSI
+from CanvasSync.utilities.download_scheduler import DownloadScheduler
+from CanvasSync.utilities.sync_state import SyncState
+from CanvasSync.utilities.blob_store import BlobStore
+from CanvasSync.utilities.entity_index import EntityIndex
 
 
 class Synchronizer(CanvasEntity):
+    # The number of seconds subtracted from the start time of a sync when recorded, so that changes are not missed if
+    # the clocks of the Canvas server and the local machine differ
+    CLOCK_SKEW = 600
+
     def __init__(self, settings, api):
         """
         Constructor method, initializes base CanvasEntity class and adds all children
@@ -50,9 +78,29 @@ class Synchronizer(CanvasEntity):
         sync_path = helpers.get_corrected_path(settings.sync_path,
                                                parent_path=False, folder=True)
 
-        # A dictionary to store lists of CanvasEntity objects
-        # added to the hierarchy under a course ID number
+        # A dictionary to store EntityIndex objects of the CanvasEntity
+        # objects added to the hierarchy under a course ID number
         self.entities = {}
+        self.entities_lock = threading.Lock()
+
+        # Download jobs submitted by File and LinkedFile objects are run by this scheduler
+        self.download_scheduler = DownloadScheduler(workers=settings.download_workers,
+                                                    queue_size=settings.download_queue_size)
+
+        # The SyncState database recording what was synced in previous runs and the BlobStore storing each file
+        # payload once, opened by the sync method
+        self.sync_state = None
+        self.blob_store = None
+
+        # A list of (CanvasEntity, error) tuples of entities that could not be synced, see report_failure
+        self.failures = []
+        self.failures_lock = threading.Lock()
+
+        # The time the sync started, whether only courses that may have changed are walked and whether a full walk
+        # not relying on anything recorded by previous runs is due, see start_incremental_sync
+        self.started_at = None
+        self.incremental = False
+        self.full_walk = True
 
         # Initialize base class
         CanvasEntity.__init__(self,
@@ -69,31 +117,220 @@ class Synchronizer(CanvasEntity):
         return u"\n[*] Synchronizing to folder: %s\n" % self.sync_path
 
     def get_entities(self, course_id):
-        """ Getter method for the list of Entities """
-        return self.entities[course_id]
+        """ Getter method for the list of Entities, returns a copy that is safe to iterate while entities are added """
+        return self.get_entity_index(course_id).get_all()
+
+    def get_entity_index(self, course_id):
+        """ Getter method for the EntityIndex object of a course """
+        with self.entities_lock:
+            return self.entities[course_id]
+
+    def get_download_scheduler(self):
+        """ Getter method for the DownloadScheduler object """
+        return self.download_scheduler
+
+    def get_sync_state(self):
+        """ Getter method for the SyncState object, None if not syncing or if disabled by the 'use_sync_state' setting """
+        return self.sync_state
+
+    def get_blob_store(self):
+        """ Getter method for the BlobStore object, None if not syncing or if disabled by the 'dedup_store' setting """
+        return self.blob_store
+
+    def open_sync_state(self):
+        """
+        Open the SyncState database in the top-level sync folder if enabled by the 'use_sync_state' setting, and the
+        BlobStore if enabled by the 'dedup_store' setting (it requires the SyncState database)
+        """
+        if self.settings.use_sync_state and self.sync_state is None:
+            self.sync_state = SyncState.open_in(self.sync_path)
+
+        if self.settings.dedup_store and self.sync_state is not None and self.blob_store is None:
+            self.blob_store = BlobStore.open_in(self.sync_path, self.sync_state)
+
+    def close_sync_state(self):
+        """ Delete the blobs no longer linked from the BlobStore and close the SyncState database """
+        if self.blob_store is not None:
+            self.blob_store.prune()
+            self.blob_store = None
+
+        if self.sync_state is not None:
+            self.sync_state.close()
+            self.sync_state = None
+
+    def get_settings_fingerprint(self):
+        """ Returns a string of the settings deciding what is synced, all courses are walked if it changes """
+        return json.dumps([self.settings.modules_settings,
+                           self.settings.sync_assignments,
+                           self.settings.download_linked,
+                           self.settings.avoid_duplicates,
+                           self.settings.dedup_store,
+                           self.settings.use_nicknames], sort_keys=True)
+
+    def start_incremental_sync(self):
+        """
+        Determine if a full walk is due, after 'full_sync_interval' runs or because the settings changed since the
+        last run. Returns True if only courses that may have changed are walked, that is if the 'incremental_sync'
+        setting is active and no full walk is due.
+        """
+        sync_state = self.get_sync_state()
+        if sync_state is None:
+            return False
+
+        runs = int(sync_state.get_value(u"runs_since_full_walk", 0))
+        self.full_walk = bool(self.settings.full_sync_interval and runs + 1 >= self.settings.full_sync_interval) \
+            or sync_state.get_value(u"settings") != self.get_settings_fingerprint()
+
+        self.incremental = self.settings.incremental_sync and not self.full_walk
+        return self.incremental
+
+    def is_full_walk(self):
+        """ Returns True if the hierarchy is walked without relying on module snapshots and unchanged courses """
+        return self.full_walk
+
+    def get_activity_since(self):
+        """
+        Returns the time stamp from which the activity stream is needed, the oldest time a course to be synced was last
+        completely synced. None if no course was ever completely synced.
+        """
+        sync_state = self.get_sync_state()
+        records = [sync_state.get_course(course.get_id()) for course in self if course.to_be_synced]
+        synced = [record[u"synced_at"] for record in records if record is not None]
+        return min(synced) if synced else None
+
+    def download_activity_stream(self):
+        """
+        Returns a list of the items of the activity stream updated since get_activity_since, or None if the activity
+        stream could not be downloaded
+        """
+        since = self.get_activity_since()
+        if since is None:
+            return []
+
+        try:
+            return list(self.api.get_activity_stream(since))
+        except (IOError, ValueError) as e:
+            # A response that is not JSON raises a ValueError
+            self.print_activity_stream_error(e)
+            return None
+
+    @staticmethod
+    def print_activity_stream_error(error):
+        """ Print that the activity stream could not be downloaded and all courses are walked """
+        print(ANSI.format(u"[*] The activity stream could not be downloaded, all courses are synced (%s)" % error,
+                          formatting=u"red"))
+
+    def skip_unchanged_courses(self, activity):
+        """
+        Mark the courses that have not changed since they were last completely synced as unchanged, they are not
+        walked. A course has changed if it was never completely synced, its 'updated_at' time stamp is different or
+        the activity stream holds an item of the course updated after its last sync.
+
+        activity : list | A list of activity stream items, None if not available in which case all courses are walked
+        """
+        if activity is None:
+            self.incremental = False
+            return
+
+        # The time stamp of the most recent activity of each course
+        latest = {}
+        for item in activity:
+            latest[item[u"course_id"]] = max(latest.get(item[u"course_id"], u""), item.get(u"updated_at") or u"")
+
+        sync_state = self.get_sync_state()
+        for course in self:
+            if not course.to_be_synced:
+                continue
+
+            record = sync_state.get_course(course.get_id())
+            if record is None or record[u"updated_at"] != course.get_updated_at():
+                continue
+            if latest.get(course.get_id(), u"") >= record[u"synced_at"]:
+                continue
+
+            course.unchanged = True
+
+    def record_synced_courses(self):
+        """
+        Record the courses that were completely synced in the SyncState database. The record of a course with a Canvas
+        entity that could not be synced is removed, so that the course is walked by every incremental sync until the
+        entity is synced. Files linked from other servers are not Canvas entities, a broken link does not keep its
+        course from being recorded. Counts the runs since the last full walk.
+        """
+        sync_state = self.get_sync_state()
+        if sync_state is None:
+            return
+
+        failed = set(entity.get_course().get_id() for entity, _ in self.get_failures()
+                     if entity is not self and entity.get_identifier_string() != u"linked_file")
+        synced_at = time.strftime(u"%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at - self.CLOCK_SKEW))
+
+        for course in self:
+            if not course.to_be_synced or course.unchanged:
+                continue
+
+            if course.get_id() in failed:
+                sync_state.forget_course(course.get_id())
+            else:
+                sync_state.record_course(course.get_id(), course.get_updated_at(), synced_at)
+
+        runs = 0 if self.full_walk else int(sync_state.get_value(u"runs_since_full_walk", 0)) + 1
+        sync_state.set_value(u"runs_since_full_walk", runs)
+        sync_state.set_value(u"settings", self.get_settings_fingerprint())
+
+    def add_failure(self, entity, error):
+        """
+        Add an entity that could not be synced to the list of failures
+
+        entity : object    | The CanvasEntity object that could not be synced
+        error  : Exception | The error that stopped the sync of the entity
+        """
+        with self.failures_lock:
+            self.failures.append((entity, error))
+
+    def get_failures(self):
+        """ Getter method for the list of (CanvasEntity, error) tuples of entities that could not be synced """
+        with self.failures_lock:
+            return list(self.failures)
+
+    def print_failures(self):
+        """ Print the entities that could not be synced and why """
+        failures = self.get_failures()
+        if not failures:
+            return
+
+        print(ANSI.format(u"\n[*] %d item(s) could not be synced:" % len(failures), formatting=u"red"))
+        for entity, error in failures:
+            print(u"    %s\n        %s" % (entity.get_path(), error))
 
     def add_entity(self, entity, course_id):
-        """ Add method to append CanvasEntity objects to the list of entities """
-        self.entities[course_id].append(entity)
+        """ Add method to register CanvasEntity objects in the EntityIndex of a course """
+        self.get_entity_index(course_id).add(entity)
 
     def download_courses(self):
         """ Returns a dictionary of courses from the Canvas server """
         return self.api.get_courses()
 
-    def add_courses(self):
+    def add_courses(self, courses_info=None):
         """
         Method that adds all Course objects representing Canvas courses to the
         list of children
+
+        courses_info : iter | An iterable of dictionaries of information on courses,
+                              downloaded from the server if not specified
         """
-        # Download list of dictionaries representing Canvas crouses and
-        # add them all to the list of children
-        for course_information in self.download_courses():
+        if courses_info is None:
+            courses_info = self.download_courses()
+
+        # Add all dictionaries representing Canvas crouses to the list of children
+        for course_information in courses_info:
             if "course_code" not in course_information:
                 continue
 
-            # Add an empty list to the entities dictionary that will
+            # Add an empty EntityIndex to the entities dictionary that will
             # store entities when added
-            self.entities[course_information[u"id"]] = []
+            with self.entities_lock:
+                self.entities[course_information[u"id"]] = EntityIndex()
 
             # Create Course object
             course = Course(course_information,
@@ -120,12 +357,85 @@ class Synchronizer(CanvasEntity):
         """
         1) Adding all Courses objects to the list of children
         2) Synchronize all children objects
+        3) Wait for the download scheduler to complete all downloads
+
+        Files and pages that have not changed since they were last synced, according to the SyncState database, are
+        skipped, as are courses during an incremental sync, see module docstring. Entities that could not be synced are
+        listed when the sync is completed.
         """
         print(text_type(self))
 
-        self.add_courses()
+        if self.download_scheduler.is_concurrent() or self.settings.course_workers > 1:
+            console.install()
+        self.download_scheduler.start()
+        self.started_at = time.time()
+        self.open_sync_state()
+
+        try:
+            self.add_courses()
+            if self.start_incremental_sync():
+                self.skip_unchanged_courses(self.download_activity_stream())
+
+            if self.settings.course_workers > 1:
+                self.sync_courses_in_parallel()
+            else:
+                self.sync_children()
+
+            self.download_scheduler.join()
+            self.record_synced_courses()
+        except KeyboardInterrupt:
+            print(ANSI.format(u"\n[*] Waiting for downloads in progress to finish...", formatting=u"red"))
+            self.download_scheduler.abort()
+            raise
+        finally:
+            self.close_sync_state()
+            console.uninstall()
+
+        self.print_failures()
+
+    def sync_courses_in_parallel(self):
+        """
+        Synchronize all Course objects using a number of threads set by the 'course_workers' setting.
+        The output of each course is printed as one block when the course and its downloads are completed.
+        The first exception raised while syncing a course, if any, is re-raised when all courses are completed.
+        """
+        courses = queue.Queue()
         for course in self:
-            course.sync()
+            courses.put(course)
+
+        errors = []
+
+        def work():
+            while True:
+                try:
+                    course = courses.get_nowait()
+                except queue.Empty:
+                    return
+
+                output = console.OutputBuffer(sys.stdout)
+                try:
+                    with sys.stdout.redirect(output):
+                        try:
+                            course.sync()
+                        except IOError as e:
+                            course.report_failure(e)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    output.release()
+
+        threads = []
+        for _ in range(min(self.settings.course_workers, len(self))):
+            thread = threading.Thread(target=work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
 
     def show(self):
         """ Show the folder hierarchy by printing every level """
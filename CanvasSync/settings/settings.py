@@ -66,10 +66,145 @@ class Settings(object):
         self.avoid_duplicates = True
         self.use_nicknames = False
 
+        # Fetch the next page of paginated API lists in the background
+        # while the current page is being processed
+        self.prefetch_pages = True
+
+        # Connection pool settings shared by all HTTP traffic
+        self.http_pool_size = 20
+        self.http_keep_alive = True
+
+        # The sync engine, either "sync" (blocking, one request at a time)
+        # or "async" (asyncio, requires aiohttp) and the maximum number of
+        # simultaneous requests of the async engine
+        self.sync_engine = u"sync"
+        self.async_concurrency = 32
+
+        # The number of threads downloading files while the Canvas folder
+        # hierarchy is walked (0 to download one file at a time during the
+        # walk) and the maximum number of downloads waiting in line
+        self.download_workers = 4
+        self.download_queue_size = 64
+
+        # The number of courses synchronized in parallel
+        self.course_workers = 4
+
+        # The number of bytes read from the connection and written to disk
+        # at a time when streaming a file download
+        self.download_buffer_size = 256 * 1024
+
+        # Files of at least this number of bytes are downloaded as a number
+        # of byte ranges fetched in parallel over separate connections
+        self.segmented_download_threshold = 64 * 1024 * 1024
+        self.download_segments = 4
+
+        # Build the 'Other Files' folder hierarchy of a course from the
+        # lists of all folders and all files of the course instead of
+        # downloading the files and sub-folders of each folder
+        self.flat_file_listing = False
+
+        # Ask the server to return the items of each module inline with the
+        # list of modules instead of listing the items of each module
+        self.inline_module_items = False
+
+        # Download the HTML bodies of all pages of a course at once instead
+        # of downloading each page separately
+        self.bulk_page_bodies = False
+
+        # Resolve files linked from modules, pages and assignments through
+        # an index built from the list of all files of the course instead
+        # of downloading information on each file
+        self.use_file_index = False
+
+        # Record synced items in a database in the sync folder so that
+        # unchanged items are skipped and changed items re-downloaded
+        self.use_sync_state = True
+
+        # Store each file payload once in a folder in the sync folder and
+        # hard link every location of the file to it, requires
+        # 'use_sync_state'. Files are then not skipped in 'Other Files'
+        # as duplicates.
+        self.dedup_store = False
+
+        # Only walk the courses that may have changed since the last sync
+        # according to the activity stream and the 'updated_at' time stamps
+        # of the courses, requires 'use_sync_state'
+        self.incremental_sync = False
+
+        # Rebuild the items of modules that are listed unchanged from a
+        # snapshot stored in the sync state instead of downloading them
+        self.module_snapshots = False
+
+        # Walk all courses and ignore module snapshots every
+        # 'full_sync_interval' runs (0 for never)
+        self.full_sync_interval = 10
+
+        # Keep only the fields of the information on files and module items
+        # that are used by the sync in memory, reduces the memory used by
+        # large syncs
+        self.compact_entities = False
+
         # Get the path pointing to the settings file.
         self.settings_path = os.path.abspath(os.path.expanduser(u"~")
                                              + u"/.CanvasSync.settings")
 
+        # Adapt the number of API calls in flight to the rate limit of the
+        # server, starting at 'rate_limit_window' and growing up to
+        # 'rate_limit_max_window' requests
+        self.rate_limit = True
+        self.rate_limit_window = 8
+        self.rate_limit_max_window = 32
+
+        # Retry requests failing with a connection error, a timeout or a
+        # server error this many times, with these (connect, read)
+        # timeouts in seconds. An API endpoint failing 'breaker_threshold'
+        # times in a row is not contacted for 'breaker_cooldown' seconds.
+        self.request_retries = 3
+        self.connect_timeout = 10
+        self.read_timeout = 60
+        self.breaker_threshold = 5
+        self.breaker_cooldown = 30
+
+        # Abort and resume a file download receiving less than
+        # 'stall_min_rate' bytes per second over 'stall_window' seconds, or
+        # nothing for 'stall_idle_timeout' seconds, at most 'stall_retries'
+        # times per file
+        self.stall_detection = True
+        self.stall_min_rate = 10 * 1024
+        self.stall_window = 30
+        self.stall_idle_timeout = 30
+        self.stall_retries = 3
+
+        # Refuse linked files larger than 'linked_file_max_size' bytes (0 for
+        # no limit) or with a content type not in 'linked_file_types' (e.g.
+        # "application/pdf" or "image/", empty to allow any type), checked
+        # with a HEAD request first if 'linked_file_probe'. At most
+        # 'linked_file_host_limit' linked files are downloaded at a time
+        # from the same host.
+        self.linked_file_max_size = 1024 * 1024 * 1024
+        self.linked_file_types = []
+        self.linked_file_probe = False
+        self.linked_file_host_limit = 2
+
+        # Send a duplicate of a metadata API call that is slower than the
+        # 'hedge_percentile' percentile of observed latencies, at most for
+        # the 'hedge_budget' fraction of API calls
+        self.hedge_requests = False
+        self.hedge_percentile = 95
+        self.hedge_budget = 0.05
+
+        # The maximum total size in bytes of the API responses kept in
+        # memory for the rest of the run so that each API call is only
+        # sent once
+        self.memo_size = 32 * 1024 * 1024
+
+        # Store API responses in a cache folder and revalidate them with
+        # conditional requests, the maximum size of the cache in bytes
+        self.http_cache = True
+        self.http_cache_size = 100 * 1024 * 1024
+        self.cache_path = os.path.abspath(os.path.expanduser(u"~")
+                                          + u"/.CanvasSync.cache")
+
         # Initialize user prompt class, used to get information from the user
         # via the terminal
         self.api = InstructureApi(self)
@@ -93,7 +228,7 @@ class Settings(object):
         attributes of the Settings object
         """
         if self.is_loaded():
-            return helpers.validate_token(self.domain, self.token)
+            return helpers.validate_token(self.domain, self.token, api=self.api)
 
         if not self.settings_file_exists():
             self.set_settings()
@@ -142,7 +277,7 @@ class Settings(object):
             if message[:14] == u"Use nicknames$":
                 self.use_nicknames = setting
 
-        if not helpers.validate_token(self.domain, self.token):
+        if not helpers.validate_token(self.domain, self.token, api=self.api):
             return False
         else:
             return True
@@ -50,6 +50,128 @@ $ canvas.py [-S] <sync> [-h] <help> [-s] <reset settings> [-i] <show current set
 
     -p {password}, optional              : Specify settings file decryption password (potentially dangerous)
 
+    --clear-cache, optional              : Delete the cache of API responses stored in ~/.CanvasSync.cache
+
+Performance tuning
+------------------
+The following optional long options tune how CanvasSync communicates with the Canvas server:
+
+    --pool-size={int}                    : Maximum number of connections kept open to each host (default 20)
+
+    --keep-alive={true|false}            : Reuse connections between requests (default true)
+
+    --engine={sync|async}                : The sync engine (default sync). The async engine walks all courses,
+                                           modules and folders concurrently and requires the aiohttp package.
+
+    --async-concurrency={int}            : Maximum number of simultaneous requests and file downloads of the async
+                                           engine (default 32)
+
+    --download-workers={int}             : Number of threads downloading files while the Canvas folder hierarchy is
+                                           mapped out (default 4, 0 to download during the walk)
+
+    --download-queue-size={int}          : Maximum number of downloads waiting for a download thread (default 64)
+
+    --course-workers={int}               : Number of courses synchronized in parallel (default 4). The output of each
+                                           course is printed when the course is completed.
+
+    --download-buffer-size={int}         : Number of bytes streamed to disk at a time when downloading (default 262144)
+
+    --segment-threshold={int}            : Files of at least this number of bytes are downloaded over several
+                                           connections in parallel (default 67108864)
+
+    --download-segments={int}            : Number of parallel connections used per large file (default 4, 1 to
+                                           download all files over a single connection)
+
+    --sync-state={true|false}            : Record synced items in the file .CanvasSync.db in the sync folder and
+                                           re-download files and pages that changed on the server (default true)
+
+    --dedup-store={true|false}           : Download each file once and hard link all its locations, also across
+                                           courses, to a store in the sync folder. Duplicates are then kept in the
+                                           'Other Files' folders. Requires the sync state (default false)
+
+    --incremental={true|false}           : Only sync the courses that may have changed since the last sync according
+                                           to the activity stream of the user, requires the sync state (default false)
+
+    --module-snapshots={true|false}      : Rebuild modules that are listed unchanged from a snapshot in the sync state
+                                           instead of downloading their items (default false)
+
+    --full-sync-interval={int}           : Sync all courses and ignore module snapshots every this many runs, 0 for
+                                           never (default 10)
+
+    --compact-entities={true|false}      : Keep only the fields of the information on files and module items used
+                                           by the sync in memory, reduces the memory used by large syncs (default false)
+
+    --flat-listing={true|false}          : Map out the files folder of each course from one list of all folders and
+                                           one list of all files instead of listing every folder (default false)
+
+    --file-index={true|false}            : Look up files linked from modules, pages and assignments in the list of all
+                                           files of the course instead of requesting each file (default false)
+
+    --inline-items={true|false}          : Request the items of all modules along with the list of modules. Items of
+                                           modules the server does not return in full are requested separately
+                                           (default false)
+
+    --bulk-pages={true|false}            : Download all pages of a course with their HTML bodies in one list instead
+                                           of requesting each page. Pages are only re-written when changed (default
+                                           false)
+
+    --http-cache={true|false}            : Cache API responses and only transfer them again if changed on the server
+                                           (default true)
+
+    --cache-size={int}                   : Maximum size of the cache of API responses in bytes (default 104857600)
+
+    --memo-size={int}                    : Maximum size in bytes of the API responses kept in memory so that each API
+                                           call is only sent once per run (default 33554432, 0 to disable)
+
+    --rate-limit={bool}                  : Adapt the number of API calls in flight to the rate limit reported by the
+                                           server and retry throttled calls after a backoff (default true)
+
+    --rate-limit-window={int}            : Number of API calls allowed in flight at the start of a sync (default 8)
+
+    --rate-limit-max-window={int}        : Maximum number of API calls allowed in flight (default 32)
+
+    --retries={int}                      : Number of times a request failing with a connection error, a timeout or a
+                                           server error is retried (default 3)
+
+    --connect-timeout={float}            : Seconds to wait for a connection to the server (default 10)
+
+    --read-timeout={float}               : Seconds to wait for the server to send data (default 60)
+
+    --breaker-threshold={int}            : Number of failed requests in a row after which an API endpoint is not
+                                           contacted for a while (default 5, 0 to disable)
+
+    --breaker-cooldown={float}           : Seconds before a failing API endpoint is contacted again (default 30)
+
+    --hedge={bool}                       : Send a duplicate of a metadata API call that is slow to respond and use
+                                           whichever response arrives first (default false)
+
+    --hedge-percentile={float}           : Percentile of observed response times after which a duplicate is sent
+                                           (default 95)
+
+    --hedge-budget={float}               : Maximum fraction of API calls that may be sent twice (default 0.05)
+
+    --stall-detection={bool}             : Abort and resume file downloads that stall (default true)
+
+    --stall-min-rate={int}               : Minimum download speed in bytes per second, averaged over the stall window
+                                           (default 10240)
+
+    --stall-window={float}               : Seconds the download speed is averaged over (default 30)
+
+    --stall-timeout={float}              : Seconds without receiving any data before a download is aborted (default 30)
+
+    --stall-retries={int}                : Number of times a stalled download is resumed (default 3)
+
+    --linked-max-size={int}              : Maximum size in bytes of a linked file, 0 for no limit (default 1073741824)
+
+    --linked-types={list}                : Comma separated content types of linked files to download, e.g.
+                                           "application/pdf,image/", empty for any type (default empty)
+
+    --linked-probe={bool}                : Check the size and type of a linked file with a HEAD request before
+                                           downloading it (default false)
+
+    --linked-host-limit={int}            : Maximum number of linked files downloaded at a time from the same host
+                                           (default 2)
+
 Setup
 -----
 CanvasSync requires at least the following settings to be set:
@@ -0,0 +1,479 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+async_instructure_api.py
+
+The AsyncInstructureApi object is an asyncio version of the InstructureApi object. It implements the same API calls as
+coroutines (and asynchronous generators for paginated lists) so that many metadata requests and file downloads may be
+in flight at the same time on a single thread. It is used by the AsyncSynchronizer object.
+
+aiohttp is used to do https communication with the server. It is an optional dependency of CanvasSync that is only
+required when the asynchronous sync engine is selected. The number of simultaneous connections is limited by the
+'async_concurrency' setting.
+
+File payloads are not streamed through aiohttp. Downloads are handed to an InstructureApi object running in a pool of
+threads, so that both sync engines share the logic of the downloader module (resumed and segmented downloads, stall
+detection and the checks of linked files) and the writing to disk never holds up the event loop. Other blocking work
+of the coroutines is run in the same pool, see run_blocking.
+"""
+
+# Inbuilt modules
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import json
+
+# Third party modules
+import aiohttp
+
+# CanvasSync modules
+from CanvasSync.utilities import http_cache
+from CanvasSync.utilities.instructure_api import InstructureApi
+from CanvasSync.utilities import request_coalescer
+from CanvasSync.utilities import rate_limiter
+from CanvasSync.utilities import retry_policy
+from CanvasSync.utilities.retry_policy import InstructureApiError
+
+
+class AsyncInstructureApi(object):
+    # The number of seconds between checks for a place in the window of the RateLimiter object, see _acquire
+    LIMITER_POLL_INTERVAL = 0.05
+
+    def __init__(self, settings):
+        """
+        settings : object | A Settings object used to load domain, token and concurrency attributes
+        """
+        self.settings = settings
+
+        # The aiohttp ClientSession must be created from within the running event loop, see get_session
+        self.session = None
+
+        # The HttpCache object storing API responses, opened on first use, see get_cache
+        self.cache = None
+
+        # Tasks of the requests currently in flight stored under their key, shared by coroutines asking for the same
+        # API call. Memoized responses are stored by the RequestCoalescer object shared with the InstructureApi.
+        self.in_flight = {}
+
+        # The asyncio Condition coroutines wait on for a place in the window of the RateLimiter object, created from
+        # within the running event loop, see _acquire
+        self.limiter_condition = None
+
+        # The InstructureApi object downloading file payloads and the ThreadPoolExecutor object it runs in, created
+        # on first use, see run_blocking
+        self.sync_api = InstructureApi(settings)
+        self.executor = None
+
+    def get_session(self):
+        """ Returns the aiohttp ClientSession object, initialized on first call """
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.settings.async_concurrency)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.settings.connect_timeout,
+                                            sock_read=self.settings.read_timeout)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+
+    async def close(self):
+        """ Close the aiohttp ClientSession and all connections it holds and shut down the executor """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    @contextlib.asynccontextmanager
+    async def _get(self, api_call, headers=None):
+        """
+        [PRIVATE] Implements the basic GET call to the API. Returns an async context manager of the aiohttp response.
+        Failed requests are retried and an InstructureApiError is raised if all attempts fail or the circuit of the
+        endpoint is open, see InstructureApi._get
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        headers  : dict   | Extra request headers, e.g. a Range header
+        """
+        policy = retry_policy.RetryPolicy(max_retries=self.settings.request_retries)
+        breaker = retry_policy.get_breaker(self.settings.domain, api_call,
+                                           threshold=self.settings.breaker_threshold,
+                                           cooldown=self.settings.breaker_cooldown)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise InstructureApiError(u"Too many failed requests to %s, not retrying for now"
+                                          % retry_policy.get_endpoint(api_call), api_call)
+
+            response = None
+            try:
+                response = await self._send(api_call, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = InstructureApiError(u"Request to %s failed: %s" % (api_call, e or type(e).__name__), api_call)
+            except BaseException:
+                # Not retried, but a failed or cancelled trial request must not leave the circuit half-open
+                breaker.record_failure()
+                raise
+            else:
+                if not policy.is_retryable_status(response.status):
+                    breaker.record_success()
+                    break
+                error = InstructureApiError(u"Request to %s failed with HTTP status %s"
+                                            % (api_call, response.status), api_call, response.status)
+
+            breaker.record_failure()
+            delay = policy.get_delay(attempt, response.headers.get(u"Retry-After") if response is not None else None)
+            if response is not None:
+                response.release()
+            if delay is None:
+                raise error
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def _send(self, api_call, headers=None):
+        """
+        [PRIVATE] Send a single GET request to the API and return the aiohttp response. The request waits for a place
+        in the window of the RateLimiter object and is resent after a backoff if the server responds that the rate
+        limit is exceeded, see InstructureApi._send
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        headers  : dict   | Extra request headers, e.g. a Range header
+        """
+        request_headers = dict(headers or {})
+        request_headers[u'Authorization'] = u"Bearer %s" % self.settings.token
+
+        limiter = self.get_limiter()
+        attempt = 0
+        while True:
+            await self._acquire(limiter)
+            throttled = False
+            try:
+                response = await self.get_session().get(u"%s%s" % (self.settings.domain, api_call),
+                                                        headers=request_headers)
+                if limiter is not None:
+                    body = await response.text() if response.status == 403 else u""
+                    throttled = limiter.update(response.status, response.headers, body)
+            finally:
+                await self._release(limiter)
+
+            if not throttled:
+                return response
+
+            response.release()
+            delay = limiter.get_backoff(attempt)
+            if delay is None:
+                raise InstructureApiError(u"Request to %s was refused, the rate limit is exceeded" % api_call,
+                                          api_call, response.status)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def get_limiter(self):
+        """ Returns the RateLimiter object shared with the InstructureApi, None if disabled, see InstructureApi """
+        if not self.settings.rate_limit:
+            return None
+        return rate_limiter.get_limiter(self.settings.domain,
+                                        window=self.settings.rate_limit_window,
+                                        max_window=self.settings.rate_limit_max_window)
+
+    def get_rate_limit_stats(self):
+        """ Returns a dictionary of the window and throttling stats of the RateLimiter object, None if disabled """
+        limiter = self.get_limiter()
+        return limiter.get_stats() if limiter is not None else None
+
+    async def _acquire(self, limiter):
+        """ [PRIVATE] Wait for a place in the window of a RateLimiter object, if not None """
+        if limiter is None:
+            return
+        if self.limiter_condition is None:
+            self.limiter_condition = asyncio.Condition()
+        async with self.limiter_condition:
+            while not limiter.try_acquire():
+                try:
+                    # Places given back by the downloads running in threads do not notify the condition
+                    await asyncio.wait_for(self.limiter_condition.wait(), self.LIMITER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, limiter):
+        """ [PRIVATE] Give back a place in the window of a RateLimiter object and wake up waiting coroutines """
+        if limiter is None:
+            return
+        limiter.release()
+        async with self.limiter_condition:
+            self.limiter_condition.notify_all()
+
+    def get_cache(self):
+        """ Returns the HttpCache object, None if disabled by the 'http_cache' setting """
+        if self.cache is None and self.settings.http_cache:
+            self.cache = http_cache.open_cache(self.settings.cache_path, self.settings.http_cache_size)
+        return self.cache
+
+    def get_cache_user(self):
+        """ Returns the key of the user in the HttpCache, see http_cache.get_user_key """
+        return http_cache.get_user_key(self.settings.domain, self.settings.token)
+
+    async def _get_cached(self, api_call):
+        """
+        [PRIVATE] Returns a tuple of the body of the response to an API call and the API call pointing to the next
+        page. Concurrent coroutines asking for the same API call share one request and successful responses are
+        memoized, see InstructureApi._get_cached
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        coalescer = request_coalescer.get_coalescer(self.settings.memo_size)
+        key = (self.settings.token, u"%s%s" % (self.settings.domain, api_call))
+
+        result = coalescer.lookup(key)
+        if result is not None:
+            return result
+
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_memoize(key, api_call))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        # A cancelled waiter does not cancel the request shared with other waiters
+        return await asyncio.shield(task)
+
+    async def _fetch_and_memoize(self, key, api_call):
+        """ [PRIVATE] Send an API call and memoize the response if successful, see _get_cached """
+        body, next_call, status = await self._get_revalidated(api_call)
+
+        if status == 200:
+            coalescer = request_coalescer.get_coalescer(self.settings.memo_size)
+            coalescer.store(key, (body, next_call), len(body) + len(next_call or u""))
+
+        return body, next_call
+
+    async def _get_revalidated(self, api_call):
+        """
+        [PRIVATE] Returns a tuple of the body of the response to an API call, the API call pointing to the next
+        page and the HTTP status code, revalidating a cached response with a conditional request, see
+        InstructureApi._get_revalidated
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        cache = self.get_cache()
+        url = u"%s%s" % (self.settings.domain, api_call)
+        entry = cache.get(url, self.get_cache_user()) if cache is not None else None
+
+        async with self._get(api_call, headers=http_cache.get_conditional_headers(entry)) as response:
+            if response.status == 304 and entry is not None:
+                return entry[u"body"], entry[u"next"], 200
+
+            body = await response.text()
+            next_link = response.links.get(u"next")
+
+            next_call = None
+            if next_link:
+                next_call = str(next_link[u"url"]).split(self.settings.domain)[-1]
+
+            if cache is not None and response.status == 200:
+                cache.put(url, self.get_cache_user(), response.headers.get(u"ETag"),
+                          response.headers.get(u"Last-Modified"), body, next_call)
+
+        return body, next_call, response.status
+
+    async def get_json(self, api_call):
+        """
+        Returns the json digested dictionary of a specified API call
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        body, _ = await self._get_cached(api_call)
+        return json.loads(body)
+
+    async def get_json_page(self, api_call):
+        """
+        Returns a tuple of the json digested content of a single page of a paginated API call and the API call
+        pointing to the next page (None on the last page).
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        body, next_call = await self._get_cached(api_call)
+        return json.loads(body), next_call
+
+    async def get_json_list(self, api_call, strict=False):
+        """
+        Asynchronous generator yielding all items of a paginated list API call, see InstructureApi.get_json_list
+
+        api_call : string  | Any call to the Instructure API ("/api/v1/courses" for instance)
+        strict   : boolean | Raise an IOError if the server responds with something other than a list
+        """
+        while api_call:
+            call = api_call
+            data, api_call = await self.get_json_page(call)
+            if not isinstance(data, (list, tuple)):
+                if strict:
+                    raise IOError(u"The server did not respond with a list to the API call %s: %s" % (call, data))
+                return
+
+            for item in data:
+                yield item
+
+    async def get_list(self, api_call, strict=False):
+        """
+        Returns a list of all items of a paginated list API call
+
+        api_call : string  | Any call to the Instructure API ("/api/v1/courses" for instance)
+        strict   : boolean | Raise an IOError if the list could not be downloaded
+        """
+        return [item async for item in self.get_json_list(api_call, strict=strict)]
+
+    async def get_courses(self):
+        """
+        Returns a list of course dictionaries, courses with restricted access are filtered out
+        """
+        courses = await self.get_list(u"/api/v1/courses?per_page=100")
+        return [course for course in courses if not course.get(u"access_restricted_by_date")]
+
+    async def get_activity_stream(self, since=None):
+        """
+        Returns a list of the items of the activity stream of the user updated after a time stamp, see
+        InstructureApi.get_activity_stream
+
+        since : string | A time stamp in the format of Canvas time stamps, None to download the entire stream
+        """
+        items = []
+        async for item in self.get_json_list(u"/api/v1/users/self/activity_stream?per_page=100", strict=True):
+            if since is not None and (item.get(u"updated_at") or u"") < since:
+                break
+            if item.get(u"course_id") is not None:
+                items.append(item)
+        return items
+
+    async def get_modules_in_course(self, course_id, include_items=False):
+        """
+        Returns a list of dictionaries on the Canvas modules located in a given course.
+
+        course_id     : int     | A course ID number
+        include_items : boolean | Ask the server to return the items of each module inline, see InstructureApi
+        """
+        api_call = u"/api/v1/courses/%s/modules?per_page=100" % course_id
+        if include_items:
+            api_call += u"&include[]=items&include[]=content_details"
+
+        return await self.get_list(api_call)
+
+    async def get_files_in_folder(self, folder_id):
+        """
+        Returns a list of dictionaries on the Canvas files located in a given folder
+
+        folder_id : int | A folder ID number
+        """
+        return await self.get_list(u"/api/v1/folders/%s/files?per_page=100" % folder_id)
+
+    async def get_folders_in_folder(self, folder_id):
+        """
+        Returns a list of dictionaries on the Canvas folders located in a given folder
+
+        folder_id : int | A folder ID number
+        """
+        return await self.get_list(u"/api/v1/folders/%s/folders?per_page=100" % folder_id)
+
+    async def get_files_in_course(self, course_id, strict=False):
+        """
+        Returns a list of dictionaries on the Canvas files located in a given course.
+
+        course_id : int     | A course ID number
+        strict    : boolean | Raise an IOError if the list could not be downloaded
+        """
+        return await self.get_list(u"/api/v1/courses/%s/files?per_page=100" % course_id, strict=strict)
+
+    async def get_folders_in_course(self, course_id):
+        """
+        Returns a list of dictionaries on the Canvas folders located in a given course.
+
+        course_id : int | A course ID number
+        """
+        return await self.get_list(u"/api/v1/courses/%s/folders?per_page=100" % course_id)
+
+    async def get_pages_in_course(self, course_id, include_body=False, strict=False):
+        """
+        Returns a list of dictionaries on the Canvas pages of a given course.
+
+        course_id    : int     | A course ID number
+        include_body : boolean | Include the HTML body of each page
+        strict       : boolean | Raise an IOError if the list could not be downloaded
+        """
+        api_call = u"/api/v1/courses/%s/pages?per_page=100" % course_id
+        if include_body:
+            api_call += u"&include[]=body"
+
+        return await self.get_list(api_call, strict=strict)
+
+    async def get_items_in_module(self, course_id, module_id):
+        """
+        Returns a list of dictionaries of items located in a given module in a given course
+
+        course_id : int | A course ID number
+        module_id : int | A module ID number
+        """
+        return await self.get_list(u"/api/v1/courses/%s/modules/%s/items?per_page=100" % (course_id, module_id))
+
+    async def get_assignments_in_course(self, course_id):
+        """
+        Returns a list of dictionaries of information on assignment objects under a course ID
+
+        course_id : int | A course ID number
+        """
+        return await self.get_list(u"/api/v1/courses/%s/assignments?per_page=100" % course_id)
+
+    async def download_item_information(self, url):
+        """
+        Returns a dictionary of information on a specified item
+
+        url : string | The API url pointing to information on a specified file in the Canvas system
+        """
+        url = url.split(self.settings.domain)[-1]
+        return await self.get_json(url)
+
+    def get_executor(self):
+        """ Returns the ThreadPoolExecutor object running blocking work for the coroutines, see run_blocking """
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(self.settings.async_concurrency, 1))
+        return self.executor
+
+    async def run_blocking(self, function, *args):
+        """
+        Returns the result of a function doing blocking work, e.g. writing files or the SyncState database, called in
+        a thread of the executor so that the event loop is not held up
+
+        function : callable | The function to call
+        args     : tuple    | The arguments passed to the function
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.get_executor(), functools.partial(function, *args))
+
+    async def download_file(self, download_url, path, identity=None):
+        """
+        Download the payload of a specified file in the Canvas system to a local path. The download is done by the
+        InstructureApi object in a thread of the executor, so resumed, segmented and stalled downloads are handled
+        the same way by both sync engines, see InstructureApi.download_file and the downloader module.
+        Returns the validator (ETag or Last-Modified header) of the download or None.
+
+        download_url : string | The API download url pointing to a file in the Canvas system
+        path         : string | The local path to store the file at
+        identity     : dict   | A dictionary identifying the file (Canvas file ID, size and version)
+        """
+        return await self.run_blocking(self.sync_api.download_file, download_url, path, identity)
+
+    async def download_linked_file(self, url, path):
+        """
+        Download a file hosted outside of the Canvas system to a local path. The download is done by the
+        InstructureApi object in a thread of the executor, see InstructureApi.download_linked_file.
+        Raises IOError if the server does not respond with the file and LinkedFileRejected if the file is refused.
+
+        url  : string | A URL pointing to a file somewhere on the web
+        path : string | The local path to store the file at
+        """
+        await self.run_blocking(self.sync_api.download_linked_file, url, path)
@@ -0,0 +1,170 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+blob_store.py, module
+
+Implements the BlobStore object, a content-addressed store of file payloads in a hidden folder of the sync folder.
+The same Canvas file often appears in several places of the hierarchy (a module, the 'Other Files' folder, an
+assignment) and in several courses. With the store, each payload is downloaded and stored only once as a blob named
+by the SHA-256 hash of its content, and every location of the file is a hard link to the blob.
+
+A file is looked up in the store by a key made of its Canvas 'uuid', size and version. The SyncState database maps
+keys to the hash of the blob. Before a blob is linked to a new location its hash is checked, as a location edited in
+place also changes the blob. A downloaded file whose content is already stored (e.g. the copy of a file in another
+course, which has its own 'uuid') is replaced by a link to the existing blob, so it is at least stored only once.
+
+If hard links are not supported (e.g. by the file system) the blob is copied to the location instead. Blobs no
+longer linked from any location are deleted by the prune method at the end of a sync. As a copied blob is not linked,
+payloads are then only shared within a sync.
+"""
+
+# Inbuilt modules
+import hashlib
+import os
+import shutil
+import threading
+
+# CanvasSync modules
+from CanvasSync.utilities import helpers
+
+
+class BlobStore(object):
+    # The name of the store folder in the top-level sync folder
+    FOLDER_NAME = u".CanvasSync.blobs"
+
+    def __init__(self, path, sync_state, chunk_size=1024 * 1024):
+        """
+        path       : string | The path of the store folder, created if not existing
+        sync_state : object | The SyncState object mapping keys to the hashes of blobs
+        chunk_size : int    | The number of bytes read at a time when hashing a file
+        """
+        self.path = path
+        self.sync_state = sync_state
+        self.chunk_size = chunk_size
+
+        if not os.path.exists(path):
+            os.mkdir(path)
+
+        # Locks serializing the download of each key, stored under the key
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+
+    @classmethod
+    def open_in(cls, sync_path, sync_state):
+        """
+        Returns a BlobStore object storing its blobs in a top-level sync folder
+
+        sync_path  : string | The top-level sync folder
+        sync_state : object | The SyncState object of the sync folder
+        """
+        return cls(os.path.join(sync_path, cls.FOLDER_NAME), sync_state)
+
+    @staticmethod
+    def get_key(file_info):
+        """
+        Returns the key of a Canvas file in the store
+
+        file_info : dict | A dictionary of information on the Canvas file object
+        """
+        return u"%s:%s:%s" % (file_info.get(u"uuid") or file_info.get(u"id"), file_info.get(u"size"),
+                              file_info.get(u"modified_at") or file_info.get(u"updated_at"))
+
+    def get_lock(self, key):
+        """ Returns the threading Lock object held while a file with the specified key is looked up and downloaded """
+        with self.locks_lock:
+            if key not in self.locks:
+                self.locks[key] = threading.Lock()
+            return self.locks[key]
+
+    def get_blob_path(self, digest):
+        """ Returns the path of the blob with the specified SHA-256 hash """
+        return os.path.join(self.path, digest[:2], digest)
+
+    def hash_file(self, path):
+        """ Returns the SHA-256 hash of the content of a file as a hex string """
+        sha = hashlib.sha256()
+        with open(path, u"rb") as in_file:
+            for chunk in iter(lambda: in_file.read(self.chunk_size), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def place(self, blob_path, path):
+        """
+        Atomically replace the file at a path by a hard link to a blob, or by a copy if hard links are not supported
+
+        blob_path : string | The path of the blob
+        path      : string | The path of the location
+        """
+        temp_path = path + u".link"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        try:
+            os.link(blob_path, temp_path)
+        except (OSError, AttributeError, NotImplementedError):
+            shutil.copyfile(blob_path, temp_path)
+
+        helpers.replace_file(temp_path, path)
+
+    def link(self, key, path):
+        """
+        Place the blob of a key at a path, returns True if placed or False if the key is not in the store or its blob
+        is missing or was modified
+
+        key  : string | The key of the file, see get_key
+        path : string | The path of the location
+        """
+        record = self.sync_state.get_blob(key)
+        if record is None:
+            return False
+
+        blob_path = self.get_blob_path(record[u"digest"])
+        if not os.path.exists(blob_path) or os.path.getsize(blob_path) != record[u"size"] \
+                or self.hash_file(blob_path) != record[u"digest"]:
+            self.sync_state.forget_blob(key)
+            return False
+
+        self.place(blob_path, path)
+        return True
+
+    def add(self, key, path):
+        """
+        Add a downloaded file to the store under a key. If a blob of the same content is already stored, the file is
+        replaced by a link to it, otherwise the file becomes the blob.
+
+        key  : string | The key of the file, see get_key
+        path : string | The path of the downloaded file
+        """
+        digest = self.hash_file(path)
+        blob_path = self.get_blob_path(digest)
+
+        if os.path.exists(blob_path) and self.hash_file(blob_path) == digest:
+            self.place(blob_path, path)
+        else:
+            try:
+                os.mkdir(os.path.dirname(blob_path))
+            except OSError:
+                # Already made
+                pass
+            self.place(path, blob_path)
+
+        self.sync_state.record_blob(key, digest, os.path.getsize(path))
+
+    def prune(self):
+        """ Delete blobs that are not linked from any location, returns the number of blobs deleted """
+        deleted = 0
+        for folder in os.listdir(self.path):
+            folder_path = os.path.join(self.path, folder)
+            if not os.path.isdir(folder_path):
+                continue
+
+            for name in os.listdir(folder_path):
+                blob_path = os.path.join(folder_path, name)
+                if os.stat(blob_path).st_nlink <= 1:
+                    os.remove(blob_path)
+                    deleted += 1
+
+        return deleted
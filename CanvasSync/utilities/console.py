@@ -0,0 +1,156 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+console.py, module
+
+Implements the ThreadSafeConsole object that wraps the standard output stream while several threads print status lines
+(e.g. download worker threads). Text written by each thread is buffered until a full line has been written, which is
+then written to the wrapped stream while holding a lock, so lines printed by different threads never interleave.
+
+A thread may also redirect its output to an OutputBuffer object. This is used when courses are synchronized in
+parallel: everything printed while syncing a course, including the status lines printed by the download jobs it
+submitted, is collected in one buffer and written as a single block once the course and its downloads are completed.
+"""
+
+# Inbuilt modules
+import contextlib
+import sys
+import threading
+
+
+class OutputBuffer(object):
+    def __init__(self, console):
+        """
+        Collects the output of a group of threads and writes it to the console as one block when released.
+        The buffer is initially held once, every call to 'hold' must be matched by a call to 'release'.
+
+        console : object | The ThreadSafeConsole object to write the collected output to
+        """
+        self.console = console
+        self.parts = []
+        self.holds = 1
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        """ Add text to the buffer """
+        with self.lock:
+            self.parts.append(text)
+
+    def hold(self):
+        """ Postpone writing the buffer until a matching call to 'release' """
+        with self.lock:
+            self.holds += 1
+
+    def release(self):
+        """ Release one hold on the buffer, the collected output is written when no holds remain """
+        with self.lock:
+            self.holds -= 1
+            if self.holds > 0:
+                return
+            text = u"".join(self.parts)
+            self.parts = []
+
+        self.console.write_block(text)
+
+
+class ThreadSafeConsole(object):
+    def __init__(self, stream):
+        """
+        stream : object | The stream to wrap, usually sys.stdout
+        """
+        self.stream = stream
+        self.lock = threading.RLock()
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        """ All attributes not implemented here are fetched from the wrapped stream """
+        return getattr(self.stream, name)
+
+    def get_target(self):
+        """ Returns the OutputBuffer object that the calling thread redirects its output to, if any """
+        return getattr(self.local, u"target", None)
+
+    @contextlib.contextmanager
+    def redirect(self, target):
+        """
+        Context manager redirecting all output of the calling thread to an OutputBuffer object
+
+        target : object | An OutputBuffer object
+        """
+        previous = self.get_target()
+        self.local.target = target
+        try:
+            yield target
+        finally:
+            self.local.target = previous
+
+    def write(self, text):
+        """ Buffer text written by the calling thread and write all completed lines to the wrapped stream """
+        target = self.get_target()
+        if target is not None:
+            target.write(text)
+            return
+
+        buffer = getattr(self.local, u"buffer", u"") + text
+
+        if u"\n" in buffer:
+            lines, buffer = buffer.rsplit(u"\n", 1)
+            with self.lock:
+                self.stream.write(lines + u"\n")
+
+        self.local.buffer = buffer
+
+    def write_block(self, text):
+        """ Write a block of text to the wrapped stream without interleaving output of other threads """
+        with self.lock:
+            self.stream.write(text)
+            self.stream.flush()
+
+    def flush(self):
+        """ Flush the wrapped stream, text not yet ending a line is kept in the buffer """
+        if self.get_target() is not None:
+            return
+
+        with self.lock:
+            self.stream.flush()
+
+
+def install():
+    """ Wrap sys.stdout in a ThreadSafeConsole object if not already wrapped and return it """
+    if not isinstance(sys.stdout, ThreadSafeConsole):
+        sys.stdout = ThreadSafeConsole(sys.stdout)
+    return sys.stdout
+
+
+def bind(job):
+    """
+    Returns a version of a job (a callable taking no arguments) that redirects its output to the OutputBuffer object
+    the calling thread currently redirects to, so it can be run in another thread. The buffer is held until the job
+    has been run.
+
+    job : callable | The job to bind
+    """
+    if not isinstance(sys.stdout, ThreadSafeConsole) or sys.stdout.get_target() is None:
+        return job
+
+    console = sys.stdout
+    target = console.get_target()
+    target.hold()
+
+    def bound_job():
+        try:
+            with console.redirect(target):
+                job()
+        finally:
+            target.release()
+
+    return bound_job
+
+
+def uninstall():
+    """ Restore the wrapped sys.stdout stream """
+    if isinstance(sys.stdout, ThreadSafeConsole):
+        sys.stdout = sys.stdout.stream
@@ -0,0 +1,146 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+download_scheduler.py, module
+
+Implements the DownloadScheduler object that separates the discovery of the folder hierarchy from the download of
+file payloads. While the Synchronizer walks the hierarchy, File and LinkedFile objects submit download jobs to a
+bounded queue that a pool of worker threads drains concurrently. When the queue is full, submitting blocks the walk
+until a worker is ready (backpressure), so the number of pending jobs and thus memory use stays flat.
+
+Jobs submitted from a worker thread (e.g. a job discovering more files) are queued if there is room and otherwise run
+directly in the worker, so workers never wait for each other.
+With zero workers, or when the scheduler is not running, jobs are run directly in the calling thread.
+"""
+
+# Inbuilt modules
+import threading
+
+# Third party modules
+from six.moves import queue
+
+# CanvasSync modules
+from CanvasSync.utilities import console
+
+
+class DownloadScheduler(object):
+    # Put on the queue to stop a worker thread
+    _STOP = object()
+
+    def __init__(self, workers=4, queue_size=64):
+        """
+        workers    : int | The number of worker threads downloading concurrently, 0 to download in the calling thread
+        queue_size : int | The maximum number of pending download jobs before submitting blocks
+        """
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max(queue_size, 1))
+        self.threads = []
+        self.worker_idents = set()
+
+        # Exceptions raised by jobs in worker threads, re-raised by the join method
+        self.errors = []
+        self.errors_lock = threading.Lock()
+
+        # Set when the scheduler is aborted, pending jobs are then discarded
+        self.aborted = threading.Event()
+
+    def is_running(self):
+        """ Returns True if worker threads are running """
+        return len(self.threads) != 0
+
+    def is_concurrent(self):
+        """ Returns True if jobs are run concurrently by worker threads """
+        return self.workers > 0
+
+    def start(self):
+        """ Start the worker threads """
+        if self.workers <= 0 or self.is_running():
+            return
+
+        self.aborted.clear()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.worker_idents.add(thread.ident)
+            self.threads.append(thread)
+
+    def _in_worker(self):
+        """ [PRIVATE] Returns True if called from one of the worker threads """
+        return threading.current_thread().ident in self.worker_idents
+
+    def _work(self):
+        """ [PRIVATE] Worker thread loop, run jobs from the queue until stopped """
+        while True:
+            job = self.queue.get()
+            try:
+                if job is self._STOP:
+                    return
+                if not self.aborted.is_set():
+                    job()
+            except Exception as e:
+                with self.errors_lock:
+                    self.errors.append(e)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, job):
+        """
+        Submit a download job, a callable taking no arguments.
+        Blocks while the queue is full unless called from a worker thread.
+
+        job : callable | The download job
+        """
+        if not self.is_running():
+            job()
+            return
+
+        # Output printed by the job goes wherever the output of the submitting thread goes
+        job = console.bind(job)
+
+        if self._in_worker():
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                job()
+        else:
+            self.queue.put(job)
+
+    def join(self):
+        """
+        Wait for all submitted jobs to complete and stop the worker threads.
+        The first exception raised by a job, if any, is re-raised.
+        """
+        if not self.is_running():
+            return
+
+        self.queue.join()
+        self._stop()
+
+        if self.errors:
+            error = self.errors[0]
+            self.errors = []
+            raise error
+
+    def abort(self):
+        """
+        Discard all pending jobs and stop the worker threads once the jobs currently running have completed
+        """
+        if not self.is_running():
+            return
+
+        self.aborted.set()
+        self._stop()
+
+    def _stop(self):
+        """ [PRIVATE] Stop and join all worker threads """
+        for _ in self.threads:
+            self.queue.put(self._STOP)
+        for thread in self.threads:
+            thread.join()
+
+        self.threads = []
+        self.worker_idents = set()
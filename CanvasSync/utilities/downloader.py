@@ -0,0 +1,428 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+downloader.py, module
+
+Functions used to download file payloads to the local folder. Payloads are streamed from the socket to a temporary
+'.part' file next to the destination in chunks of a configurable size and the temporary file is renamed onto the
+destination path once complete. The memory used by a download thus stays constant no matter the size of the file, and
+a file at the destination path is never partially written.
+
+Downloads are resumable. If a download is interrupted the '.part' file is kept along with a small '.part.json' sidecar
+file recording the identity of the download (Canvas file ID, expected size and version) and the validator (ETag or
+Last-Modified header) of the response. When the same file is downloaded again, the transfer continues where it
+stopped using a HTTP Range request. The If-Range header makes the server send the full file instead if it has changed.
+Servers that do not support ranges respond with the full file, which is then downloaded from the beginning.
+
+Large files may be downloaded in segments. The '.part' file is preallocated to the expected size of the file and a
+number of byte ranges are fetched in parallel over separate connections, each written to its own region of the file.
+Completed segments are recorded in the sidecar file, so only the missing segments are fetched when resumed.
+
+If a StallPolicy object is specified, transfers that stall or whose connection breaks are aborted and the download is
+resumed right away, see the stall_monitor module.
+"""
+
+# Inbuilt modules
+import io
+import json
+import os
+import re
+import threading
+
+# Third party modules
+from six import text_type
+
+# CanvasSync modules
+from CanvasSync.utilities import helpers
+from CanvasSync.utilities.stall_monitor import TransferStalled
+
+
+def get_part_path(path):
+    """ Returns the path of the temporary file that a download to 'path' is written to """
+    return path + u".part"
+
+
+def get_sidecar_path(path):
+    """ Returns the path of the sidecar file storing information on the partial download to 'path' """
+    return path + u".part.json"
+
+
+def read_sidecar(path):
+    """ Returns the dictionary stored in the sidecar file of a partial download to 'path' or None """
+    try:
+        with io.open(get_sidecar_path(path), u"r", encoding=u"utf-8") as in_file:
+            return json.load(in_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_sidecar(path, info):
+    """ Store a dictionary of information on the partial download to 'path' in its sidecar file """
+    temp_path = get_sidecar_path(path) + u".tmp"
+    with io.open(temp_path, u"w", encoding=u"utf-8") as out_file:
+        out_file.write(text_type(json.dumps(info)))
+
+    # Replace the sidecar file atomically so that it is never read half written
+    helpers.replace_file(temp_path, get_sidecar_path(path))
+
+
+def discard_part(path):
+    """ Delete the '.part' file and sidecar file of a partial download to 'path' """
+    for part_path in (get_part_path(path), get_sidecar_path(path)):
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def complete(path):
+    """ Atomically rename the completed '.part' file of a download onto 'path' and delete the sidecar file """
+    helpers.replace_file(get_part_path(path), path)
+
+    if os.path.exists(get_sidecar_path(path)):
+        os.remove(get_sidecar_path(path))
+
+
+def get_resume_state(path, identity):
+    """
+    Returns a tuple of the number of bytes already downloaded to the '.part' file of 'path' and the validator of the
+    partial download. If the partial download does not match the identity of the file, or no partial download
+    exists, it is discarded and (0, None) is returned.
+
+    path     : string | The local path of the download
+    identity : dict   | A dictionary identifying the file, e.g. the Canvas file ID, size and version
+    """
+    sidecar = read_sidecar(path)
+    part_path = get_part_path(path)
+
+    if not sidecar or not os.path.exists(part_path) or sidecar.get(u"identity") != identity:
+        discard_part(path)
+        return 0, None
+
+    return os.path.getsize(part_path), sidecar.get(u"validator")
+
+
+def get_validator(response):
+    """ Returns the strong validator (ETag or Last-Modified header) of a response or None """
+    etag = response.headers.get(u"ETag")
+    if etag and not etag.startswith(u"W/"):
+        return etag
+    return response.headers.get(u"Last-Modified")
+
+
+def get_content_range(response):
+    """
+    Returns a tuple of the first byte position, last byte position and complete length (None if unknown) of the
+    Content-Range header of a 206 Partial Content response or None
+    """
+    match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", response.headers.get(u"Content-Range", u""))
+    if not match:
+        return None
+
+    total = int(match.group(3)) if match.group(3) != u"*" else None
+    return int(match.group(1)), int(match.group(2)), total
+
+
+def get_range_start(response):
+    """ Returns the first byte position of the Content-Range header of a 206 Partial Content response or None """
+    content_range = get_content_range(response)
+    return content_range[0] if content_range else None
+
+
+def split_ranges(size, segments):
+    """
+    Returns a list of [first, last] byte positions splitting a file of 'size' bytes into 'segments' ranges
+
+    size     : int | The size of the file in bytes
+    segments : int | The number of ranges
+    """
+    segments = max(min(segments, size), 1)
+    bounds = [size * i // segments for i in range(segments + 1)]
+    return [[bounds[i], bounds[i + 1] - 1] for i in range(segments)]
+
+
+def read_chunks(response, path, chunk_size, stall_policy=None):
+    """
+    Generator yielding the body of a requests Response object opened with stream=True in chunks. If a StallPolicy
+    object is specified, the transfer is watched and TransferStalled is raised if it stalls or its connection breaks.
+
+    response     : object | A requests Response object
+    path         : string | The local path the body is written to
+    chunk_size   : int    | The number of bytes read from the connection at a time
+    stall_policy : object | A StallPolicy object or None
+    """
+    if stall_policy is None:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            yield chunk
+        return
+
+    monitor = stall_policy.watch(path, response)
+    try:
+        chunks = response.iter_content(chunk_size=chunk_size)
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            except IOError as e:
+                # A connection shut down by the watchdog or broken while reading, the download may be resumed
+                monitor.raise_if_stalled()
+                raise TransferStalled(u"The connection broke: %s" % e)
+
+            monitor.update(len(chunk))
+            yield chunk
+    finally:
+        monitor.close()
+
+
+def stream_to_file(response, path, chunk_size, offset=0, stall_policy=None, check_size=None):
+    """
+    Stream the body of a requests Response object opened with stream=True to the '.part' file of a local path.
+    The body is appended to the first 'offset' bytes already in the '.part' file. The '.part' file is kept if the
+    download fails or is interrupted so that it may be resumed, unless the file was refused by the check_size function.
+
+    response     : object | A requests Response object
+    path         : string | The local path to store the file at
+    chunk_size   : int    | The number of bytes read from the connection and written to disk at a time
+    offset       : int    | The number of bytes of the '.part' file to keep
+    stall_policy : object | A StallPolicy object aborting the transfer if it stalls, or None
+    check_size   : callable | A function called with the number of bytes received so far, raising an IOError to
+                              refuse the file, e.g. LinkPolicy.check_size. None for no limit.
+    """
+    size = offset
+    try:
+        with open(get_part_path(path), u"ab" if offset else u"wb") as out_file:
+            out_file.truncate(offset)
+            for chunk in read_chunks(response, path, chunk_size, stall_policy):
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if check_size is not None:
+                    try:
+                        check_size(size)
+                    except IOError:
+                        # The file was refused, the '.part' file is not kept to be resumed
+                        out_file.close()
+                        discard_part(path)
+                        raise
+                out_file.write(chunk)
+    finally:
+        response.close()
+
+
+def download(request, path, chunk_size, identity, stall_policy=None, check_size=None):
+    """
+    Download a file to a local path, resuming a previous partial download of the same file if possible.
+    Returns the validator (ETag or Last-Modified header) of the download or None.
+
+    request      : callable | A function taking a dictionary of extra request headers and returning a requests
+                              Response object opened with stream=True
+    path         : string   | The local path to store the file at
+    chunk_size   : int      | The number of bytes read from the connection and written to disk at a time
+    identity     : dict     | A dictionary identifying the file, a partial download is only resumed if it has the
+                              same identity. E.g. the Canvas file ID, size and version.
+    stall_policy : object   | A StallPolicy object, a stalled download is aborted and resumed. None to not watch.
+    check_size   : callable | A function called with the number of bytes received so far, raising an IOError to
+                              refuse the file, see stream_to_file. None for no limit.
+    """
+    if stall_policy is not None:
+        return stall_policy.retry(lambda: _download(request, path, chunk_size, identity, stall_policy, check_size),
+                                  path)
+    return _download(request, path, chunk_size, identity, check_size=check_size)
+
+
+def _download(request, path, chunk_size, identity, stall_policy=None, check_size=None):
+    """ [PRIVATE] Download a file to a local path once, see download """
+    offset, validator = get_resume_state(path, identity)
+
+    if offset and offset == identity.get(u"size"):
+        # The previous download completed but was not renamed
+        complete(path)
+        return validator
+
+    headers = {}
+    if offset:
+        headers[u"Range"] = u"bytes=%s-" % offset
+        if validator:
+            headers[u"If-Range"] = validator
+
+    response = request(headers)
+
+    if offset and response.status_code == 416:
+        # The range could not be satisfied, start over
+        response.close()
+        discard_part(path)
+        offset, response = 0, request({})
+
+    if response.status_code == 206 and get_range_start(response) == offset:
+        # The server continues the partial download
+        pass
+    elif response.status_code == 200:
+        # Full download, either a new download or the server does not support or refused the range
+        offset = 0
+    else:
+        response.close()
+        raise IOError(u"Download of %s failed with HTTP status %s" % (path, response.status_code))
+
+    validator = get_validator(response)
+    write_sidecar(path, {u"identity": identity, u"validator": validator})
+
+    stream_to_file(response, path, chunk_size, offset=offset, stall_policy=stall_policy, check_size=check_size)
+    complete(path)
+
+    return validator
+
+
+def write_segment(response, path, first, last, chunk_size, stall_policy=None):
+    """
+    Stream the body of a 206 Partial Content response to the byte range [first, last] of the preallocated '.part' file
+    of a local path. Raises IOError if the response body does not fill the range exactly.
+
+    response     : object | A requests Response object
+    path         : string | The local path to store the file at
+    first, last  : int    | The first and last byte position of the range
+    chunk_size   : int    | The number of bytes read from the connection and written to disk at a time
+    stall_policy : object | A StallPolicy object aborting the transfer if it stalls, or None
+    """
+    written = 0
+    try:
+        with open(get_part_path(path), u"r+b") as out_file:
+            out_file.seek(first)
+            for chunk in read_chunks(response, path, chunk_size, stall_policy):
+                if not chunk:
+                    continue
+                if first + written + len(chunk) > last + 1:
+                    raise IOError(u"Segment %s-%s of %s exceeded its range" % (first, last, path))
+                out_file.write(chunk)
+                written += len(chunk)
+    finally:
+        response.close()
+
+    if written != last - first + 1:
+        raise IOError(u"Segment %s-%s of %s ended after %s bytes" % (first, last, path, written))
+
+
+def download_segmented(request, path, chunk_size, identity, segments, stall_policy=None):
+    """
+    Download a file to a local path as a number of byte ranges fetched in parallel into a preallocated '.part' file.
+    The size of the downloaded file is verified against the expected size. A previous partial segmented download of
+    the same file is resumed by fetching only the missing segments. Returns the validator of the download or None.
+
+    The first missing segment is requested first. If the server does not respond with the requested range (it does
+    not support ranges, or the file changed since the partial download) the file is downloaded over that single
+    connection instead.
+
+    request      : callable | A function taking a dictionary of extra request headers and returning a requests
+                              Response object opened with stream=True
+    path         : string   | The local path to store the file at
+    chunk_size   : int      | The number of bytes read from the connection and written to disk at a time
+    identity     : dict     | A dictionary identifying the file, must store the expected size of the file under
+                              'size'
+    segments     : int      | The number of byte ranges fetched in parallel
+    stall_policy : object   | A StallPolicy object, a download with a stalled segment is aborted and the missing
+                              segments are fetched again. None to not watch.
+    """
+    if stall_policy is not None:
+        return stall_policy.retry(lambda: _download_segmented(request, path, chunk_size, identity, segments,
+                                                              stall_policy), path)
+    return _download_segmented(request, path, chunk_size, identity, segments)
+
+
+def _download_segmented(request, path, chunk_size, identity, segments, stall_policy=None):
+    """ [PRIVATE] Download a file to a local path as a number of byte ranges once, see download_segmented """
+    size = identity[u"size"]
+    ranges = split_ranges(size, segments)
+
+    # The segment layout is part of the identity, a partial single stream download is not resumed as segments
+    segmented_identity = dict(identity, segments=len(ranges))
+
+    sidecar = read_sidecar(path)
+    if sidecar and os.path.exists(get_part_path(path)) and sidecar.get(u"identity") == segmented_identity:
+        completed = sidecar.get(u"completed", [])
+        validator = sidecar.get(u"validator")
+    else:
+        discard_part(path)
+        completed, validator = [], None
+
+    missing = [byte_range for byte_range in ranges if byte_range not in completed]
+
+    def get_range(first, last):
+        headers = {u"Range": u"bytes=%s-%s" % (first, last)}
+        if validator:
+            headers[u"If-Range"] = validator
+        return request(headers)
+
+    if missing:
+        first, last = missing[0]
+        response = get_range(first, last)
+
+        if response.status_code != 206 or get_content_range(response) != (first, last, size):
+            if response.status_code != 200:
+                response.close()
+                raise IOError(u"Download of %s failed with HTTP status %s" % (path, response.status_code))
+
+            # Ranges are not supported or the file changed, download the full response instead
+            discard_part(path)
+            validator = get_validator(response)
+            write_sidecar(path, {u"identity": identity, u"validator": validator})
+            stream_to_file(response, path, chunk_size, stall_policy=stall_policy)
+            if os.path.getsize(get_part_path(path)) != size:
+                discard_part(path)
+                raise IOError(u"Download of %s did not match the expected size of %s bytes" % (path, size))
+            complete(path)
+            return validator
+
+        if not completed:
+            validator = get_validator(response)
+            with open(get_part_path(path), u"wb") as out_file:
+                out_file.truncate(size)
+
+        sidecar_lock = threading.Lock()
+        errors = []
+
+        def save_progress(byte_range):
+            with sidecar_lock:
+                completed.append(byte_range)
+                write_sidecar(path, {u"identity": segmented_identity,
+                                     u"validator": validator,
+                                     u"completed": completed})
+
+        def fetch(byte_range, segment_response=None):
+            try:
+                if segment_response is None:
+                    segment_response = get_range(*byte_range)
+                    if segment_response.status_code != 206 or \
+                            get_content_range(segment_response) != (byte_range[0], byte_range[1], size):
+                        segment_response.close()
+                        raise IOError(u"Server did not return bytes %s-%s of %s" % (byte_range[0], byte_range[1],
+                                                                                    path))
+                write_segment(segment_response, path, byte_range[0], byte_range[1], chunk_size, stall_policy)
+                save_progress(byte_range)
+            except Exception as e:
+                errors.append(e)
+
+        write_sidecar(path, {u"identity": segmented_identity, u"validator": validator, u"completed": completed})
+
+        threads = [threading.Thread(target=fetch, args=(byte_range,)) for byte_range in missing[1:]]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        # The first segment is written by the calling thread over the connection already opened
+        fetch(missing[0], response)
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            # The completed segments are kept in the '.part' file and the download is resumed on the next run
+            raise errors[0]
+
+    if os.path.getsize(get_part_path(path)) != size:
+        discard_part(path)
+        raise IOError(u"Download of %s did not match the expected size of %s bytes" % (path, size))
+
+    complete(path)
+
+    return validator
@@ -0,0 +1,57 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+entity_index.py, module
+
+Implements the EntityIndex object, the registry of the CanvasEntity objects added to the hierarchy of a course. The
+Synchronizer keeps one EntityIndex per course. Entities are stored in a hash map under their identifier string (e.g.
+'file'), so that the IDs of all entities of a kind are found without scanning the whole hierarchy, as done by the
+Folder object to skip files that are already synced elsewhere in the course.
+
+Entities of different courses may be added from different threads, the index is guarded by a lock.
+"""
+
+# Inbuilt modules
+import threading
+
+
+class EntityIndex(object):
+    def __init__(self):
+        # Lists of entities in the order they were added, all and stored under their identifier string
+        self.entities = []
+        self.by_identifier = {}
+
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        """ Returns the number of entities in the index """
+        with self.lock:
+            return len(self.entities)
+
+    def add(self, entity):
+        """
+        Add a CanvasEntity object to the index
+
+        entity : object | A CanvasEntity object
+        """
+        identifier = entity.get_identifier_string()
+        with self.lock:
+            self.entities.append(entity)
+            self.by_identifier.setdefault(identifier, []).append(entity)
+
+    def get_all(self):
+        """ Returns a list of all entities in the order they were added """
+        with self.lock:
+            return list(self.entities)
+
+    def get_ids(self, identifier):
+        """
+        Returns a set of the IDs of the entities of a kind
+
+        identifier : string | The identifier string of the entities, e.g. 'file'
+        """
+        with self.lock:
+            return set(entity.get_id() for entity in self.by_identifier.get(identifier, []))
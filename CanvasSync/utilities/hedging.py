@@ -0,0 +1,193 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+hedging.py, module
+
+Implements the Hedger object used by the InstructureApi object to cut the tail latency of metadata API calls.
+Most API calls are answered quickly, but a few take many times longer and the walk of the folder hierarchy waits for
+each of them. A hedged request is sent normally, and if no response has arrived after a percentile of the latencies
+observed so far (e.g. the 95th), a duplicate request is sent. Whichever response arrives first is used and the other
+is discarded (closed, so that its pooled connection is released) when it arrives.
+
+Only the sending of a single request is hedged. Retries after a failed request and the backoff before them are not,
+as a backoff is not a slow response.
+
+Only idempotent GET requests are hedged. Duplicates are limited by a budget, a fraction of the number of
+requests, so that a slow server is not flooded with twice the requests. Requests are not hedged before enough
+latencies have been observed to estimate the percentile.
+
+A single Hedger object is shared by all API objects calling the same Canvas server, see get_hedger.
+"""
+
+# Inbuilt modules
+import collections
+import threading
+import time
+
+# Third party modules
+from six.moves import queue
+
+
+class Hedger(object):
+    def __init__(self, percentile=95, budget=0.05, min_samples=20, window=500):
+        """
+        percentile  : float | The percentile of observed latencies after which a duplicate request is sent
+        budget      : float | The maximum number of duplicate requests as a fraction of the number of requests
+        min_samples : int   | The number of latencies observed before requests are hedged
+        window      : int   | The number of most recent latencies the percentile is computed from
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+        self.latencies = collections.deque(maxlen=window)
+
+        # Counters exposed by get_stats
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, latency):
+        """
+        Record the latency of a request
+
+        latency : float | The number of seconds until the response arrived
+        """
+        with self.lock:
+            self.latencies.append(latency)
+
+    def get_delay(self):
+        """ Returns the number of seconds after which a duplicate request is sent, None if too few latencies """
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = sorted(self.latencies)
+
+        index = min(int(len(latencies) * self.percentile / 100.0), len(latencies) - 1)
+        return latencies[index]
+
+    def can_hedge(self):
+        """ Returns True if the budget allows one more duplicate request """
+        with self.lock:
+            return self.hedges + 1 <= self.budget * self.requests
+
+    def _take_hedge(self):
+        """ [PRIVATE] Count a duplicate request if the budget allows it, returns True if counted """
+        with self.lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(self, fetch, discard=None):
+        """
+        Returns the result of a request, sending a duplicate request if the first is slower than the percentile of
+        observed latencies and the budget allows it. An exception is only raised if all requests sent failed.
+        The latency recorded is the time until the first successful response, the response that lost is not waited
+        for but passed to the discard function in the background when it arrives.
+
+        fetch   : callable | A function taking no arguments sending the request and returning the response
+        discard : callable | A function called with the result of a request that lost, e.g. closing the response
+        """
+        with self.lock:
+            self.requests += 1
+
+        start_time = time.time()
+        delay = self.get_delay()
+        if delay is None or not self.can_hedge():
+            result = fetch()
+            self.record(time.time() - start_time)
+            return result
+
+        results = queue.Queue()
+
+        def attempt(hedged):
+            try:
+                results.put((True, fetch(), hedged))
+            except Exception as e:
+                results.put((False, e, hedged))
+
+        def start(hedged):
+            thread = threading.Thread(target=attempt, args=(hedged,))
+            thread.daemon = True
+            thread.start()
+
+        start(False)
+        pending = 1
+        try:
+            outcome = results.get(timeout=delay)
+        except queue.Empty:
+            if self._take_hedge():
+                start(True)
+                pending += 1
+            outcome = results.get()
+        pending -= 1
+
+        # If the first request to complete failed, wait for the other one
+        while not outcome[0] and pending:
+            outcome = results.get()
+            pending -= 1
+
+        if pending and discard is not None:
+            self._discard_later(results, pending, discard)
+
+        succeeded, result, hedged = outcome
+        if not succeeded:
+            raise result
+
+        self.record(time.time() - start_time)
+        if hedged:
+            with self.lock:
+                self.hedge_wins += 1
+        return result
+
+    @staticmethod
+    def _discard_later(results, pending, discard):
+        """
+        [PRIVATE] Pass the results of requests still pending to the discard function as they arrive, in the background
+
+        results : object   | The Queue object the pending requests put their outcome in
+        pending : int      | The number of requests still pending
+        discard : callable | The function called with each successful result
+        """
+        def drain():
+            for _ in range(pending):
+                succeeded, result, _ = results.get()
+                if succeeded:
+                    discard(result)
+
+        thread = threading.Thread(target=drain)
+        thread.daemon = True
+        thread.start()
+
+    def get_stats(self):
+        """ Returns a dictionary of the current delay and counters of requests, duplicates and duplicates that won """
+        delay = self.get_delay()
+        with self.lock:
+            return {u"delay": delay,
+                    u"requests": self.requests,
+                    u"hedges": self.hedges,
+                    u"hedge_wins": self.hedge_wins}
+
+
+# Hedger objects shared by all API objects, stored under the domain of the server they call
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(domain, percentile=95, budget=0.05):
+    """
+    Returns the Hedger object of a Canvas server, created on first call
+
+    domain     : string | The domain of the Canvas server
+    percentile : float  | The percentile of observed latencies after which a duplicate is sent, used when created
+    budget     : float  | The maximum number of duplicates as a fraction of requests, used when created
+    """
+    with _hedgers_lock:
+        if domain not in _hedgers:
+            _hedgers[domain] = Hedger(percentile=percentile, budget=budget)
+        return _hedgers[domain]
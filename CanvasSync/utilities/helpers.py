@@ -19,9 +19,13 @@ from __future__ import print_function
 
 # Inbuilt modules
 import os
+import re
 
 # Third party modules
-import requests
+from six.moves import intern
+
+# CanvasSync modules
+from CanvasSync.utilities import http_pool
 
 
 def reorganize(items):
@@ -75,6 +79,15 @@ def reorganize(items):
     return outer_scope_files, sub_folders
 
 
+def find_api_endpoints(html_body):
+    """
+    Returns a list of the Canvas API URLs of all items (files, pages) that are linked to in a HTML body
+
+    html_body : string | A string of HTML, may be None
+    """
+    return re.findall(r'data-api-endpoint=\"(.*?)\"', html_body or u"")
+
+
 def clear_console():
     """ Clears the console on UNIX and Windows """
     os.system(u'cls' if os.name == u'nt' else u'clear')
@@ -118,13 +131,58 @@ def get_corrected_name(name):
     return name
 
 
+def replace_file(source, destination):
+    """
+    Atomically rename the file at the source path onto the destination path, replacing the destination if it exists.
+
+    source      : string | The path of the file to move
+    destination : string | The path to move the file to
+    """
+    if hasattr(os, u"replace"):
+        os.replace(source, destination)
+    else:
+        # Python 2, os.rename does not replace existing files on Windows
+        if os.name == u"nt" and os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
+
+
+def intern_string(string):
+    """
+    Returns the interned version of a string, so that equal strings stored by many objects (e.g. the names of files
+    listed in several places) are stored once. Strings that can not be interned (unicode strings on Python 2) are
+    returned unchanged.
+
+    string : string | The string to intern
+    """
+    try:
+        return intern(string)
+    except TypeError:
+        return string
+
+
+def compact_info(info, fields):
+    """
+    Returns a dictionary holding only the specified fields of a dictionary of information on a Canvas object. The
+    dictionaries returned by the server hold many fields that are never used, a compact copy is stored instead when
+    many objects are kept in memory. The keys of the copy are the (interned) field names, shared by all copies. A
+    dictionary holding no other fields is returned as is, so that it may be shared by several objects.
+
+    info   : dict  | A dictionary of information on a Canvas object
+    fields : tuple | The names of the fields to keep, missing fields are left out
+    """
+    if len(info) <= len(fields) and all(key in fields for key in info):
+        return info
+    return {field: info[field] for field in fields if field in info}
+
+
 def validate_domain(domain):
     """
     Validate the the specified domain is a valid Canvas domain by
     interpreting the HTTP response
     """
     try:
-        response = requests.get(domain + u"/api/v1/courses", timeout=5)
+        response = http_pool.get_pool().get(domain + u"/api/v1/courses", timeout=5)
         if response.status_code==401:
             # If this response, the server exists and understands
             # the API call but complains that the call was
@@ -138,17 +196,23 @@ def validate_domain(domain):
         return False
 
 
-def validate_token(domain, token):
+def validate_token(domain, token, api=None):
     """
     Validate the auth token in combination with the domain by interpreting the HTTP response. Should be called
     after the validate_domain function to make sure that errors arise from the token.
+
+    If an InstructureApi object using the domain and token is specified, the request is made through it so that the
+    response is shared with the first request for the list of courses.
     """
     if len(token) < 20:
         print(u"The server did not accept the authentication token.")
         return False
 
-    response = str(requests.get(domain + u"/api/v1/courses",
-                                headers={u'Authorization': u"Bearer %s" % token}).text)
+    if api is not None:
+        response = api.get_text(u"/api/v1/courses?per_page=100")
+    else:
+        response = str(http_pool.get_pool().get(domain + u"/api/v1/courses",
+                                                headers={u'Authorization': u"Bearer %s" % token}).text)
 
     if u"Invalid access token" in response:
         print(u"The server did not accept the authentication token.")
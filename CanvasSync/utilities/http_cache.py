@@ -0,0 +1,210 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+http_cache.py, module
+
+Implements the HttpCache object, a persistent cache of API responses stored in a folder in the home directory of the
+user. Each response body is stored along with its 'ETag' and 'Last-Modified' headers under the URL it was requested from
+and the user it was requested by, as the responses of the same URL differ between users and may hold URLs only valid for
+the user (e.g. download URLs with a verifier). Users are identified by a hash of the domain and the access token, see
+get_user_key. When the same user requests the same URL again, the InstructureApi object sends these as 'If-None-Match'
+and 'If-Modified-Since' headers. If the resource has not changed the server answers '304 Not Modified' without a body
+and the response is served from the cache.
+
+The total size of the cache is bounded, the least recently used responses are deleted when the size is exceeded.
+The least recently used order is kept across runs through the modification times of the cache files.
+
+The cache folder is only accessible to the user running CanvasSync (mode 0700) and the cache files only readable and
+writable by this user (mode 0600).
+"""
+
+# Inbuilt modules
+import collections
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+
+# Third party modules
+from six import text_type
+
+# CanvasSync modules
+from CanvasSync.utilities import helpers
+
+
+class HttpCache(object):
+    def __init__(self, directory, max_size=100 * 1024 * 1024):
+        """
+        directory : string | The folder storing the cached responses, created if not existing
+        max_size  : int    | The maximum total size of the cached responses in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        self._make_directory()
+
+        # The sizes of the cache files stored under their name, ordered from least to most recently used
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+        names = [name for name in os.listdir(self.directory) if name.endswith(u".json")]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        for name in names:
+            self.entries[name] = os.path.getsize(os.path.join(self.directory, name))
+            self.size += self.entries[name]
+
+        with self.lock:
+            self._evict()
+
+    def _make_directory(self):
+        """ [PRIVATE] Create the cache folder if not existing and make it only accessible to the current user """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, 0o700)
+        os.chmod(self.directory, 0o700)
+
+    @staticmethod
+    def get_name(url, user):
+        """
+        Returns the name of the file storing the response of a URL requested by a user
+
+        url  : string | The requested URL
+        user : string | The key of the user, see get_user_key
+        """
+        return hashlib.sha1((user + u" " + url).encode(u"utf-8")).hexdigest() + u".json"
+
+    def get(self, url, user):
+        """
+        Returns a dictionary storing the cached response of a URL under the keys 'etag', 'last_modified', 'body' and
+        'next' (the API call pointing to the next page of a paginated list) or None if not cached
+
+        url  : string | The requested URL
+        user : string | The key of the user requesting the URL, see get_user_key
+        """
+        name = self.get_name(url, user)
+        path = os.path.join(self.directory, name)
+
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries[name] = self.entries.pop(name)
+
+        try:
+            with io.open(path, u"r", encoding=u"utf-8") as in_file:
+                entry = json.load(in_file)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+
+        return entry if entry.get(u"url") == url and entry.get(u"user") == user else None
+
+    def put(self, url, user, etag, last_modified, body, next_call=None):
+        """
+        Store a response in the cache. Responses without a validator can not be revalidated and are not stored.
+
+        url           : string | The requested URL
+        user          : string | The key of the user that requested the URL, see get_user_key
+        etag          : string | The 'ETag' header of the response
+        last_modified : string | The 'Last-Modified' header of the response
+        body          : string | The body of the response
+        next_call     : string | The API call pointing to the next page of a paginated list, if any
+        """
+        if not etag and not last_modified:
+            return
+
+        name = self.get_name(url, user)
+        path = os.path.join(self.directory, name)
+        temp_path = u"%s.%s.tmp" % (path, threading.current_thread().ident)
+
+        # The file is created readable by the current user only, the mode is kept when replacing the cache file
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with io.open(descriptor, u"w", encoding=u"utf-8") as out_file:
+            out_file.write(text_type(json.dumps({u"url": url,
+                                                 u"user": user,
+                                                 u"etag": etag,
+                                                 u"last_modified": last_modified,
+                                                 u"next": next_call,
+                                                 u"body": body})))
+        helpers.replace_file(temp_path, path)
+
+        with self.lock:
+            self.size -= self.entries.pop(name, 0)
+            self.entries[name] = os.path.getsize(path)
+            self.size += self.entries[name]
+            self._evict()
+
+    def _evict(self):
+        """ [PRIVATE] Delete the least recently used responses until the cache is within its maximum size """
+        while self.size > self.max_size and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def clear(self):
+        """ Delete all cached responses """
+        with self.lock:
+            clear(self.directory)
+            self._make_directory()
+            self.entries.clear()
+            self.size = 0
+
+
+def get_conditional_headers(entry):
+    """
+    Returns a dictionary of the headers making a request conditional on the cached response having changed
+
+    entry : dict | A cached response as returned by HttpCache.get, or None
+    """
+    headers = {}
+    if entry:
+        if entry.get(u"etag"):
+            headers[u"If-None-Match"] = entry[u"etag"]
+        if entry.get(u"last_modified"):
+            headers[u"If-Modified-Since"] = entry[u"last_modified"]
+    return headers
+
+
+def get_user_key(domain, token):
+    """
+    Returns the key identifying the user of an access token in the cache, a hash of the domain and the token
+
+    domain : string | The domain of the Canvas server
+    token  : string | The access token of the user
+    """
+    return hashlib.sha256((domain + u" " + token).encode(u"utf-8")).hexdigest()
+
+
+# HttpCache objects shared by all API objects, stored under their folder
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def open_cache(directory, max_size):
+    """
+    Returns the HttpCache object storing responses in a folder, created on first call
+
+    directory : string | The folder storing the cached responses
+    max_size  : int    | The maximum total size of the cached responses in bytes
+    """
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = HttpCache(directory, max_size)
+        return _caches[directory]
+
+
+def clear(directory):
+    """
+    Delete a cache folder and all responses stored in it
+
+    directory : string | The folder storing the cached responses
+    """
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
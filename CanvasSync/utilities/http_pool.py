@@ -0,0 +1,149 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+http_pool.py, module
+
+Implements the HttpPool object, a shared connection-pool layer used for all HTTP traffic of CanvasSync (API calls,
+settings validation and file downloads). A single requests Session, and thus a pool of keep-alive connections, is
+kept per host. Redirects are followed manually so that a request redirected from the Canvas server to the file CDN
+reuses the pooled connections of the CDN host instead of opening a new TCP+TLS connection.
+
+The module holds a default HttpPool object that is configured once from the Settings object and fetched with
+get_pool() wherever a request is made.
+"""
+
+# Inbuilt modules
+import threading
+
+# Third party modules
+import requests
+from requests.adapters import HTTPAdapter
+from six.moves.urllib.parse import urljoin, urlsplit
+
+
+class HttpPool(object):
+    def __init__(self, pool_size=10, keep_alive=True, max_redirects=30, timeout=(10, 60)):
+        """
+        pool_size     : int     | The maximum number of connections kept open to each host
+        keep_alive    : boolean | Keep connections open for reuse between requests
+        max_redirects : int     | The maximum number of redirects followed per request
+        timeout       : tuple   | The default (connect, read) timeout of requests in seconds
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.max_redirects = max_redirects
+        self.timeout = timeout
+
+        # A dictionary of requests Session objects stored under the host name they connect to
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def _make_session(self):
+        """ [PRIVATE] Returns a new requests Session object mounted with a connection pool of the configured size """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount(u"https://", adapter)
+        session.mount(u"http://", adapter)
+
+        if not self.keep_alive:
+            session.headers[u"Connection"] = u"close"
+
+        return session
+
+    def get_session(self, url):
+        """
+        Returns the Session object of the host that the url points to, a new Session is made on the first request
+        to a host.
+
+        url : string | Any absolute URL
+        """
+        host = urlsplit(url).netloc.lower()
+
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = self._make_session()
+                self.sessions[host] = session
+
+        return session
+
+    def request(self, method, url, headers=None, **kwargs):
+        """
+        Make a request through the Session of the host that the url points to. Redirects are followed through the
+        Session of the host that is redirected to. The Authorization header is only sent to the original host.
+
+        method  : string | The HTTP method, e.g. "GET"
+        url     : string | An absolute URL
+        headers : dict   | A dictionary of request headers
+        kwargs  : Additional keyword arguments passed to requests.Session.request
+        """
+        headers = dict(headers or {})
+        host = urlsplit(url).netloc.lower()
+        kwargs.setdefault(u"timeout", self.timeout)
+
+        for _ in range(self.max_redirects + 1):
+            response = self.get_session(url).request(method, url, headers=headers,
+                                                     allow_redirects=False, **kwargs)
+            if not response.is_redirect:
+                return response
+
+            # Follow the redirect, the body of the redirect response is consumed to release the connection to the pool
+            url = urljoin(url, response.headers[u"location"])
+            response.content
+            response.close()
+
+            if response.status_code == 303:
+                method = u"GET"
+
+            if urlsplit(url).netloc.lower() != host:
+                headers.pop(u"Authorization", None)
+
+        raise requests.TooManyRedirects(u"Exceeded %s redirects." % self.max_redirects)
+
+    def get(self, url, **kwargs):
+        """ Make a GET request, see the request method """
+        return self.request(u"GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        """ Make a HEAD request, see the request method """
+        return self.request(u"HEAD", url, **kwargs)
+
+    def close(self):
+        """ Close all Session objects and the connections they hold """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ Returns the default HttpPool object, initialized with default settings if not yet configured """
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HttpPool()
+        return _default_pool
+
+
+def configure(pool_size=10, keep_alive=True, timeout=(10, 60)):
+    """
+    Replace the default HttpPool object with one initialized with the specified settings
+
+    pool_size  : int     | The maximum number of connections kept open to each host
+    keep_alive : boolean | Keep connections open for reuse between requests
+    timeout    : tuple   | The default (connect, read) timeout of requests in seconds
+    """
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+        _default_pool = HttpPool(pool_size=pool_size, keep_alive=keep_alive, timeout=timeout)
@@ -9,16 +9,65 @@ instructure_api.py
 The InstructureApi object is initialized with a Settings object from the CanvasSync.py module.
 This class implements the basic API calling functionality to the Canvas by Instructure server.
 
-requests is used to do https communication with the server. The server domain and authentication token is
-loaded from the Settings object. The Instructure API uses the JSON format to transmit data objects over the internet
-in attribute-value pairs. The json module is used to easily convert this format into a Python dictionary object.
+requests is used through the pooled sessions of the http_pool module to do https communication with the server. The
+server domain and authentication token is loaded from the Settings object. The Instructure API uses the JSON format to
+transmit data objects over the internet in attribute-value pairs. The json module is used to easily convert this format
+into a Python dictionary object.
 
 The InstructureApi object implements various methods that will fetch resources from the server such as lists of courses,
-modules and files that the user has authentication to access.
+modules and files that the user has authentication to access. List resources are paginated by the server; the
+get_json_list method follows the 'Link' response headers and yields items page by page as they arrive.
+
+JSON responses are stored in the persistent cache of the http_cache module and revalidated with conditional requests,
+so resources that have not changed since the last run are not transferred again.
+
+Requests that fail because of a flaky connection or server are retried, see the retry_policy module. If a request
+still fails, an InstructureApiError is raised so that the entity making the request is reported as failed.
 """
 import json
+import threading
+import time
+
 import requests
 
+from CanvasSync.utilities import http_pool
+from CanvasSync.utilities import http_cache
+from CanvasSync.utilities import request_coalescer
+from CanvasSync.utilities import rate_limiter
+from CanvasSync.utilities import retry_policy
+from CanvasSync.utilities import hedging
+from CanvasSync.utilities.retry_policy import InstructureApiError
+from CanvasSync.utilities import downloader
+from CanvasSync.utilities import stall_monitor
+from CanvasSync.utilities import link_policy
+
+
+class _PageFetcher(threading.Thread):
+    """
+    Background thread used by InstructureApi.get_json_list to fetch the next page of a paginated list
+    while the items of the current page are being consumed.
+    """
+    def __init__(self, api, api_call):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.api = api
+        self.api_call = api_call
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.api.get_json_page(self.api_call)
+        except Exception as e:
+            self.error = e
+
+    def get_result(self):
+        """ Wait for the page to arrive and return it, re-raising any error from the background thread """
+        self.join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
 
 class InstructureApi(object):
     def __init__(self, settings):
@@ -27,14 +76,239 @@ class InstructureApi(object):
         """
         self.settings = settings
 
-    def _get(self, api_call):
+        # The HttpCache object storing API responses, opened on first use, see get_cache
+        self.cache = None
+
+        # The StallPolicy object watching file downloads, made on first use, see get_stall_policy
+        self.stall_policy = None
+
+        # The LinkPolicy object checking linked file downloads, made on first use, see get_link_policy
+        self.link_policy = None
+
+    def _get(self, api_call, stream=False, headers=None, hedged=False):
         """
         [PRIVATE] Implements the basic GET call to the API. The get_json method wraps around this method.
 
+        A request failing with a connection error, a timeout or a transient HTTP status is retried after a jittered
+        exponential backoff. An InstructureApiError is raised if all attempts fail or if the circuit of the endpoint
+        is open, see the retry_policy module.
+
+        api_call : string  | Any call to the Instructure API ("/api/v1/courses" for instance)
+        stream   : boolean | Do not download the response body before returning
+        headers  : dict    | Extra request headers, e.g. a Range header
+        hedged   : boolean | Send a duplicate of each attempt if slow to respond, see _send_hedged
+        """
+        policy = self.get_retry_policy()
+        breaker = self.get_breaker(api_call)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise InstructureApiError(u"Too many failed requests to %s, not retrying for now"
+                                          % retry_policy.get_endpoint(api_call), api_call)
+
+            response = None
+            try:
+                if hedged:
+                    response = self._send_hedged(api_call, headers)
+                else:
+                    response = self._send(api_call, stream, headers)
+            except requests.RequestException as e:
+                error = InstructureApiError(u"Request to %s failed: %s" % (api_call, e), api_call)
+            except BaseException:
+                # Not retried, but a failed or cancelled trial request must not leave the circuit half-open
+                breaker.record_failure()
+                raise
+            else:
+                if not policy.is_retryable_status(response.status_code):
+                    breaker.record_success()
+                    return response
+                error = InstructureApiError(u"Request to %s failed with HTTP status %s"
+                                            % (api_call, response.status_code), api_call, response.status_code)
+
+            breaker.record_failure()
+            delay = policy.get_delay(attempt, response.headers.get(u"Retry-After") if response is not None else None)
+            if response is not None:
+                response.close()
+            if delay is None:
+                raise error
+
+            time.sleep(delay)
+            attempt += 1
+
+    def get_retry_policy(self):
+        """ Returns a RetryPolicy object configured by the 'request_retries' setting """
+        return retry_policy.RetryPolicy(max_retries=self.settings.request_retries)
+
+    def get_breaker(self, api_call):
+        """ Returns the CircuitBreaker object guarding the endpoint of an API call """
+        return retry_policy.get_breaker(self.settings.domain, api_call,
+                                        threshold=self.settings.breaker_threshold,
+                                        cooldown=self.settings.breaker_cooldown)
+
+    def get_timeout(self):
+        """ Returns the (connect, read) timeout of requests in seconds """
+        return self.settings.connect_timeout, self.settings.read_timeout
+
+    def _send(self, api_call, stream=False, headers=None):
+        """
+        [PRIVATE] Send a single GET request to the API, see _get. The request waits for a place in the window of the
+        RateLimiter object before it is sent, and is resent after a backoff if the server responds that the rate limit
+        is exceeded.
+
+        api_call : string  | Any call to the Instructure API ("/api/v1/courses" for instance)
+        stream   : boolean | Do not download the response body before returning
+        headers  : dict    | Extra request headers, e.g. a Range header
+        """
+        request_headers = dict(headers or {})
+        request_headers[u'Authorization'] = u"Bearer %s" % self.settings.token
+
+        limiter = self.get_limiter()
+        if limiter is None:
+            return http_pool.get_pool().get(u"%s%s" % (self.settings.domain, api_call),
+                                            headers=request_headers,
+                                            stream=stream,
+                                            timeout=self.get_timeout())
+
+        attempt = 0
+        while True:
+            limiter.acquire()
+            throttled = False
+            try:
+                response = http_pool.get_pool().get(u"%s%s" % (self.settings.domain, api_call),
+                                                    headers=request_headers,
+                                                    stream=stream,
+                                                    timeout=self.get_timeout())
+                body = response.text if response.status_code == 403 else u""
+                throttled = limiter.update(response.status_code, response.headers, body)
+            finally:
+                limiter.release()
+
+            if not throttled:
+                return response
+
+            delay = limiter.get_backoff(attempt)
+            if delay is None:
+                response.close()
+                raise InstructureApiError(u"Request to %s was refused, the rate limit is exceeded" % api_call,
+                                          api_call, response.status_code)
+
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get_limiter(self):
+        """ Returns the RateLimiter object of the Canvas server, None if disabled by the 'rate_limit' setting """
+        if not self.settings.rate_limit:
+            return None
+        return rate_limiter.get_limiter(self.settings.domain,
+                                        window=self.settings.rate_limit_window,
+                                        max_window=self.settings.rate_limit_max_window)
+
+    def get_rate_limit_stats(self):
+        """ Returns a dictionary of the window and throttling stats of the RateLimiter object, None if disabled """
+        limiter = self.get_limiter()
+        return limiter.get_stats() if limiter is not None else None
+
+    def get_hedger(self):
+        """ Returns the Hedger object of the Canvas server, None if disabled by the 'hedge_requests' setting """
+        if not self.settings.hedge_requests:
+            return None
+        return hedging.get_hedger(self.settings.domain,
+                                  percentile=self.settings.hedge_percentile,
+                                  budget=self.settings.hedge_budget)
+
+    def get_hedge_stats(self):
+        """ Returns a dictionary of the delay and duplicate request stats of the Hedger object, None if disabled """
+        hedger = self.get_hedger()
+        return hedger.get_stats() if hedger is not None else None
+
+    def _get_hedged(self, api_call, headers=None):
+        """
+        [PRIVATE] GET call for metadata, a duplicate request is sent if the response is slow to arrive, see the
+        hedging module. Only used for idempotent requests whose body is read before returning.
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        headers  : dict   | Extra request headers
+        """
+        return self._get(api_call, headers=headers, hedged=self.get_hedger() is not None)
+
+    def _send_hedged(self, api_call, headers=None):
+        """
+        [PRIVATE] Send a single GET request to the API, see _send, and a duplicate if the response is slow to arrive.
+        The response that loses is closed. Retries are made by _get around this method, so a backoff is never hedged.
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        headers  : dict   | Extra request headers
+        """
+        return self.get_hedger().run(lambda: self._send(api_call, headers=headers),
+                                     discard=lambda response: response.close())
+
+    def get_cache(self):
+        """ Returns the HttpCache object, None if disabled by the 'http_cache' setting """
+        if self.cache is None and self.settings.http_cache:
+            self.cache = http_cache.open_cache(self.settings.cache_path, self.settings.http_cache_size)
+        return self.cache
+
+    def get_cache_user(self):
+        """ Returns the key of the user in the HttpCache, see http_cache.get_user_key """
+        return http_cache.get_user_key(self.settings.domain, self.settings.token)
+
+    def get_coalescer(self):
+        """ Returns the RequestCoalescer object shared by all API objects """
+        return request_coalescer.get_coalescer(self.settings.memo_size)
+
+    def _get_cached(self, api_call):
+        """
+        [PRIVATE] Returns a tuple of the body of the response to an API call and the API call pointing to the next
+        page of a paginated list (None on the last page).
+
+        Each API call is only sent once per run, concurrent callers share the request in flight and successful
+        responses are memoized, see the request_coalescer module.
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        def fetch():
+            body, next_url, status_code = self._get_revalidated(api_call)
+            return (body, next_url), len(body) + len(next_url or u""), status_code == 200
+
+        key = (self.settings.token, u"%s%s" % (self.settings.domain, api_call))
+        return self.get_coalescer().get(key, fetch)
+
+    def _get_revalidated(self, api_call):
+        """
+        [PRIVATE] Returns a tuple of the body of the response to an API call, the API call pointing to the next
+        page of a paginated list (None on the last page) and the HTTP status code. A cached response is revalidated
+        with a conditional request and served from the cache if the server responds '304 Not Modified'.
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        cache = self.get_cache()
+        url = u"%s%s" % (self.settings.domain, api_call)
+        entry = cache.get(url, self.get_cache_user()) if cache is not None else None
+
+        response = self._get_hedged(api_call, headers=http_cache.get_conditional_headers(entry))
+        if response.status_code == 304 and entry is not None:
+            return entry[u"body"], entry[u"next"], 200
+
+        next_url = response.links.get(u"next", {}).get(u"url")
+        if next_url:
+            next_url = next_url.split(self.settings.domain)[-1]
+
+        body = response.text
+        if cache is not None and response.status_code == 200:
+            cache.put(url, self.get_cache_user(), response.headers.get(u"ETag"), response.headers.get(u"Last-Modified"),
+                      body, next_url)
+
+        return body, next_url, response.status_code
+
+    def get_text(self, api_call):
+        """
+        Returns the body of the response to a specified API call as text
+
         api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
         """
-        return requests.get(u"%s%s" % (self.settings.domain, api_call),
-                            headers={u'Authorization': u"Bearer %s" % self.settings.token})
+        return self._get_cached(api_call)[0]
 
     def get_json(self, api_call):
         """
@@ -43,46 +317,102 @@ class InstructureApi(object):
 
         api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
         """
-        return json.loads(self._get(api_call).text)
+        return json.loads(self._get_cached(api_call)[0])
+
+    def get_json_page(self, api_call):
+        """
+        Returns a tuple of the json digested content of a single page of a paginated API call and the API call
+        pointing to the next page as given by the 'Link: rel="next"' response header (None on the last page).
+
+        api_call : string | Any call to the Instructure API ("/api/v1/courses" for instance)
+        """
+        body, next_url = self._get_cached(api_call)
+        return json.loads(body), next_url
+
+    def get_json_list(self, api_call, prefetch=None, strict=False):
+        """
+        Generator yielding all items of a paginated list API call. The 'Link: rel="next"' headers are followed
+        until the last page is reached and items are yielded as each page arrives.
+        If the server responds with something other than a list (e.g. an error dictionary), iteration stops.
+        A page that could not be fetched raises an InstructureApiError rather than ending the list early.
+
+        api_call : string  | Any call to the Instructure API ("/api/v1/courses" for instance)
+        prefetch : boolean | Fetch the next page in a background thread while the current page is consumed.
+                             Defaults to the 'prefetch_pages' setting.
+        strict   : boolean | Raise an IOError instead of stopping if the server responds with something other than a
+                             list, so that an incomplete list can be told apart from a short one
+        """
+        if prefetch is None:
+            prefetch = self.settings.prefetch_pages
+
+        data, next_call = self.get_json_page(api_call)
+
+        while isinstance(data, (list, tuple)):
+            fetcher = None
+            if prefetch and next_call:
+                fetcher = _PageFetcher(self, next_call)
+                fetcher.start()
 
-    def get_json_list(self, api_call):
-        data = self.get_json(api_call)
-        if not isinstance(data, (list, tuple)):
-            data = []
-        return data
+            for item in data:
+                yield item
+
+            if not next_call:
+                return
+
+            data, next_call = fetcher.get_result() if fetcher else self.get_json_page(next_call)
+
+        if strict:
+            raise IOError(u"The server did not respond with a list to the API call %s: %s" % (api_call, data))
 
     def get_courses(self):
         """
-        Returns a list of course dictionaries.
+        Yields course dictionaries.
         """
 
         # Previously this was breaking the tool... courses that have
         # access restricted were missing required dictionary keys
         # in other functions, so let's filter them out
 
-        course_list = self.get_json_list(u"/api/v1/courses?per_page=100")
-        filtered_course_list = []
-
-        for course in course_list:
+        for course in self.get_json_list(u"/api/v1/courses?per_page=100"):
             if "access_restricted_by_date" in course and \
                 course[u"access_restricted_by_date"]:
                 continue
 
-            filtered_course_list.append(course)
+            yield course
 
-        return filtered_course_list
+    def get_activity_stream(self, since=None):
+        """
+        Yields the items of the activity stream of the user (announcements, discussions, submissions etc.), the most
+        recently updated first. Items not belonging to a course are skipped. The stream is downloaded only as far back
+        as needed.
 
-    def get_modules_in_course(self, course_id):
+        since : string | A time stamp in the format of Canvas time stamps, iteration stops at the first item updated
+                         before it. None to yield the entire stream.
         """
-        Returns a list of dictionaries on the Canvas modules located in a given course.
+        for item in self.get_json_list(u"/api/v1/users/self/activity_stream?per_page=100", prefetch=False,
+                                       strict=True):
+            if since is not None and (item.get(u"updated_at") or u"") < since:
+                return
+            if item.get(u"course_id") is not None:
+                yield item
+
+    def get_modules_in_course(self, course_id, include_items=False):
+        """
+        Yields dictionaries on the Canvas modules located in a given course.
 
-        course_id : int | A course ID number
+        course_id     : int     | A course ID number
+        include_items : boolean | Ask the server to return the items (and their content details) of each module inline
+                                  under the 'items' key. The server may omit the items of large modules.
         """
-        return self.get_json_list(u"/api/v1/courses/%s/modules?per_page=100" % course_id)
+        api_call = u"/api/v1/courses/%s/modules?per_page=100" % course_id
+        if include_items:
+            api_call += u"&include[]=items&include[]=content_details"
+
+        return self.get_json_list(api_call)
 
     def get_files_in_folder(self, folder_id):
         """
-        Returns a list of dictionaries on the Canvas files located in a given folder
+        Yields dictionaries on the Canvas files located in a given folder
 
         folder_id : int | A folder ID number
         """
@@ -90,36 +420,51 @@ class InstructureApi(object):
 
     def get_folders_in_folder(self, folder_id):
         """
-        Returns a list of dictionaries on the Canvas folders located in a given folder
+        Yields dictionaries on the Canvas folders located in a given folder
 
         folder_id : int | A folder ID number
         """
         return self.get_json_list(u"/api/v1/folders/%s/folders?per_page=100" % folder_id)
 
-    def get_files_in_course(self, course_id):
+    def get_files_in_course(self, course_id, strict=False):
         """
-        Returns a list of dictionaries on the Canvas files located in a given course.
+        Yields dictionaries on the Canvas files located in a given course.
 
-        course_id : int | A course ID number
+        course_id : int     | A course ID number
+        strict    : boolean | Raise an IOError if the list could not be downloaded, see get_json_list
         """
-        return self.get_json_list(u"/api/v1/courses/%s/files?per_page=100" % course_id)
+        return self.get_json_list(u"/api/v1/courses/%s/files?per_page=100" % course_id, strict=strict)
 
     def get_folders_in_course(self, course_id):
         """
-        Returns a list of dictionaries on the Canvas folders located in a given course.
+        Yields dictionaries on the Canvas folders located in a given course.
 
         course_id : int | A course ID number
         """
         return self.get_json_list(u"/api/v1/courses/%s/folders?per_page=100" % course_id)
 
+    def get_pages_in_course(self, course_id, include_body=False, strict=False):
+        """
+        Yields dictionaries on the Canvas pages of a given course.
+
+        course_id    : int     | A course ID number
+        include_body : boolean | Include the HTML body of each page
+        strict       : boolean | Raise an IOError if the list could not be downloaded, see get_json_list
+        """
+        api_call = u"/api/v1/courses/%s/pages?per_page=100" % course_id
+        if include_body:
+            api_call += u"&include[]=body"
+
+        return self.get_json_list(api_call, strict=strict)
+
     def get_items_in_module(self, course_id, module_id):
         """
-        Returns a dictionary of items located in a given module in a given course
+        Yields dictionaries of items located in a given module in a given course
 
         course_id : int | A course ID number
         module_id : int | A module ID number
         """
-        return self.get_json(u"/api/v1/courses/%s/modules/%s/items?per_page=100" % (course_id, module_id))
+        return self.get_json_list(u"/api/v1/courses/%s/modules/%s/items?per_page=100" % (course_id, module_id))
 
     def download_item_information(self, url):
         """
@@ -130,18 +475,100 @@ class InstructureApi(object):
         url = url.split(self.settings.domain)[-1]
         return self.get_json(url)
 
-    def download_file_payload(self, donwload_url):
+    def download_file(self, download_url, path, identity=None):
         """
-        Returns the payload of a specified file in the Canvas system
-
-        donwload_url : string | The API download url pointing to a file in the Canvas system
+        Download the payload of a specified file in the Canvas system to a local path. The payload is streamed to disk
+        in chunks of 'download_buffer_size' bytes and the file appears at the path only when completely downloaded.
+        An interrupted download of the same file is resumed and files of at least 'segmented_download_threshold'
+        bytes are fetched as 'download_segments' byte ranges in parallel, see the downloader module.
+        Returns the validator (ETag or Last-Modified header) of the download or None.
+
+        download_url : string | The API download url pointing to a file in the Canvas system
+        path         : string | The local path to store the file at
+        identity     : dict   | A dictionary identifying the file (Canvas file ID, size and version)
+        """
+        url = download_url.split(self.settings.domain)[-1]
+
+        def request(headers):
+            return self._get(url, stream=True, headers=headers)
+
+        identity = identity or {u"url": url}
+        size = identity.get(u"size") or 0
+
+        if self.settings.download_segments > 1 and size >= max(self.settings.segmented_download_threshold, 1):
+            return downloader.download_segmented(request, path,
+                                                 chunk_size=self.settings.download_buffer_size,
+                                                 identity=identity,
+                                                 segments=self.settings.download_segments,
+                                                 stall_policy=self.get_stall_policy())
+        else:
+            return downloader.download(request, path,
+                                       chunk_size=self.settings.download_buffer_size,
+                                       identity=identity,
+                                       stall_policy=self.get_stall_policy())
+
+    def download_linked_file(self, url, path):
+        """
+        Download a file hosted outside of the Canvas system to a local path. The file is streamed to disk and appears
+        at the path only when completely downloaded, a stalled transfer is resumed, see download_file.
+        The size and content type of the file are checked against the LinkPolicy object, optionally with a HEAD
+        request first, and only a limited number of files are downloaded at a time from the same host.
+        Raises IOError if the server does not respond with the file and LinkedFileRejected if the file is refused.
+
+        url  : string | A URL pointing to a file somewhere on the web
+        path : string | The local path to store the file at
         """
-        url = donwload_url.split(self.settings.domain)[-1]
-        return self._get(url).content
+        policy = self.get_link_policy()
+        pool = http_pool.get_pool()
+
+        def request(headers):
+            response = pool.get(url, headers=headers, stream=True, timeout=self.get_timeout())
+            if response.status_code in (200, 206):
+                try:
+                    policy.check(url, response.headers)
+                except link_policy.LinkedFileRejected:
+                    response.close()
+                    raise
+            return response
+
+        with link_policy.get_host_semaphore(url, policy.host_limit):
+            if policy.probe:
+                response = pool.head(url, timeout=self.get_timeout())
+                response.close()
+
+                # Servers that do not answer HEAD requests are checked by the headers of the download instead
+                if response.status_code == 200:
+                    policy.check(url, response.headers)
+
+            return downloader.download(request, path,
+                                       chunk_size=self.settings.download_buffer_size,
+                                       identity={u"url": url},
+                                       stall_policy=self.get_stall_policy(),
+                                       check_size=lambda size: policy.check_size(url, size))
+
+    def get_link_policy(self):
+        """ Returns the LinkPolicy object checking linked file downloads, made from the settings on first call """
+        if self.link_policy is None:
+            self.link_policy = link_policy.LinkPolicy(max_size=self.settings.linked_file_max_size,
+                                                      allowed_types=self.settings.linked_file_types,
+                                                      probe=self.settings.linked_file_probe,
+                                                      host_limit=self.settings.linked_file_host_limit)
+        return self.link_policy
+
+    def get_stall_policy(self):
+        """ Returns a StallPolicy object for file downloads, None if disabled by the 'stall_detection' setting """
+        if not self.settings.stall_detection:
+            return None
+        if self.stall_policy is None:
+            self.stall_policy = stall_monitor.StallPolicy(min_rate=self.settings.stall_min_rate,
+                                                          window=self.settings.stall_window,
+                                                          idle_timeout=self.settings.stall_idle_timeout,
+                                                          retries=self.settings.stall_retries)
+        return self.stall_policy
 
     def get_assignments_in_course(self, course_id):
         """
-        Returns a list of dictionaries of information on assignment objects under a course ID
+        Yields dictionaries of information on assignment objects under a course ID
 
         course_id : int | A course ID number
         """
@@ -0,0 +1,118 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+link_policy.py, module
+
+Implements the LinkPolicy object deciding which files linked from pages and assignments are downloaded. Linked files
+are hosted outside of the Canvas system, so nothing is known about them beforehand: a link may point to a file of many
+gigabytes or to a HTML page with a misleading file name.
+
+The headers of a linked file (from an optional HEAD request sent first, and from the response to the download request
+itself) are checked against a maximum size and an allowlist of content types, and the download is refused with a
+LinkedFileRejected error if they do not match. As the Content-Length header may be missing, the maximum size is also
+enforced while the file is streamed to disk.
+
+Servers hosting linked files are often small, so the number of linked files downloaded at a time from the same host
+is limited, see get_host_semaphore.
+"""
+
+# Inbuilt modules
+import threading
+
+# Third party modules
+from six.moves.urllib.parse import urlsplit
+
+
+class LinkedFileRejected(IOError):
+    """ Raised when a linked file is too large or has a content type that is not allowed """
+    pass
+
+
+class LinkPolicy(object):
+    def __init__(self, max_size=0, allowed_types=None, probe=False, host_limit=2):
+        """
+        max_size      : int     | The maximum size in bytes of a linked file, 0 for no limit
+        allowed_types : list    | A list of allowed content types, e.g. "application/pdf", or major types ending in a
+                                  slash, e.g. "image/". None or an empty list to allow any type.
+        probe         : boolean | Send a HEAD request to check a linked file before downloading it
+        host_limit    : int     | The maximum number of linked files downloaded at a time from the same host
+        """
+        self.max_size = max_size
+        self.allowed_types = [content_type.strip().lower() for content_type in allowed_types or []]
+        self.probe = probe
+        self.host_limit = max(host_limit, 1)
+
+    def is_allowed_type(self, content_type):
+        """
+        Returns True if a content type is in the allowlist, or if no allowlist is set. A missing content type is
+        allowed, as many servers do not send one.
+
+        content_type : string | The value of a Content-Type header, parameters such as the charset are ignored
+        """
+        if not self.allowed_types or not content_type:
+            return True
+
+        content_type = content_type.split(u";")[0].strip().lower()
+        for allowed in self.allowed_types:
+            if content_type == allowed or (allowed.endswith(u"/") and content_type.startswith(allowed)):
+                return True
+        return False
+
+    def check(self, url, headers):
+        """
+        Raise LinkedFileRejected if the headers of a linked file exceed the maximum size or have a content type
+        that is not allowed
+
+        url     : string | The URL of the linked file
+        headers : dict   | The case-insensitive headers of a response to a request for the linked file
+        """
+        content_type = headers.get(u"Content-Type")
+        if not self.is_allowed_type(content_type):
+            raise LinkedFileRejected(u"Linked file %s has content type %s, which is not allowed" % (url,
+                                                                                                 content_type))
+
+        try:
+            size = int(headers.get(u"Content-Length"))
+        except (TypeError, ValueError):
+            return
+        if self.max_size and size > self.max_size:
+            raise LinkedFileRejected(u"Linked file %s of %s bytes exceeds the maximum size of %s bytes"
+                                     % (url, size, self.max_size))
+
+    def check_size(self, url, size):
+        """
+        Raise LinkedFileRejected if the number of bytes of a linked file received so far exceeds the maximum size
+
+        url  : string | The URL of the linked file
+        size : int    | The number of bytes received
+        """
+        if self.max_size and size > self.max_size:
+            raise LinkedFileRejected(u"Linked file %s exceeds the maximum size of %s bytes" % (url, self.max_size))
+
+
+def get_host(url):
+    """ Returns the host name of a URL in lower case """
+    return urlsplit(url).netloc.lower()
+
+
+# Semaphores limiting the linked file downloads of each host, stored under the host name
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def get_host_semaphore(url, limit=2):
+    """
+    Returns the BoundedSemaphore object limiting the number of linked files downloaded at a time from the host of a
+    URL, created on first call
+
+    url   : string | The URL of a linked file
+    limit : int    | The maximum number of downloads at a time from the host, used when created
+    """
+    host = get_host(url)
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(limit)
+        return _host_semaphores[host]
@@ -0,0 +1,176 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+rate_limiter.py, module
+
+Implements the RateLimiter object that adapts the number of API calls in flight to the request quota of the Canvas
+server. Canvas meters each access token with a bucket of request units: every response carries the units left in the
+bucket ('X-Rate-Limit-Remaining') and the cost of the request ('X-Request-Cost'), and requests are answered with
+'403 Forbidden (Rate Limit Exceeded)' once the bucket runs dry.
+
+The number of requests allowed in flight (the window) is adjusted AIMD-style like a TCP congestion window. Each
+response leaving enough units in the bucket adds 1 / window to the window, so the window grows by one request per
+window of responses while the bucket is at least half full. A response leaving few units, or a throttled response,
+halves the window (at most once per window of responses, so that a burst of responses sent at the same time only
+counts once). Throttled requests are retried after an exponential backoff with random jitter, so that requests
+throttled at the same time are not retried at the same time.
+
+A single RateLimiter object is shared by all API objects calling the same Canvas server, see get_limiter.
+"""
+
+# Inbuilt modules
+import random
+import threading
+
+
+class RateLimiter(object):
+    def __init__(self, window=4, min_window=1, max_window=32, low_remaining=200.0, backoff=1.0, max_backoff=30.0,
+                 max_retries=6):
+        """
+        window        : int   | The initial number of requests allowed in flight
+        min_window    : int   | The smallest number of requests allowed in flight
+        max_window    : int   | The largest number of requests allowed in flight
+        low_remaining : float | The number of units left in the bucket below which the window is decreased, the window
+                                is only increased while at least twice as many units are left
+        backoff       : float | The number of seconds to wait before retrying the first time a request is throttled
+        max_backoff   : float | The maximum number of seconds to wait before retrying a throttled request
+        max_retries   : int   | The number of times a throttled request is retried before its response is returned
+        """
+        self.min_window = max(min_window, 1)
+        self.max_window = max(max_window, self.min_window)
+        self.window = float(min(max(window, self.min_window), self.max_window))
+        self.low_remaining = low_remaining
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+
+        # The number of responses since the window was last decreased
+        self.since_decrease = int(self.window)
+
+        # Counters exposed by get_stats
+        self.requests = 0
+        self.throttled = 0
+        self.decreases = 0
+        self.backoff_time = 0.0
+        self.total_cost = 0.0
+        self.remaining = None
+        self.max_in_flight = 0
+
+    def try_acquire(self):
+        """ Take a place in the window if one is free, returns True if taken """
+        with self.condition:
+            if self.in_flight >= int(self.window):
+                return False
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def acquire(self):
+        """ Take a place in the window, blocks until one is free """
+        with self.condition:
+            while self.in_flight >= int(self.window):
+                self.condition.wait()
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def release(self):
+        """ Give back a place in the window taken with acquire or try_acquire """
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def update(self, status, headers, body=u""):
+        """
+        Adjust the window to a response, returns True if the request was throttled and should be retried after
+        waiting get_backoff seconds
+
+        status  : int    | The HTTP status code of the response
+        headers : dict   | The headers of the response
+        body    : string | The body of the response, only inspected for 403 responses
+        """
+        throttled = status == 403 and u"Rate Limit Exceeded" in (body or u"")
+        remaining = get_float_header(headers, u"X-Rate-Limit-Remaining")
+        cost = get_float_header(headers, u"X-Request-Cost")
+
+        with self.condition:
+            self.requests += 1
+            self.since_decrease += 1
+            if cost is not None:
+                self.total_cost += cost
+            if remaining is not None:
+                self.remaining = remaining
+
+            if throttled:
+                self.throttled += 1
+
+            if throttled or (remaining is not None and remaining < self.low_remaining):
+                if self.since_decrease >= int(self.window):
+                    self.window = max(self.window / 2.0, float(self.min_window))
+                    self.decreases += 1
+                    self.since_decrease = 0
+            elif status < 400 and (remaining is None or remaining >= 2 * self.low_remaining):
+                self.window = min(self.window + 1.0 / self.window, float(self.max_window))
+                self.condition.notify_all()
+
+        return throttled
+
+    def get_backoff(self, attempt):
+        """
+        Returns the number of seconds to wait before retrying a throttled request and counts it in the stats, or None
+        if the request should not be retried
+
+        attempt : int | The number of times the request has been throttled before, 0 for the first time
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+        with self.condition:
+            self.backoff_time += delay
+        return delay
+
+    def get_stats(self):
+        """ Returns a dictionary of the current window and counters of requests, throttling and backoff events """
+        with self.condition:
+            return {u"window": self.window,
+                    u"in_flight": self.in_flight,
+                    u"max_in_flight": self.max_in_flight,
+                    u"requests": self.requests,
+                    u"throttled": self.throttled,
+                    u"decreases": self.decreases,
+                    u"backoff_time": self.backoff_time,
+                    u"total_cost": self.total_cost,
+                    u"remaining": self.remaining}
+
+
+def get_float_header(headers, name):
+    """ Returns the value of a numeric response header as a float, None if missing or malformed """
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+# RateLimiter objects shared by all API objects, stored under the domain of the server they call
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(domain, window=4, max_window=32):
+    """
+    Returns the RateLimiter object of a Canvas server, created on first call
+
+    domain     : string | The domain of the Canvas server
+    window     : int    | The initial number of requests allowed in flight, used when created
+    max_window : int    | The largest number of requests allowed in flight, used when created
+    """
+    with _limiters_lock:
+        if domain not in _limiters:
+            _limiters[domain] = RateLimiter(window=window, max_window=max_window)
+        return _limiters[domain]
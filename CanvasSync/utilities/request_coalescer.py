@@ -0,0 +1,141 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+request_coalescer.py, module
+
+Implements the RequestCoalescer object that makes sure the same API call is only sent to the server once per run.
+When several threads ask for the same API call at the same time, only the first sends the request and the others wait
+for and share its response (single-flight). Responses are then memoized for the rest of the run, so the same file
+linked from several pages, or a folder listed repeatedly, costs a single request.
+
+The memoized responses are bounded by a total size in bytes, the least recently used responses are dropped first.
+A single RequestCoalescer object is shared by all API objects of the process, see get_coalescer.
+"""
+
+# Inbuilt modules
+import collections
+import threading
+
+
+class _Flight(object):
+    """ A request in flight that other threads asking for the same API call wait for """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer(object):
+    def __init__(self, max_size=32 * 1024 * 1024):
+        """
+        max_size : int | The maximum total size of the memoized responses in bytes, 0 to disable memoization
+        """
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        # Memoized responses and their sizes stored under their key, ordered from least to most recently used
+        self.results = collections.OrderedDict()
+        self.size = 0
+
+        # Flight objects of the requests currently in flight stored under their key
+        self.in_flight = {}
+
+    def lookup(self, key):
+        """
+        Returns the memoized response stored under a key or None
+
+        key : object | A hashable key identifying the request
+        """
+        with self.lock:
+            if key not in self.results:
+                return None
+            result, size = self.results.pop(key)
+            self.results[key] = (result, size)
+            return result
+
+    def store(self, key, result, size):
+        """
+        Memoize a response
+
+        key    : object | A hashable key identifying the request
+        result : object | The response
+        size   : int    | The size of the response in bytes
+        """
+        if size > self.max_size:
+            return
+
+        with self.lock:
+            if key in self.results:
+                self.size -= self.results.pop(key)[1]
+            self.results[key] = (result, size)
+            self.size += size
+
+            while self.size > self.max_size:
+                self.size -= self.results.popitem(last=False)[1][1]
+
+    def get(self, key, fetch):
+        """
+        Returns the response of a request, memoized or shared with a thread already sending the same request.
+        Otherwise the request is sent by calling 'fetch', which must return a tuple of the response, its size in
+        bytes and a boolean set to True if the response may be memoized (e.g. not an error).
+
+        key   : object   | A hashable key identifying the request
+        fetch : callable | A function taking no arguments sending the request
+        """
+        with self.lock:
+            if key in self.results:
+                result, size = self.results.pop(key)
+                self.results[key] = (result, size)
+                return result
+
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.in_flight[key] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result, size, memoize = fetch()
+            if memoize:
+                self.store(key, flight.result, size)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            flight.done.set()
+
+    def clear(self):
+        """ Drop all memoized responses """
+        with self.lock:
+            self.results.clear()
+            self.size = 0
+
+
+# The RequestCoalescer object shared by all API objects
+_default_coalescer = None
+_default_lock = threading.Lock()
+
+
+def get_coalescer(max_size=32 * 1024 * 1024):
+    """
+    Returns the RequestCoalescer object shared by all API objects, created on first call
+
+    max_size : int | The maximum total size of the memoized responses in bytes, used when created
+    """
+    global _default_coalescer
+    with _default_lock:
+        if _default_coalescer is None:
+            _default_coalescer = RequestCoalescer(max_size)
+        return _default_coalescer
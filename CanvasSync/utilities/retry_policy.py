@@ -0,0 +1,155 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+retry_policy.py, module
+
+Implements the RetryPolicy and CircuitBreaker objects used by the API objects to cope with a flaky Canvas server.
+
+A GET request that fails with a connection error, a timeout or a transient HTTP status (e.g. '502 Bad Gateway') is
+retried after an exponential backoff with random jitter, so that requests failing at the same time are spread out.
+If all attempts fail, an InstructureApiError is raised and the entity that made the request is reported as failed.
+
+A CircuitBreaker object counts the consecutive failures of an API endpoint (the API call with its ID numbers left
+out, e.g. "/api/v1/courses/:id/files"). When too many requests in a row have failed, the circuit opens and further
+requests fail immediately, without contacting the server, until a cool-down period has passed. A single trial request
+is then let through, closing the circuit again if it succeeds.
+"""
+
+# Inbuilt modules
+import random
+import re
+import threading
+import time
+
+
+class InstructureApiError(IOError):
+    """ Raised when a request to the Canvas server failed after all retries or was refused by an open circuit """
+    def __init__(self, message, api_call=None, status=None):
+        """
+        message  : string | A description of the failure
+        api_call : string | The API call that failed
+        status   : int    | The HTTP status code of the last response, None if no response was received
+        """
+        IOError.__init__(self, message)
+        self.api_call = api_call
+        self.status = status
+
+
+class RetryPolicy(object):
+    # HTTP status codes of responses that are worth retrying
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=8.0):
+        """
+        max_retries : int   | The number of times a failed request is retried
+        backoff     : float | The base number of seconds to wait before retrying, doubled for each retry
+        max_backoff : float | The maximum number of seconds to wait before retrying
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def is_retryable_status(self, status):
+        """ Returns True if a response with the specified HTTP status code should be retried """
+        return status in self.RETRY_STATUSES
+
+    def get_delay(self, attempt, retry_after=None):
+        """
+        Returns the number of seconds to wait before retrying a failed request, or None if it should not be retried.
+        The delay is drawn at random between half and all of the exponential backoff, but is never shorter than a
+        'Retry-After' header sent by the server.
+
+        attempt     : int    | The number of times the request has failed before, 0 for the first failure
+        retry_after : string | The 'Retry-After' header of the response, if any
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+        try:
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        except (TypeError, ValueError):
+            pass
+
+        return delay
+
+
+class CircuitBreaker(object):
+    def __init__(self, threshold=5, cooldown=30.0):
+        """
+        threshold : int   | The number of consecutive failures that opens the circuit, 0 to never open it
+        cooldown  : float | The number of seconds the circuit stays open before a trial request is let through
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def allow(self):
+        """ Returns True if a request may be sent, False if the circuit is open """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+
+            if self.trial or time.time() - self.opened_at < self.cooldown:
+                return False
+
+            # Half-open, let a single trial request through
+            self.trial = True
+            return True
+
+    def record_success(self):
+        """ Close the circuit after a successful request """
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        """ Count a failed request, opens the circuit when the threshold is reached or the trial request failed """
+        with self.lock:
+            self.failures += 1
+            if self.trial or (self.threshold and self.failures >= self.threshold):
+                self.opened_at = time.time()
+            self.trial = False
+
+    def is_open(self):
+        """ Returns True if the circuit is open """
+        with self.lock:
+            return self.opened_at is not None
+
+
+def get_endpoint(api_call):
+    """
+    Returns the endpoint of an API call, that is the path with ID numbers and the query string left out
+
+    api_call : string | Any call to the Instructure API ("/api/v1/courses/1234/files?per_page=100" for instance)
+    """
+    return re.sub(r"/\d+(?=/|$)", u"/:id", api_call.split(u"?")[0])
+
+
+# CircuitBreaker objects shared by all API objects, stored under the domain and endpoint they guard
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(domain, api_call, threshold=5, cooldown=30.0):
+    """
+    Returns the CircuitBreaker object guarding the endpoint of an API call, created on first call
+
+    domain    : string | The domain of the Canvas server
+    api_call  : string | Any call to the Instructure API
+    threshold : int    | The number of consecutive failures that opens the circuit, used when created
+    cooldown  : float  | The number of seconds the circuit stays open, used when created
+    """
+    key = (domain, get_endpoint(api_call))
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(threshold=threshold, cooldown=cooldown)
+        return _breakers[key]
@@ -0,0 +1,235 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+stall_monitor.py, module
+
+Implements detection of stalled downloads. A download may stall at a few bytes per second for minutes without the
+connection timing out, holding up a download worker. Each transfer is watched by a TransferMonitor object that is told
+how many bytes arrive. A transfer is stalled if no bytes arrived for 'idle_timeout' seconds, or if less than
+'min_rate' bytes per second arrived over the last 'window' seconds.
+
+A stalled transfer is aborted by raising a TransferStalled error in the thread reading it. As a thread blocked reading
+a slow socket can not check the rate itself, a single StallWatchdog thread checks all transfers every second and shuts
+down the connection of a stalled transfer, making the blocked read fail. The download is then retried, resuming from
+the bytes already written to disk, and the event is printed.
+
+The StallPolicy object holds the settings and is passed to the functions of the downloader module.
+"""
+
+# Future imports
+from __future__ import print_function
+
+# Inbuilt modules
+import collections
+import socket
+import threading
+import time
+
+# CanvasSync modules
+from CanvasSync.utilities.ANSI import ANSI
+
+
+class TransferStalled(IOError):
+    """ Raised when a transfer is stalled or its connection broke while reading, the download may be resumed """
+    pass
+
+
+class StallPolicy(object):
+    def __init__(self, min_rate=10 * 1024, window=30.0, idle_timeout=30.0, retries=3):
+        """
+        min_rate     : int   | The minimum number of bytes per second averaged over 'window' seconds
+        window       : float | The number of seconds the transfer rate is averaged over
+        idle_timeout : float | The maximum number of seconds without receiving any bytes
+        retries      : int   | The number of times a stalled download is retried
+        """
+        self.min_rate = min_rate
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self.retries = retries
+
+        self.lock = threading.Lock()
+        self.stalls = 0
+
+    def watch(self, path, response=None):
+        """
+        Returns a TransferMonitor object watching a transfer. If a requests Response object is specified, the
+        transfer is also checked by the StallWatchdog thread, which shuts down its connection when stalled.
+        The monitor must be closed when the transfer is done.
+
+        path     : string | The local path the transfer is written to
+        response : object | The requests Response object of the transfer
+        """
+        monitor = TransferMonitor(self, path, response)
+        if response is not None:
+            get_watchdog().register(monitor)
+        return monitor
+
+    def log_stall(self, path, error, attempt):
+        """
+        Print that a download stalled and will be retried
+
+        path    : string    | The local path of the download
+        error   : Exception | The TransferStalled error
+        attempt : int       | The number of the retry, 1 for the first
+        """
+        with self.lock:
+            self.stalls += 1
+        print(ANSI.format(u"[STALLED]", formatting=u"red") + u"      %s (%s), resuming, retry %s of %s"
+              % (path, error, attempt, self.retries))
+
+    def retry(self, download, path):
+        """
+        Call a function downloading a file to a path, calling it again if the transfer stalled. The function must
+        resume from the bytes already downloaded.
+
+        download : callable | A function taking no arguments downloading the file
+        path     : string   | The local path of the download
+        """
+        attempt = 0
+        while True:
+            try:
+                return download()
+            except TransferStalled as e:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                self.log_stall(path, e, attempt)
+
+
+class TransferMonitor(object):
+    def __init__(self, policy, path, response=None):
+        """
+        policy   : object | The StallPolicy object
+        path     : string | The local path the transfer is written to
+        response : object | The requests Response object of the transfer, shut down by the watchdog if stalled
+        """
+        self.policy = policy
+        self.path = path
+        self.response = response
+        self.lock = threading.Lock()
+
+        now = time.time()
+        self.last_progress = now
+        self.total = 0
+
+        # (time, total bytes) samples covering the last 'window' seconds
+        self.samples = collections.deque([(now, 0)])
+
+        # The reason the transfer was found stalled, None while it is progressing
+        self.stalled = None
+
+    def update(self, size):
+        """
+        Count bytes received, raises TransferStalled if the transfer is too slow
+
+        size : int | The number of bytes received
+        """
+        now = time.time()
+        with self.lock:
+            self.total += size
+            if size:
+                self.last_progress = now
+            self.samples.append((now, self.total))
+        self.raise_if_stalled(self.check(now))
+
+    def check(self, now):
+        """ Returns the reason the transfer is stalled at time 'now' or None """
+        with self.lock:
+            if self.stalled is not None:
+                return self.stalled
+
+            if now - self.last_progress >= self.policy.idle_timeout:
+                return u"no data received for %d seconds" % (now - self.last_progress)
+
+            # Drop samples older than the window, keeping the newest sample at least 'window' seconds old
+            while len(self.samples) > 1 and now - self.samples[1][0] >= self.policy.window:
+                self.samples.popleft()
+
+            oldest_time, oldest_total = self.samples[0]
+            elapsed = now - oldest_time
+            if elapsed >= self.policy.window and (self.total - oldest_total) / elapsed < self.policy.min_rate:
+                return u"%d bytes/s over the last %d seconds" % ((self.total - oldest_total) / elapsed, elapsed)
+
+        return None
+
+    def abort(self, reason):
+        """ Mark the transfer as stalled and shut down its connection so that a blocked read fails """
+        with self.lock:
+            if self.stalled is not None:
+                return
+            self.stalled = reason
+
+        connection = getattr(getattr(self.response, u"raw", None), u"_connection", None)
+        sock = getattr(connection, u"sock", None)
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+            else:
+                self.response.close()
+        except Exception:
+            pass
+
+    def raise_if_stalled(self, reason=None):
+        """ Raise TransferStalled if the transfer is stalled """
+        reason = reason or self.stalled
+        if reason is not None:
+            self.stalled = reason
+            raise TransferStalled(u"Transfer stalled, %s" % reason)
+
+    def close(self):
+        """ Stop watching the transfer """
+        get_watchdog().unregister(self)
+
+
+class StallWatchdog(object):
+    def __init__(self, interval=1.0):
+        """
+        interval : float | The number of seconds between checks of the transfers
+        """
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.monitors = set()
+        self.thread = None
+
+    def register(self, monitor):
+        """ Start checking a TransferMonitor object, the watchdog thread is started on first call """
+        with self.lock:
+            self.monitors.add(monitor)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+    def unregister(self, monitor):
+        """ Stop checking a TransferMonitor object """
+        with self.lock:
+            self.monitors.discard(monitor)
+
+    def _run(self):
+        """ [PRIVATE] Watchdog thread loop, abort stalled transfers """
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                monitors = list(self.monitors)
+
+            now = time.time()
+            for monitor in monitors:
+                reason = monitor.check(now)
+                if reason is not None:
+                    monitor.abort(reason)
+
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def get_watchdog():
+    """ Returns the StallWatchdog object shared by all transfers """
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = StallWatchdog()
+        return _watchdog
@@ -0,0 +1,258 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+sync_state.py, module
+
+Implements the SyncState object, a small SQLite database stored in the sync folder that records what was synced
+during previous runs. An item is identified by its kind (e.g. 'file' or 'page'), its Canvas ID and its location in
+the local folder, as the same Canvas item may be synced to several locations. For each item the database stores the
+path of the local file, its size, the 'updated_at'/'modified_at' time stamp of the Canvas item, a validator (e.g.
+the ETag of the download or the URL of an ExternalUrl) and the time of the last sync.
+
+CanvasEntity objects consult the database to skip items that have not changed on the server since the last sync and
+to re-download items that have. The database is shared by all threads of the Synchronizer and guarded by a lock.
+
+For incremental syncs the database also records when each course was last completely synced and the 'updated_at'
+time stamp the course had then, along with a few values describing the previous runs, see Synchronizer. For each
+module it stores a snapshot of the items of the module, used as long as the fingerprint of the module is unchanged,
+see Module.get_snapshot. The keys of the files in the BlobStore are mapped to the hashes of their blobs.
+"""
+
+# Inbuilt modules
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Third party modules
+from six import text_type
+
+
+class SyncState(object):
+    # The name of the database file in the top-level sync folder
+    FILE_NAME = u".CanvasSync.db"
+
+    def __init__(self, path):
+        """
+        path : string | The path of the SQLite database file, created if not existing
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        with self.lock:
+            self.connection.execute(u"PRAGMA journal_mode=WAL")
+            self.connection.execute(u"PRAGMA synchronous=NORMAL")
+            self.connection.execute(u"CREATE TABLE IF NOT EXISTS items ("
+                                    u"kind TEXT NOT NULL, "
+                                    u"canvas_id TEXT NOT NULL, "
+                                    u"location TEXT NOT NULL, "
+                                    u"path TEXT NOT NULL, "
+                                    u"size INTEGER, "
+                                    u"updated_at TEXT, "
+                                    u"validator TEXT, "
+                                    u"last_sync REAL NOT NULL, "
+                                    u"PRIMARY KEY (kind, canvas_id, location))")
+            self.connection.execute(u"CREATE TABLE IF NOT EXISTS courses ("
+                                    u"course_id TEXT PRIMARY KEY, "
+                                    u"updated_at TEXT, "
+                                    u"synced_at TEXT NOT NULL)")
+            self.connection.execute(u"CREATE TABLE IF NOT EXISTS modules ("
+                                    u"module_id TEXT PRIMARY KEY, "
+                                    u"fingerprint TEXT NOT NULL, "
+                                    u"snapshot TEXT NOT NULL)")
+            self.connection.execute(u"CREATE TABLE IF NOT EXISTS blobs ("
+                                    u"key TEXT PRIMARY KEY, "
+                                    u"digest TEXT NOT NULL, "
+                                    u"size INTEGER NOT NULL)")
+            self.connection.execute(u"CREATE TABLE IF NOT EXISTS meta ("
+                                    u"key TEXT PRIMARY KEY, "
+                                    u"value TEXT)")
+            self.connection.commit()
+
+    @classmethod
+    def open_in(cls, sync_path):
+        """
+        Returns a SyncState object storing its database in a top-level sync folder
+
+        sync_path : string | The top-level sync folder
+        """
+        return cls(os.path.join(sync_path, cls.FILE_NAME))
+
+    def get(self, kind, canvas_id, location):
+        """
+        Returns a dictionary of the stored information on an item or None if the item was never synced
+
+        kind      : string | The kind of item, e.g. 'file'
+        canvas_id : int    | The Canvas ID of the item
+        location  : string | The local path the item is synced to
+        """
+        with self.lock:
+            row = self.connection.execute(u"SELECT * FROM items WHERE kind=? AND canvas_id=? AND location=?",
+                                          (kind, text_type(canvas_id), location)).fetchone()
+
+        return dict(zip(row.keys(), row)) if row is not None else None
+
+    def record(self, kind, canvas_id, location, path=None, size=None, updated_at=None, validator=None):
+        """
+        Store information on an item that was just synced
+
+        kind       : string | The kind of item, e.g. 'file'
+        canvas_id  : int    | The Canvas ID of the item
+        location   : string | The local path the item is synced to
+        path       : string | The path of the local file written, defaults to the location
+        size       : int    | The size of the local file in bytes, read from disk if not specified
+        updated_at : string | The time stamp of the last change to the item on the Canvas server
+        validator  : string | Any other value used to determine if the item changed, e.g. an ETag
+        """
+        path = path or location
+        if size is None and os.path.exists(path):
+            size = os.path.getsize(path)
+
+        with self.lock:
+            self.connection.execute(u"INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    (kind, text_type(canvas_id), location, path, size, updated_at, validator,
+                                     time.time()))
+            self.connection.commit()
+
+    def forget(self, kind, canvas_id, location):
+        """
+        Remove the information stored on an item
+
+        kind      : string | The kind of item, e.g. 'file'
+        canvas_id : int    | The Canvas ID of the item
+        location  : string | The local path the item is synced to
+        """
+        with self.lock:
+            self.connection.execute(u"DELETE FROM items WHERE kind=? AND canvas_id=? AND location=?",
+                                    (kind, text_type(canvas_id), location))
+            self.connection.commit()
+
+    def get_course(self, course_id):
+        """
+        Returns a dictionary of the 'updated_at' time stamp of a course and the time ('synced_at', in the format of
+        Canvas time stamps) it was last completely synced, or None if never completely synced
+
+        course_id : int | The Canvas ID of the course
+        """
+        with self.lock:
+            row = self.connection.execute(u"SELECT * FROM courses WHERE course_id=?",
+                                          (text_type(course_id),)).fetchone()
+
+        return dict(zip(row.keys(), row)) if row is not None else None
+
+    def record_course(self, course_id, updated_at, synced_at):
+        """
+        Store that a course was completely synced
+
+        course_id  : int    | The Canvas ID of the course
+        updated_at : string | The 'updated_at' time stamp of the course on the Canvas server, if any
+        synced_at  : string | The time the sync of the course started, in the format of Canvas time stamps
+        """
+        with self.lock:
+            self.connection.execute(u"INSERT OR REPLACE INTO courses VALUES (?, ?, ?)",
+                                    (text_type(course_id), updated_at, synced_at))
+            self.connection.commit()
+
+    def forget_course(self, course_id):
+        """
+        Remove the record of the last complete sync of a course, so that it is walked by the next incremental sync
+
+        course_id : int | The Canvas ID of the course
+        """
+        with self.lock:
+            self.connection.execute(u"DELETE FROM courses WHERE course_id=?", (text_type(course_id),))
+            self.connection.commit()
+
+    def get_module_snapshot(self, module_id, fingerprint):
+        """
+        Returns the snapshot stored for a module if stored with the specified fingerprint, None otherwise
+
+        module_id   : int    | The Canvas ID of the module
+        fingerprint : string | The current fingerprint of the module
+        """
+        with self.lock:
+            row = self.connection.execute(u"SELECT snapshot FROM modules WHERE module_id=? AND fingerprint=?",
+                                          (text_type(module_id), fingerprint)).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def record_module_snapshot(self, module_id, fingerprint, snapshot):
+        """
+        Store a snapshot of a module under its fingerprint, replacing any previous snapshot
+
+        module_id   : int    | The Canvas ID of the module
+        fingerprint : string | The fingerprint of the module
+        snapshot    : dict   | A JSON serializable dictionary of information on the module
+        """
+        with self.lock:
+            self.connection.execute(u"INSERT OR REPLACE INTO modules VALUES (?, ?, ?)",
+                                    (text_type(module_id), fingerprint, json.dumps(snapshot)))
+            self.connection.commit()
+
+    def get_blob(self, key):
+        """
+        Returns a dictionary of the hash ('digest') and size of the blob stored under a key in the BlobStore, or None
+
+        key : string | The key of a file, see BlobStore.get_key
+        """
+        with self.lock:
+            row = self.connection.execute(u"SELECT * FROM blobs WHERE key=?", (key,)).fetchone()
+
+        return dict(zip(row.keys(), row)) if row is not None else None
+
+    def record_blob(self, key, digest, size):
+        """
+        Store the hash of the blob of a key in the BlobStore
+
+        key    : string | The key of a file, see BlobStore.get_key
+        digest : string | The SHA-256 hash of the blob
+        size   : int    | The size of the blob in bytes
+        """
+        with self.lock:
+            self.connection.execute(u"INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (key, digest, size))
+            self.connection.commit()
+
+    def forget_blob(self, key):
+        """
+        Remove the blob of a key, e.g. when the blob is missing or was modified
+
+        key : string | The key of a file, see BlobStore.get_key
+        """
+        with self.lock:
+            self.connection.execute(u"DELETE FROM blobs WHERE key=?", (key,))
+            self.connection.commit()
+
+    def get_value(self, key, default=None):
+        """
+        Returns a value stored under a key or the default if not stored
+
+        key     : string | The key the value is stored under
+        default : string | The value returned if none is stored
+        """
+        with self.lock:
+            row = self.connection.execute(u"SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+
+        return row[0] if row is not None else default
+
+    def set_value(self, key, value):
+        """
+        Store a value under a key
+
+        key   : string | The key to store the value under
+        value : string | The value
+        """
+        with self.lock:
+            self.connection.execute(u"INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, text_type(value)))
+            self.connection.commit()
+
+    def close(self):
+        """ Close the database connection """
+        with self.lock:
+            self.connection.close()
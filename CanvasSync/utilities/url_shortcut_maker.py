@@ -13,7 +13,7 @@ import sys
 import os
 
 
-def _make_mac_url_shortcut(url, path):
+def _make_mac_url_shortcut(url, path, overwrite=False):
     url_content = u"""<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
 <plist version="1.0">
@@ -23,12 +23,14 @@ def _make_mac_url_shortcut(url, path):
 </dict>
 </plist>""" % url
 
-    if not os.path.exists(path + u".webloc"):
+    if overwrite or not os.path.exists(path + u".webloc"):
         with open(path + u".webloc", u"w") as out_file:
             out_file.write(url_content)
 
+    return path + u".webloc"
 
-def _make_linux_url_shortcut(url, path):
+
+def _make_linux_url_shortcut(url, path, overwrite=False):
     name = os.path.split(url)[-1]
     url_content =u"""[Desktop Entry]
 Encoding=UTF-8
@@ -37,27 +39,34 @@ Type=Link
 URL=%s
 Icon=text-html""" % (name, url)
 
-    if not os.path.exists(path + u".desktop"):
+    if overwrite or not os.path.exists(path + u".desktop"):
         with open(path + u".desktop", u"w") as out_file:
             out_file.write(url_content)
 
+    return path + u".desktop"
+
 
-def _make_windows_url_shortcut(url, path):
+def _make_windows_url_shortcut(url, path, overwrite=False):
     url_content = u"""[InternetShortcut]
 URL=%s""" % url
 
-    if not os.path.exists(path + u".URL"):
+    if overwrite or not os.path.exists(path + u".URL"):
         with open(path + u".URL", u"w") as out_file:
             out_file.write(url_content)
 
+    return path + u".URL"
 
-def make_url_shortcut(url, path):
 
+def make_url_shortcut(url, path, overwrite=False):
+    """
+    Create a URL shortcut file for the operating system at a path (without extension) and return the path of the
+    file. An existing shortcut is only replaced if 'overwrite' is True.
+    """
     system = sys.platform.lower()
 
     if system == u"darwin":
-        _make_mac_url_shortcut(url, path)
+        return _make_mac_url_shortcut(url, path, overwrite)
     elif u"linux" in system:
-        _make_linux_url_shortcut(url, path)
+        return _make_linux_url_shortcut(url, path, overwrite)
     else:
-        _make_windows_url_shortcut(url, path)
+        return _make_windows_url_shortcut(url, path, overwrite)
@@ -0,0 +1,207 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+entity_memory.py, benchmark script
+
+Measures the memory held by the CanvasEntity hierarchy of a large synthetic course, built from dictionaries shaped like
+the responses of the Canvas API: a 'Files' section with all files of the course, modules linking to half of the files,
+HTML pages and external URLs. Nothing is downloaded, but the folders of the hierarchy are created in a temporary folder.
+
+The hierarchy is built with the 'compact_entities' setting off and on and the memory still allocated once the API
+responses are released is reported, as measured by tracemalloc (requires Python 3.4+). The size of each end point
+object is reported as well, the instance dictionary it would hold without __slots__ is not included in either
+measurement.
+
+Usage: python benchmarks/entity_memory.py [--files 20000]
+"""
+
+# Future imports
+from __future__ import print_function
+
+# Inbuilt modules
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), u".."))
+
+# CanvasSync modules
+from CanvasSync.entities.folder import Folder
+from CanvasSync.entities.synchronizer import Synchronizer
+from CanvasSync.settings.settings import Settings
+
+DOMAIN = u"https://canvas.example.edu"
+COURSE_ID = 1
+FOLDERS = 20
+PAGE_SIZE = 100
+
+
+def paginated(objects):
+    """ Returns the objects decoded from JSON pages of PAGE_SIZE objects, as received from the Canvas server """
+    decoded = []
+    for start in range(0, len(objects), PAGE_SIZE):
+        decoded.extend(json.loads(json.dumps(objects[start:start + PAGE_SIZE])))
+    return decoded
+
+
+def make_course(n_files):
+    """ Returns the folders, files and modules of a course with n_files files as decoded API responses """
+    folders = [{u"id": 100, u"name": u"course files", u"full_name": u"course files", u"parent_folder_id": None,
+                u"files_count": 0, u"folders_count": FOLDERS, u"hidden": False, u"locked": False}]
+    for number in range(FOLDERS):
+        folders.append({u"id": 101 + number, u"name": u"Week %d" % number,
+                        u"full_name": u"course files/Week %d" % number, u"parent_folder_id": 100,
+                        u"files_count": n_files // FOLDERS, u"folders_count": 0, u"hidden": False, u"locked": False})
+
+    files = []
+    for number in range(n_files):
+        file_id = 10000 + number
+        time_stamp = u"2023-%02d-%02dT10:%02d:00Z" % (number % 12 + 1, number % 28 + 1, number % 60)
+        files.append({u"id": file_id, u"uuid": u"a8Fj2kLq9ZxPw0%08d" % number, u"folder_id": 101 + number % FOLDERS,
+                      u"display_name": u"Lecture notes %d.pdf" % number, u"filename": u"lecture_notes_%d.pdf" % number,
+                      u"upload_status": u"success", u"content-type": u"application/pdf",
+                      u"url": u"%s/files/%d/download?download_frd=1&verifier=Xk29dLq0%d" % (DOMAIN, file_id, number),
+                      u"size": 250000 + number, u"created_at": time_stamp, u"updated_at": time_stamp,
+                      u"unlock_at": None, u"locked": False, u"hidden": False, u"lock_at": None,
+                      u"hidden_for_user": False, u"thumbnail_url": None, u"modified_at": time_stamp,
+                      u"mime_class": u"pdf", u"media_entry_id": None, u"category": u"uncategorized",
+                      u"locked_for_user": False, u"visibility_level": u"inherit",
+                      u"preview_url": u"/courses/%d/files/%d/file_preview?annotate=0" % (COURSE_ID, file_id)})
+
+    modules = []
+    for number in range(max(n_files // 100, 1)):
+        module_id = 500 + number
+        items = []
+
+        def add_item(item_type, title, **fields):
+            item = {u"id": module_id * 1000 + len(items), u"module_id": module_id, u"position": len(items) + 1,
+                    u"title": title, u"indent": 0, u"type": item_type, u"published": True,
+                    u"html_url": u"%s/courses/%d/modules/items/%d" % (DOMAIN, COURSE_ID, module_id * 1000 + len(items))}
+            item.update(fields)
+            items.append(item)
+
+        for file_number in range(number * 100, min(number * 100 + 100, n_files), 2):
+            file_id = 10000 + file_number
+            add_item(u"File", u"Lecture notes %d" % file_number, content_id=file_id,
+                     url=u"%s/api/v1/courses/%d/files/%d" % (DOMAIN, COURSE_ID, file_id),
+                     content_details={u"locked_for_user": False})
+        for page_number in range(5):
+            add_item(u"Page", u"Reading %d.%d" % (number, page_number), page_url=u"reading-%d-%d" % (number, page_number),
+                     url=u"%s/api/v1/courses/%d/pages/reading-%d-%d" % (DOMAIN, COURSE_ID, number, page_number))
+        for url_number in range(3):
+            add_item(u"ExternalUrl", u"Resource %d.%d" % (number, url_number),
+                     external_url=u"https://example.com/resource/%d/%d" % (number, url_number))
+
+        modules.append({u"id": module_id, u"name": u"Week %d" % number, u"position": number + 1,
+                        u"unlock_at": None, u"require_sequential_progress": False, u"published": True,
+                        u"items_count": len(items), u"items_url": u"%s/api/v1/courses/%d/modules/%d/items"
+                                                              % (DOMAIN, COURSE_ID, module_id),
+                        u"items": paginated(items)})
+
+    return paginated(folders), paginated(files), modules
+
+
+def add_folder_contents(folder):
+    """ Add the files and sub-folders of a Folder object as its sync method does, recursively """
+    folder.set_black_list()
+    folder.add_files()
+    folder.add_sub_folders()
+    for child in folder:
+        if isinstance(child, Folder):
+            add_folder_contents(child)
+
+
+def build_hierarchy(sync_path, n_files, compact_entities):
+    """ Returns the Synchronizer object of the hierarchy of a synthetic course """
+    settings = Settings()
+    settings.sync_path = sync_path
+    settings.domain = DOMAIN
+    settings.token = u"x" * 64
+    settings.courses_to_sync = [u"Large course"]
+    settings.compact_entities = compact_entities
+
+    # The hierarchy is built from the listings of make_course only, without requests to the API
+    settings.flat_file_listing = True
+    settings.inline_module_items = True
+    settings.use_file_index = True
+
+    synchronizer = Synchronizer(settings=settings, api=object())
+    synchronizer.add_courses([{u"id": COURSE_ID, u"name": u"Large course", u"course_code": u"Large course",
+                               u"updated_at": u"2023-01-01T00:00:00Z"}])
+    course = synchronizer[0]
+
+    folders, files, modules = make_course(n_files)
+    course.set_files_listing(files)
+
+    course.add_modules(modules)
+    for module in course:
+        module.add_items(module.get_inline_items())
+
+    course.add_files_folder(folders)
+    for child in course:
+        if isinstance(child, Folder):
+            add_folder_contents(child)
+
+    return synchronizer
+
+
+def measure(n_files, compact_entities):
+    """ Returns the number of entities of the hierarchy and the bytes allocated for it, see module docstring """
+    sync_path = tempfile.mkdtemp()
+    try:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+
+        synchronizer = build_hierarchy(sync_path, n_files, compact_entities)
+        gc.collect()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        return len(synchronizer.get_entity_index(COURSE_ID)), allocated, synchronizer
+    finally:
+        shutil.rmtree(sync_path, ignore_errors=True)
+
+
+def get_slots_size(entity):
+    """ Returns the size of an entity and the size of the instance dictionary it would hold without __slots__ """
+    attributes = {}
+    for cls in type(entity).__mro__:
+        for name in getattr(cls, u"__slots__", ()):
+            attributes[name] = getattr(entity, name)
+    return sys.getsizeof(entity), sys.getsizeof(attributes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u"Measure the memory held by a large CanvasEntity hierarchy")
+    parser.add_argument(u"--files", type=int, default=20000, help=u"the number of files of the course")
+    args = parser.parse_args()
+
+    results = [(compact, measure(args.files, compact)) for compact in (False, True)]
+
+    print(u"Hierarchy of a course of %d files:" % args.files)
+    for compact, (entities, allocated, _) in results:
+        print(u"    compact_entities=%-5s : %d indexed entities, %.1f MiB allocated (%.0f bytes per file)"
+              % (compact, entities, allocated / 1048576.0, allocated / float(args.files)))
+
+    full, compact = results[0][1][1], results[1][1][1]
+    print(u"    Reduction              : %.1f MiB (%.0f%%)" % ((full - compact) / 1048576.0,
+                                                              100.0 * (full - compact) / full))
+
+    synchronizer = results[1][1][2]
+    file = next(entity for entity in synchronizer.get_entities(COURSE_ID) if entity.get_identifier_string() == u"file")
+    size, dict_size = get_slots_size(file)
+    print(u"\nA File object takes %d bytes with __slots__, an instance dictionary of the same attributes would add "
+          u"%d bytes" % (size, dict_size))
+
+
+if __name__ == u"__main__":
+    main()
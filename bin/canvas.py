@@ -17,6 +17,7 @@ of start the synchronization process.
 The module takes the arguments -h or --help that will show a help screen and quit.
 The module takes the arguments -i or --info that will show the currently logged settings from the settings file.
 The module takes the arguments -s or --setup that will force CanvasSync to prompt the user for settings.
+The module takes the argument --clear-cache that will delete the cache of API responses.
 
 """
 
@@ -54,6 +55,8 @@ from CanvasSync.utilities.ANSI import ANSI
 from CanvasSync.settings.settings import Settings
 from CanvasSync.utilities import helpers
 from CanvasSync.utilities.instructure_api import InstructureApi
+from CanvasSync.utilities import http_pool
+from CanvasSync.utilities import http_cache
 from CanvasSync import usage
 
 try:
@@ -66,6 +69,71 @@ except ImportError:
           u"(alternatively use PIP to install CanvasSync)'")
 
 
+def parse_bool(value):
+    """ Interpret a command line string value as a boolean """
+    return value.strip().lower() in (u"1", u"true", u"yes", u"y", u"on")
+
+
+def parse_list(value):
+    """ Interpret a comma separated command line string value as a list of strings """
+    return [item.strip() for item in value.split(u",") if item.strip()]
+
+
+def parse_engine(value):
+    """ Validate the name of a sync engine """
+    if value not in (u"sync", u"async"):
+        raise ValueError(value)
+    return value
+
+
+# Long command line options used to tune the performance of the sync.
+# Each option maps to an attribute of the Settings object and the function
+# used to convert the command line string value.
+TUNING_OPTIONS = {u"pool-size": (u"http_pool_size", int),
+                  u"keep-alive": (u"http_keep_alive", parse_bool),
+                  u"engine": (u"sync_engine", parse_engine),
+                  u"async-concurrency": (u"async_concurrency", int),
+                  u"download-workers": (u"download_workers", int),
+                  u"download-queue-size": (u"download_queue_size", int),
+                  u"course-workers": (u"course_workers", int),
+                  u"download-buffer-size": (u"download_buffer_size", int),
+                  u"segment-threshold": (u"segmented_download_threshold", int),
+                  u"download-segments": (u"download_segments", int),
+                  u"sync-state": (u"use_sync_state", parse_bool),
+                  u"flat-listing": (u"flat_file_listing", parse_bool),
+                  u"file-index": (u"use_file_index", parse_bool),
+                  u"inline-items": (u"inline_module_items", parse_bool),
+                  u"bulk-pages": (u"bulk_page_bodies", parse_bool),
+                  u"http-cache": (u"http_cache", parse_bool),
+                  u"cache-size": (u"http_cache_size", int),
+                  u"memo-size": (u"memo_size", int),
+                  u"rate-limit": (u"rate_limit", parse_bool),
+                  u"rate-limit-window": (u"rate_limit_window", int),
+                  u"rate-limit-max-window": (u"rate_limit_max_window", int),
+                  u"retries": (u"request_retries", int),
+                  u"connect-timeout": (u"connect_timeout", float),
+                  u"read-timeout": (u"read_timeout", float),
+                  u"breaker-threshold": (u"breaker_threshold", int),
+                  u"breaker-cooldown": (u"breaker_cooldown", float),
+                  u"hedge": (u"hedge_requests", parse_bool),
+                  u"hedge-percentile": (u"hedge_percentile", float),
+                  u"hedge-budget": (u"hedge_budget", float),
+                  u"stall-detection": (u"stall_detection", parse_bool),
+                  u"stall-min-rate": (u"stall_min_rate", int),
+                  u"stall-window": (u"stall_window", float),
+                  u"stall-timeout": (u"stall_idle_timeout", float),
+                  u"stall-retries": (u"stall_retries", int),
+                  u"linked-max-size": (u"linked_file_max_size", int),
+                  u"linked-types": (u"linked_file_types", parse_list),
+                  u"linked-probe": (u"linked_file_probe", parse_bool),
+                  u"linked-host-limit": (u"linked_file_host_limit", int),
+                  u"dedup-store": (u"dedup_store", parse_bool),
+                  u"incremental": (u"incremental_sync", parse_bool),
+                  u"module-snapshots": (u"module_snapshots", parse_bool),
+                  u"full-sync-interval": (u"full_sync_interval", int),
+                  u"compact-entities": (u"compact_entities", parse_bool)}
+
+
 def run_canvas_sync():
     """
     Main CanvasSync function, reads arguments from the command line
@@ -74,7 +142,9 @@ def run_canvas_sync():
 
     # Get command line arguments (C-style)
     try:
-        opts, args = getopt.getopt(sys.argv[1:], u"hsiSp:", [u"help", u"setup", u"info", u"sync", u"password"])
+        opts, args = getopt.getopt(sys.argv[1:], u"hsiSp:",
+                                   [u"help", u"setup", u"info", u"sync", u"password", u"clear-cache"] +
+                                   [option + u"=" for option in TUNING_OPTIONS])
     except getopt.GetoptError as err:
         # print help information and exit
         print(err)
@@ -84,7 +154,9 @@ def run_canvas_sync():
     setup = False
     show_info = False
     manual_sync = False
+    clear_cache = False
     password = ""
+    tuning = {}
 
     if len(opts) != 0:
         for o, a in opts:
@@ -100,11 +172,22 @@ def run_canvas_sync():
             elif o in (u"-S", u"--sync"):
                 # Force sync
                 manual_sync = True
+            elif o == u"--clear-cache":
+                # Delete the cache of API responses
+                clear_cache = True
             elif o in (u"-p", u"--password"):
                 # Specify decyption password
                 print ("Warning: entering password via command "
                        "line can be dangerous")
                 password = a.rstrip()
+            elif o[2:] in TUNING_OPTIONS:
+                # Performance tuning option
+                attribute, convert = TUNING_OPTIONS[o[2:]]
+                try:
+                    tuning[attribute] = convert(a)
+                except ValueError:
+                    print(u"Invalid value '%s' for option %s" % (a, o))
+                    usage.help()
             else:
                 # Unknown option
                 assert False, u"Unknown option specified, please refer to " \
@@ -113,6 +196,13 @@ def run_canvas_sync():
     # Initialize Settings object. This object will parse the settings
     # file or generate a new one if one does not exist.
     settings = Settings()
+    for attribute, value in tuning.items():
+        setattr(settings, attribute, value)
+
+    # If --clear-cache was specified, delete all cached API responses
+    if clear_cache:
+        http_cache.clear(settings.cache_path)
+        print(u"Cleared the cache at %s" % settings.cache_path)
 
     # If the settings file does not exist or the user promoted to re-setup,
     # start prompting user for settings info.
@@ -155,6 +245,11 @@ def main_menu(settings):
 
 
 def do_sync(settings, password=None):
+    # Set up the connection pool shared by all HTTP traffic
+    http_pool.configure(pool_size=settings.http_pool_size,
+                        keep_alive=settings.http_keep_alive,
+                        timeout=(settings.connect_timeout, settings.read_timeout))
+
     # Initialize the Instructure Api object used to make API
     # calls to the Canvas server
     valid_token = settings.load_settings(password)
@@ -166,12 +261,34 @@ def do_sync(settings, password=None):
     api = InstructureApi(settings)
 
     # Start Synchronizer with the current settings
-    synchronizer = Synchronizer(settings=settings, api=api)
+    if settings.sync_engine == u"async":
+        try:
+            from CanvasSync.entities.async_synchronizer import AsyncSynchronizer
+        except ImportError:
+            print(u"\n [ERROR] The async sync engine requires the aiohttp package.\n"
+                  u"         Please install aiohttp or use --engine=sync")
+            sys.exit()
+        synchronizer = AsyncSynchronizer(settings=settings, api=api)
+    else:
+        synchronizer = Synchronizer(settings=settings, api=api)
     synchronizer.sync()
 
     # If here, sync was completed, show prompt
     print(ANSI.format(u"\n\n[*] Sync complete", formatting=u"bold"))
 
+    # Show how the number of API calls in flight was adapted to the rate limit of the server
+    stats = api.get_rate_limit_stats()
+    if stats is not None:
+        print(u"    %d API calls, at most %d in flight (window %.1f), throttled %d times, %.1f seconds of backoff"
+              % (stats[u"requests"], stats[u"max_in_flight"], stats[u"window"], stats[u"throttled"],
+                 stats[u"backoff_time"]))
+
+    # Show how many slow API calls were sent twice and how often the duplicate arrived first
+    stats = api.get_hedge_stats()
+    if stats is not None:
+        print(u"    %d of %d API calls hedged, the duplicate arrived first %d times"
+              % (stats[u"hedges"], stats[u"requests"], stats[u"hedge_wins"]))
+
 
 def entry():
     if os.name == u"nt":
@@ -47,6 +47,9 @@ setup(name='CanvasSync',
           ],
       },
       install_requires=requirements,
+      extras_require={
+          'async': ['aiohttp'],
+      },
       classifiers=['Development Status :: 3 - Alpha',
                    'Environment :: Console',
                    'Operating System :: MacOS :: MacOS X',
@@ -0,0 +1,184 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+fake_server.py, test helper
+
+Implements the FakeServer object, a small HTTP server running in a background thread that stands in for a Canvas
+server in the tests. Responses are served from a dictionary of routes mapping a path to a Resource object. A Resource
+holds a body and an ETag and answers conditional requests (If-None-Match), byte range requests (Range and If-Range)
+and may be set to fail or to ignore ranges. All requests are recorded so that the tests can check which headers were
+sent. The routes of a small course are made by make_course_routes.
+"""
+
+# Inbuilt modules
+import json
+import re
+import threading
+
+# Third party modules
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+
+class Resource(object):
+    def __init__(self, body, etag=u"\"v1\"", content_type=u"application/octet-stream", supports_ranges=True):
+        """
+        body            : bytes   | The body of the resource
+        etag            : string  | The ETag header of the resource, None to send no ETag
+        content_type    : string  | The Content-Type header of the resource
+        supports_ranges : boolean | Answer Range requests with 206 Partial Content, else with the full body
+        """
+        self.body = body
+        self.etag = etag
+        self.content_type = content_type
+        self.supports_ranges = supports_ranges
+
+        # The statuses of the next responses, served before the regular response, e.g. [500, 500] to fail twice
+        self.fail_with = []
+
+        # The first byte positions of the ranges that fail once with a 500 response
+        self.fail_ranges = set()
+
+        # Extra headers of the responses, e.g. a Link header
+        self.headers = {}
+
+    @classmethod
+    def json(cls, data, etag=u"\"v1\"", headers=None):
+        """ Returns a Resource object serving a JSON document """
+        resource = cls(json.dumps(data).encode(u"utf-8"), etag=etag, content_type=u"application/json")
+        resource.headers.update(headers or {})
+        return resource
+
+
+class FakeServer(object):
+    def __init__(self, routes=None):
+        """
+        routes : dict | A dictionary of Resource objects stored under the path (without the query string)
+        """
+        self.routes = routes or {}
+
+        # A list of (path, headers) tuples of all received requests
+        self.requests = []
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = u"HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                server.handle(self, send_body=False)
+
+            def do_GET(self):
+                server.handle(self, send_body=True)
+
+        class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self.httpd = Server((u"127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={u"poll_interval": 0.01})
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def url(self):
+        """ The URL of the server, e.g. 'http://127.0.0.1:12345' """
+        return u"http://127.0.0.1:%d" % self.httpd.server_address[1]
+
+    def get_requests(self, path):
+        """ Returns a list of the headers of the requests received for a path """
+        with self.lock:
+            return [headers for request_path, headers in self.requests if request_path == path]
+
+    def handle(self, handler, send_body):
+        """ Answer a request with the Resource object of its path """
+        path = handler.path.split(u"?")[0]
+        with self.lock:
+            self.requests.append((path, dict(handler.headers.items())))
+
+        resource = self.routes.get(path)
+        if resource is None:
+            return self.send(handler, 404, {}, b"", send_body)
+        if resource.fail_with:
+            return self.send(handler, resource.fail_with.pop(0), {}, b"", send_body)
+
+        headers = {u"Content-Type": resource.content_type}
+        headers.update(resource.headers)
+        if resource.etag:
+            headers[u"ETag"] = resource.etag
+
+        if resource.etag and handler.headers.get(u"If-None-Match") == resource.etag:
+            return self.send(handler, 304, headers, b"", send_body)
+
+        body = resource.body
+        range_header = handler.headers.get(u"Range")
+        if_range = handler.headers.get(u"If-Range")
+        if range_header and resource.supports_ranges and (not if_range or if_range == resource.etag):
+            match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+            first = int(match.group(1))
+            last = int(match.group(2)) if match.group(2) else len(body) - 1
+            if first >= len(body):
+                headers[u"Content-Range"] = u"bytes */%d" % len(body)
+                return self.send(handler, 416, headers, b"", send_body)
+            if first in resource.fail_ranges:
+                resource.fail_ranges.discard(first)
+                return self.send(handler, 500, {}, b"", send_body)
+
+            last = min(last, len(body) - 1)
+            headers[u"Content-Range"] = u"bytes %d-%d/%d" % (first, last, len(body))
+            return self.send(handler, 206, headers, body[first:last + 1], send_body)
+
+        return self.send(handler, 200, headers, body, send_body)
+
+    @staticmethod
+    def send(handler, status, headers, body, send_body):
+        """ Write a response """
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header(u"Content-Length", str(len(body)))
+        handler.end_headers()
+        if send_body:
+            handler.wfile.write(body)
+
+
+def make_course_routes(url, page_body):
+    """
+    Returns the routes of a course with a module holding a page and a file in the 'Files' section of the course
+
+    url       : string | The URL of the fake server
+    page_body : string | The HTML body of the page
+    """
+    file_info = {u"id": 30, u"display_name": u"notes.txt", u"filename": u"notes.txt", u"size": 5,
+                 u"url": url + u"/files/30/download", u"folder_id": 100, u"locked_for_user": False,
+                 u"updated_at": u"2020-01-01T00:00:00Z", u"modified_at": u"2020-01-01T00:00:00Z"}
+    page_info = {u"page_id": 20, u"url": u"reading", u"title": u"Reading", u"body": page_body,
+                 u"updated_at": u"2020-01-01T00:00:00Z", u"html_url": url + u"/courses/1/pages/reading"}
+    page_item = {u"id": 11, u"type": u"Page", u"title": u"Reading", u"indent": 0, u"position": 1,
+                 u"page_url": u"reading", u"url": url + u"/api/v1/courses/1/pages/reading"}
+
+    return {u"/api/v1/courses": Resource.json([{u"id": 1, u"name": u"Course", u"course_code": u"Course"}]),
+            u"/api/v1/courses/1/modules": Resource.json([{u"id": 10, u"name": u"Module", u"position": 1,
+                                                          u"items_count": 1}]),
+            u"/api/v1/courses/1/modules/10/items": Resource.json([page_item]),
+            u"/api/v1/courses/1/pages/reading": Resource.json(page_info),
+            u"/api/v1/courses/1/files/30": Resource.json(file_info),
+            u"/api/v1/courses/1/folders": Resource.json([{u"id": 100, u"name": u"course files",
+                                                          u"full_name": u"course files",
+                                                          u"parent_folder_id": None}]),
+            u"/api/v1/folders/100/files": Resource.json([file_info]),
+            u"/api/v1/folders/100/folders": Resource.json([]),
+            u"/files/30/download": Resource(b"notes")}
@@ -0,0 +1,101 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_blob_store.py, tests
+
+Tests of the BlobStore object, see the blob_store module.
+"""
+
+# Inbuilt modules
+import os
+import shutil
+import tempfile
+import unittest
+
+# CanvasSync modules
+from CanvasSync.utilities.blob_store import BlobStore
+from CanvasSync.utilities.sync_state import SyncState
+
+FILE_INFO = {u"id": 1, u"uuid": u"abc", u"size": 5, u"modified_at": u"2020-01-01T00:00:00Z"}
+
+
+@unittest.skipIf(not hasattr(os, u"link"), u"Hard links are not supported")
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.sync_state = SyncState.open_in(self.directory)
+        self.store = BlobStore.open_in(self.directory, self.sync_state)
+        self.key = BlobStore.get_key(FILE_INFO)
+
+    def tearDown(self):
+        self.sync_state.close()
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content=b"hello"):
+        path = os.path.join(self.directory, name)
+        with open(path, u"wb") as out_file:
+            out_file.write(content)
+        return path
+
+    def read(self, path):
+        with open(path, u"rb") as in_file:
+            return in_file.read()
+
+    def test_key_changes_with_version(self):
+        self.assertNotEqual(BlobStore.get_key(dict(FILE_INFO, modified_at=u"2021-01-01T00:00:00Z")), self.key)
+        self.assertNotEqual(BlobStore.get_key(dict(FILE_INFO, size=6)), self.key)
+
+    def test_link_unknown_key(self):
+        self.assertFalse(self.store.link(self.key, os.path.join(self.directory, u"a.txt")))
+
+    def test_added_file_is_linked_to_other_locations(self):
+        first = self.write(u"a.txt")
+        self.store.add(self.key, first)
+
+        second = os.path.join(self.directory, u"b.txt")
+        self.assertTrue(self.store.link(self.key, second))
+
+        self.assertEqual(self.read(second), b"hello")
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(os.stat(first).st_nlink, 3)
+
+    def test_same_content_under_other_key_is_stored_once(self):
+        first = self.write(u"a.txt")
+        self.store.add(self.key, first)
+
+        # The copy of the file in another course has its own key
+        second = self.write(u"b.txt")
+        self.store.add(BlobStore.get_key(dict(FILE_INFO, uuid=u"def")), second)
+
+        self.assertTrue(os.path.samefile(first, second))
+
+    def test_modified_blob_is_not_linked(self):
+        first = self.write(u"a.txt")
+        self.store.add(self.key, first)
+
+        # Editing a location in place also edits the blob
+        with open(first, u"wb") as out_file:
+            out_file.write(b"HELLO")
+
+        self.assertFalse(self.store.link(self.key, os.path.join(self.directory, u"b.txt")))
+        self.assertIsNone(self.sync_state.get_blob(self.key))
+
+    def test_prune_deletes_unlinked_blobs(self):
+        first = self.write(u"a.txt")
+        self.store.add(self.key, first)
+        kept = self.write(u"b.txt", b"other")
+        self.store.add(BlobStore.get_key(dict(FILE_INFO, uuid=u"def")), kept)
+
+        os.remove(first)
+
+        self.assertEqual(self.store.prune(), 1)
+        self.assertFalse(self.store.link(self.key, os.path.join(self.directory, u"c.txt")))
+        self.assertEqual(self.read(kept), b"other")
+        self.assertEqual(self.store.prune(), 0)
+
+
+if __name__ == u"__main__":
+    unittest.main()
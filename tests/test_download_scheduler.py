@@ -0,0 +1,136 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_download_scheduler.py, tests
+
+Tests of the DownloadScheduler object, see the download_scheduler module.
+"""
+
+# Inbuilt modules
+import threading
+import time
+import unittest
+
+# CanvasSync modules
+from CanvasSync.utilities.download_scheduler import DownloadScheduler
+
+
+class TestDownloadScheduler(unittest.TestCase):
+    def test_runs_in_calling_thread_without_workers(self):
+        scheduler = DownloadScheduler(workers=0)
+        scheduler.start()
+
+        threads = []
+        scheduler.submit(lambda: threads.append(threading.current_thread()))
+
+        self.assertFalse(scheduler.is_concurrent())
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_join_waits_for_all_jobs(self):
+        scheduler = DownloadScheduler(workers=4, queue_size=2)
+        scheduler.start()
+
+        done = []
+        lock = threading.Lock()
+
+        def job(number):
+            time.sleep(0.01)
+            with lock:
+                done.append(number)
+
+        for number in range(20):
+            scheduler.submit(lambda number=number: job(number))
+        scheduler.join()
+
+        self.assertEqual(sorted(done), list(range(20)))
+        self.assertFalse(scheduler.is_running())
+
+    def test_jobs_run_concurrently(self):
+        scheduler = DownloadScheduler(workers=3)
+        scheduler.start()
+
+        # Each job waits for all three to have started, which only happens if they run at the same time
+        started = []
+        all_started = threading.Event()
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                started.append(True)
+                if len(started) == 3:
+                    all_started.set()
+            all_started.wait(5)
+
+        for _ in range(3):
+            scheduler.submit(job)
+        scheduler.join()
+
+        self.assertTrue(all_started.is_set())
+
+    def test_submit_blocks_while_queue_is_full(self):
+        scheduler = DownloadScheduler(workers=1, queue_size=1)
+        scheduler.start()
+
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking_job():
+            started.set()
+            release.wait(5)
+
+        scheduler.submit(blocking_job)
+        started.wait(5)
+        scheduler.submit(lambda: None)
+
+        # The worker is busy and the queue holds one job, the next submit waits for room
+        submitted = threading.Event()
+        thread = threading.Thread(target=lambda: (scheduler.submit(lambda: None), submitted.set()))
+        thread.start()
+
+        self.assertFalse(submitted.wait(0.2))
+        release.set()
+        self.assertTrue(submitted.wait(5))
+
+        thread.join()
+        scheduler.join()
+
+    def test_join_raises_first_error(self):
+        scheduler = DownloadScheduler(workers=2)
+        scheduler.start()
+
+        def failing_job():
+            raise IOError(u"download failed")
+
+        scheduler.submit(failing_job)
+        with self.assertRaises(IOError):
+            scheduler.join()
+
+    def test_abort_discards_pending_jobs(self):
+        scheduler = DownloadScheduler(workers=1, queue_size=8)
+        scheduler.start()
+
+        release = threading.Event()
+        started = threading.Event()
+        done = []
+
+        def blocking_job():
+            started.set()
+            release.wait(5)
+
+        scheduler.submit(blocking_job)
+        started.wait(5)
+        for number in range(5):
+            scheduler.submit(lambda number=number: done.append(number))
+
+        threading.Timer(0.1, release.set).start()
+        scheduler.abort()
+
+        self.assertEqual(done, [])
+        self.assertFalse(scheduler.is_running())
+
+
+if __name__ == u"__main__":
+    unittest.main()
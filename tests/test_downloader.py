@@ -0,0 +1,181 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_downloader.py, tests
+
+Tests of resumed (Range and If-Range) and segmented file downloads, see the downloader module.
+"""
+
+# Inbuilt modules
+import os
+import shutil
+import tempfile
+import unittest
+
+# Third party modules
+import requests
+
+# CanvasSync modules
+from CanvasSync.utilities import downloader
+from tests.fake_server import FakeServer, Resource
+
+PAYLOAD = bytes(bytearray(range(256))) * 40
+IDENTITY = {u"id": 1, u"size": len(PAYLOAD), u"modified_at": u"2020-01-01T00:00:00Z"}
+
+
+class DownloaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, u"file.bin")
+
+        self.resource = Resource(PAYLOAD)
+        self.server = FakeServer({u"/file": self.resource}).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__()
+        shutil.rmtree(self.directory)
+
+    def request(self, headers):
+        return requests.get(self.server.url + u"/file", headers=headers, stream=True)
+
+    def write_partial(self, size, identity=IDENTITY, validator=u"\"v1\""):
+        """ Leave a partial download of the first 'size' bytes of the payload, as an interrupted download does """
+        with open(downloader.get_part_path(self.path), u"wb") as out_file:
+            out_file.write(PAYLOAD[:size])
+        downloader.write_sidecar(self.path, {u"identity": identity, u"validator": validator})
+
+    def read(self):
+        with open(self.path, u"rb") as in_file:
+            return in_file.read()
+
+    def assertCompleted(self):
+        self.assertEqual(self.read(), self.resource.body)
+        self.assertFalse(os.path.exists(downloader.get_part_path(self.path)))
+        self.assertFalse(os.path.exists(downloader.get_sidecar_path(self.path)))
+
+
+class TestDownload(DownloaderTestCase):
+    def test_download(self):
+        validator = downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+
+        self.assertEqual(validator, u"\"v1\"")
+        self.assertCompleted()
+
+    def test_resume_sends_range_and_if_range(self):
+        self.write_partial(3000)
+
+        downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+
+        headers = self.server.get_requests(u"/file")[-1]
+        self.assertEqual(headers[u"Range"], u"bytes=3000-")
+        self.assertEqual(headers[u"If-Range"], u"\"v1\"")
+        self.assertCompleted()
+
+    def test_changed_file_is_downloaded_in_full(self):
+        self.write_partial(3000)
+
+        # The file changed on the server, If-Range does not match and the full file is sent
+        self.resource.body = b"x" * 5000
+        self.resource.etag = u"\"v2\""
+        validator = downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+
+        self.assertEqual(validator, u"\"v2\"")
+        self.assertCompleted()
+
+    def test_server_without_ranges(self):
+        self.write_partial(3000)
+        self.resource.supports_ranges = False
+
+        downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+
+        self.assertCompleted()
+
+    def test_partial_download_of_other_identity_is_discarded(self):
+        self.write_partial(3000, identity=dict(IDENTITY, modified_at=u"2019-01-01T00:00:00Z"))
+
+        downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+
+        self.assertNotIn(u"Range", self.server.get_requests(u"/file")[-1])
+        self.assertCompleted()
+
+    def test_unsatisfiable_range_starts_over(self):
+        # The '.part' file is longer than the file on the server, which responds 416
+        self.write_partial(3000)
+        self.resource.body = PAYLOAD[:2000]
+
+        downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+
+        ranges = [headers.get(u"Range") for headers in self.server.get_requests(u"/file")]
+        self.assertEqual(ranges, [u"bytes=3000-", None])
+        self.assertCompleted()
+
+    def test_interrupted_download_keeps_part_file(self):
+        self.resource.fail_with = [500]
+
+        with self.assertRaises(IOError):
+            downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+        self.assertFalse(os.path.exists(self.path))
+
+        downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY)
+        self.assertCompleted()
+
+    def test_check_size_refuses_file(self):
+        def check_size(size):
+            if size > 2000:
+                raise IOError(u"Too large")
+
+        with self.assertRaises(IOError):
+            downloader.download(self.request, self.path, chunk_size=1000, identity=IDENTITY, check_size=check_size)
+
+        # A refused file is not kept to be resumed
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class TestSegmentedDownload(DownloaderTestCase):
+    def test_segmented_download(self):
+        validator = downloader.download_segmented(self.request, self.path, chunk_size=1000, identity=IDENTITY,
+                                                  segments=4)
+
+        ranges = sorted(headers[u"Range"] for headers in self.server.get_requests(u"/file"))
+        self.assertEqual(ranges, [u"bytes=0-2559", u"bytes=2560-5119", u"bytes=5120-7679", u"bytes=7680-10239"])
+        self.assertEqual(validator, u"\"v1\"")
+        self.assertCompleted()
+
+    def test_only_missing_segments_are_fetched_when_resumed(self):
+        self.resource.fail_ranges = {5120}
+
+        with self.assertRaises(IOError):
+            downloader.download_segmented(self.request, self.path, chunk_size=1000, identity=IDENTITY, segments=4)
+        self.assertFalse(os.path.exists(self.path))
+
+        self.server.requests = []
+        downloader.download_segmented(self.request, self.path, chunk_size=1000, identity=IDENTITY, segments=4)
+
+        headers = self.server.get_requests(u"/file")
+        self.assertEqual([request[u"Range"] for request in headers], [u"bytes=5120-7679"])
+        self.assertEqual(headers[0][u"If-Range"], u"\"v1\"")
+        self.assertCompleted()
+
+    def test_server_without_ranges(self):
+        self.resource.supports_ranges = False
+
+        downloader.download_segmented(self.request, self.path, chunk_size=1000, identity=IDENTITY, segments=4)
+
+        self.assertEqual(len(self.server.get_requests(u"/file")), 1)
+        self.assertCompleted()
+
+    def test_truncated_full_response_is_not_completed(self):
+        self.resource.supports_ranges = False
+        self.resource.body = PAYLOAD[:2000]
+
+        with self.assertRaises(IOError):
+            downloader.download_segmented(self.request, self.path, chunk_size=1000, identity=IDENTITY, segments=4)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(downloader.get_part_path(self.path)))
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_entity_memory.py, tests
+
+Smoke test of the memory benchmark of the CanvasEntity hierarchy, see benchmarks/entity_memory.py.
+"""
+
+# Inbuilt modules
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), u"..", u"benchmarks"))
+
+# CanvasSync modules
+import entity_memory
+
+N_FILES = 200
+
+
+class TestEntityMemory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def count_entities(self, entity, counts):
+        for child in entity:
+            counts[child.get_identifier_string()] = counts.get(child.get_identifier_string(), 0) + 1
+            self.count_entities(child, counts)
+        return counts
+
+    def test_hierarchy_is_built_without_api(self):
+        for compact_entities in (False, True):
+            synchronizer = entity_memory.build_hierarchy(os.path.join(self.directory, str(compact_entities)),
+                                                         N_FILES, compact_entities)
+            counts = self.count_entities(synchronizer[0], {})
+
+            # The files linked in modules are not synced again to their folder
+            self.assertEqual(counts[u"file"], N_FILES)
+            self.assertEqual(counts[u"module"], N_FILES // 100)
+            self.assertEqual(counts[u"folder"], entity_memory.FOLDERS + 1)
+
+    def test_compact_entities_take_less_memory(self):
+        full = entity_memory.measure(N_FILES, compact_entities=False)
+        compact = entity_memory.measure(N_FILES, compact_entities=True)
+
+        self.assertEqual(full[0], compact[0])
+        self.assertLess(compact[1], full[1])
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_http_cache.py, tests
+
+Tests of the HttpCache object and of the revalidation of cached responses by the InstructureApi object, see the
+http_cache module.
+"""
+
+# Inbuilt modules
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+# CanvasSync modules
+from CanvasSync.settings.settings import Settings
+from CanvasSync.utilities import http_cache
+from CanvasSync.utilities.http_cache import HttpCache
+from CanvasSync.utilities.instructure_api import InstructureApi
+from tests.fake_server import FakeServer, Resource
+
+URL = u"https://canvas.example.edu/api/v1/courses"
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), u"cache")
+        self.user = http_cache.get_user_key(u"https://canvas.example.edu", u"token")
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def test_put_and_get(self):
+        cache = HttpCache(self.directory)
+        cache.put(URL, self.user, u"\"v1\"", None, u"[]", next_call=u"/api/v1/courses?page=2")
+
+        entry = HttpCache(self.directory).get(URL, self.user)
+        self.assertEqual(entry[u"etag"], u"\"v1\"")
+        self.assertEqual(entry[u"body"], u"[]")
+        self.assertEqual(entry[u"next"], u"/api/v1/courses?page=2")
+
+    def test_response_without_validator_is_not_stored(self):
+        cache = HttpCache(self.directory)
+        cache.put(URL, self.user, None, None, u"[]")
+
+        self.assertIsNone(cache.get(URL, self.user))
+
+    def test_responses_are_kept_per_user(self):
+        other_user = http_cache.get_user_key(u"https://canvas.example.edu", u"other token")
+
+        cache = HttpCache(self.directory)
+        cache.put(URL, self.user, u"\"v1\"", None, u"[1]")
+        cache.put(URL, other_user, u"\"v2\"", None, u"[2]")
+
+        self.assertEqual(cache.get(URL, self.user)[u"body"], u"[1]")
+        self.assertEqual(cache.get(URL, other_user)[u"body"], u"[2]")
+        self.assertIsNone(cache.get(URL, http_cache.get_user_key(u"https://canvas.example.edu", u"third token")))
+
+    def test_user_key_does_not_contain_token(self):
+        self.assertNotIn(u"token", http_cache.get_user_key(u"https://canvas.example.edu", u"token"))
+
+    @unittest.skipIf(os.name == u"nt", u"POSIX permissions")
+    def test_cache_is_private(self):
+        cache = HttpCache(self.directory)
+        cache.put(URL, self.user, u"\"v1\"", None, u"[]")
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.directory).st_mode), 0o700)
+        for name in os.listdir(self.directory):
+            self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.directory, name)).st_mode), 0o600)
+
+    def test_least_recently_used_responses_are_evicted(self):
+        cache = HttpCache(self.directory)
+        cache.put(URL + u"/0", self.user, u"\"v1\"", None, u"x" * 300)
+
+        # Room for three responses of the same size
+        cache = HttpCache(self.directory, max_size=cache.size * 3 + cache.size // 2)
+        for number in range(1, 3):
+            cache.put(URL + u"/%d" % number, self.user, u"\"v1\"", None, u"x" * 300)
+
+        # The first response is used, the second is then the least recently used
+        cache.get(URL + u"/0", self.user)
+        cache.put(URL + u"/3", self.user, u"\"v1\"", None, u"x" * 300)
+
+        self.assertIsNotNone(cache.get(URL + u"/0", self.user))
+        self.assertIsNone(cache.get(URL + u"/1", self.user))
+        self.assertLessEqual(cache.size, cache.max_size)
+
+
+class TestRevalidation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resource = Resource.json([{u"id": 1}], etag=u"\"v1\"")
+        self.server = FakeServer({u"/api/v1/courses": self.resource}).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__()
+        shutil.rmtree(self.directory)
+
+    def make_api(self, token=u"token"):
+        settings = Settings()
+        settings.domain = self.server.url
+        settings.token = token
+        settings.cache_path = os.path.join(self.directory, u"cache")
+        settings.memo_size = 0
+        return InstructureApi(settings)
+
+    def test_unchanged_response_is_served_from_cache(self):
+        self.assertEqual(self.make_api().get_json(u"/api/v1/courses"), [{u"id": 1}])
+        self.assertEqual(self.make_api().get_json(u"/api/v1/courses"), [{u"id": 1}])
+
+        requests = self.server.get_requests(u"/api/v1/courses")
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn(u"If-None-Match", requests[0])
+        self.assertEqual(requests[1][u"If-None-Match"], u"\"v1\"")
+
+    def test_changed_response_replaces_cached_response(self):
+        self.make_api().get_json(u"/api/v1/courses")
+
+        self.resource.body = b"[{\"id\": 2}]"
+        self.resource.etag = u"\"v2\""
+        self.assertEqual(self.make_api().get_json(u"/api/v1/courses"), [{u"id": 2}])
+        self.assertEqual(self.make_api().get_json(u"/api/v1/courses"), [{u"id": 2}])
+
+        self.assertEqual(self.server.get_requests(u"/api/v1/courses")[-1][u"If-None-Match"], u"\"v2\"")
+
+    def test_response_of_other_user_is_not_revalidated(self):
+        self.make_api(token=u"token").get_json(u"/api/v1/courses")
+        self.make_api(token=u"other token").get_json(u"/api/v1/courses")
+
+        self.assertNotIn(u"If-None-Match", self.server.get_requests(u"/api/v1/courses")[-1])
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_module.py, tests
+
+Tests of the snapshots of modules stored in the SyncState database when the 'module_snapshots' setting is active,
+see Module.get_snapshot.
+"""
+
+# Inbuilt modules
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+# CanvasSync modules
+from CanvasSync.entities.synchronizer import Synchronizer
+from CanvasSync.settings.settings import Settings
+from CanvasSync.utilities.instructure_api import InstructureApi
+from tests.fake_server import FakeServer, Resource, make_course_routes
+
+ITEMS = u"/api/v1/courses/1/modules/10/items"
+FILE_INFO = u"/api/v1/courses/1/files/30"
+
+
+class TestModuleSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeServer().__enter__()
+        self.server.routes.update(make_course_routes(self.server.url, u"<p>No files</p>"))
+
+        # The module holds the page and the file of the course
+        file_item = {u"id": 12, u"type": u"File", u"title": u"notes", u"indent": 0, u"position": 2,
+                     u"content_id": 30, u"url": self.server.url + FILE_INFO}
+        items = json.loads(self.server.routes[ITEMS].body.decode(u"utf-8")) + [file_item]
+        self.server.routes[ITEMS] = Resource.json(items)
+        self.set_module(name=u"Module", items_count=len(items))
+
+    def tearDown(self):
+        self.server.__exit__()
+        shutil.rmtree(self.directory)
+
+    def set_module(self, **fields):
+        module = {u"id": 10, u"name": u"Module", u"position": 1, u"items_count": 2}
+        module.update(fields)
+        self.server.routes[u"/api/v1/courses/1/modules"] = Resource.json([module], etag=None)
+
+    def sync(self, module_snapshots=True):
+        """ Sync the course and return the Synchronizer object """
+        settings = Settings()
+        settings.sync_path = os.path.join(self.directory, u"sync")
+        settings.domain = self.server.url
+        settings.token = u"token"
+        settings.courses_to_sync = [u"Course"]
+        settings.sync_assignments = False
+        settings.cache_path = os.path.join(self.directory, u"cache")
+        settings.memo_size = 0
+        settings.module_snapshots = module_snapshots
+
+        synchronizer = Synchronizer(settings=settings, api=InstructureApi(settings))
+        synchronizer.sync()
+        return synchronizer
+
+    def count(self, path):
+        return len(self.server.get_requests(path))
+
+    def get_file_path(self):
+        return os.path.join(self.directory, u"sync", u"Course", u"1 - Module", u"notes.txt")
+
+    def test_unchanged_module_is_rebuilt_from_snapshot(self):
+        self.sync()
+        synchronizer = self.sync()
+
+        self.assertEqual(self.count(ITEMS), 1)
+        self.assertEqual(synchronizer.get_failures(), [])
+        self.assertIn(30, synchronizer.get_entity_index(1).get_ids(u"file"))
+        self.assertEqual(len(synchronizer.get_entity_index(1).get_ids(u"page")), 1)
+
+    def test_file_information_is_not_taken_from_snapshot(self):
+        self.sync()
+        file_requests = self.count(FILE_INFO)
+
+        # The file changes on the server, which does not change the fingerprint of the module
+        file_info = json.loads(self.server.routes[FILE_INFO].body.decode(u"utf-8"))
+        file_info.update(size=7, modified_at=u"2021-01-01T00:00:00Z", updated_at=u"2021-01-01T00:00:00Z")
+        self.server.routes[FILE_INFO] = Resource.json(file_info, etag=u"\"v2\"")
+        self.server.routes[u"/files/30/download"] = Resource(b"changed")
+
+        self.sync()
+
+        self.assertEqual(self.count(ITEMS), 1)
+        self.assertGreater(self.count(FILE_INFO), file_requests)
+        with open(self.get_file_path(), u"rb") as in_file:
+            self.assertEqual(in_file.read(), b"changed")
+
+    def test_changed_module_is_downloaded(self):
+        self.sync()
+        self.set_module(items_count=2, published=False)
+        self.sync()
+
+        self.assertEqual(self.count(ITEMS), 2)
+
+    def test_snapshots_are_not_used_if_disabled(self):
+        self.sync(module_snapshots=False)
+        self.sync(module_snapshots=False)
+
+        self.assertEqual(self.count(ITEMS), 2)
+
+
+if __name__ == u"__main__":
+    unittest.main()
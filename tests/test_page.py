@@ -0,0 +1,119 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_page.py, tests
+
+Tests of the Page object synced by a Synchronizer from a fake Canvas server, in particular that the files linked in a
+page recorded as unchanged in the SyncState database are still synced, see Page.download.
+"""
+
+# Inbuilt modules
+import os
+import shutil
+import tempfile
+import unittest
+
+# CanvasSync modules
+from CanvasSync.entities.synchronizer import Synchronizer
+from CanvasSync.settings.settings import Settings
+from CanvasSync.utilities.instructure_api import InstructureApi
+from tests.fake_server import FakeServer, make_course_routes
+
+
+class TestUnchangedPage(unittest.TestCase):
+    synchronizer_class = Synchronizer
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeServer().__enter__()
+
+        body = u"<p>Read <a data-api-endpoint=\"%s/api/v1/courses/1/files/30\">the notes</a></p>" % self.server.url
+        self.server.routes.update(make_course_routes(self.server.url, body))
+
+    def tearDown(self):
+        self.server.__exit__()
+        shutil.rmtree(self.directory)
+
+    def make_settings(self):
+        settings = Settings()
+        settings.sync_path = os.path.join(self.directory, u"sync")
+        settings.domain = self.server.url
+        settings.token = u"token"
+        settings.courses_to_sync = [u"Course"]
+        settings.sync_assignments = False
+        settings.cache_path = os.path.join(self.directory, u"cache")
+        settings.memo_size = 0
+        return settings
+
+    def sync(self):
+        """ Sync the course and return the Synchronizer object """
+        settings = self.make_settings()
+        synchronizer = self.synchronizer_class(settings=settings, api=InstructureApi(settings))
+        synchronizer.sync()
+        return synchronizer
+
+    def get_page_folder(self):
+        return os.path.join(self.directory, u"sync", u"Course", u"1 - Module", u"Reading")
+
+    @staticmethod
+    def get_linked_file(synchronizer):
+        """ Returns the File object of the file linked in the page, None if not a child of the page """
+        for entity in synchronizer.get_entities(1):
+            if entity.get_identifier_string() == u"file" and entity.get_parent().get_identifier_string() == u"page":
+                return entity
+        return None
+
+    def get_other_files_copy(self):
+        return os.path.join(self.directory, u"sync", u"Course", u"Other Files", u"notes.txt")
+
+    def test_linked_file_is_synced_with_page(self):
+        synchronizer = self.sync()
+
+        self.assertEqual(synchronizer.get_failures(), [])
+        self.assertTrue(os.path.exists(os.path.join(self.get_page_folder(), u"Reading.html")))
+        self.assertTrue(os.path.exists(self.get_linked_file(synchronizer).sync_path))
+        self.assertFalse(os.path.exists(self.get_other_files_copy()))
+
+    def test_unchanged_page_keeps_its_linked_files(self):
+        self.sync()
+        downloads = len(self.server.get_requests(u"/files/30/download"))
+
+        synchronizer = self.sync()
+
+        # The page is not written again, but the file linked in it is still a child of the page, so it is not
+        # synced again to the 'Other Files' folder
+        self.assertIsNotNone(self.get_linked_file(synchronizer))
+        self.assertFalse(os.path.exists(self.get_other_files_copy()))
+        self.assertEqual(len(self.server.get_requests(u"/files/30/download")), downloads)
+        self.assertEqual(synchronizer.get_failures(), [])
+
+    def test_failed_linked_file_is_retried(self):
+        self.server.routes[u"/files/30/download"].fail_with = [404]
+        synchronizer = self.sync()
+
+        self.assertEqual(len(synchronizer.get_failures()), 1)
+        self.assertFalse(os.path.exists(self.get_linked_file(synchronizer).sync_path))
+
+        # The page is unchanged, but the file that failed is downloaded by the next sync
+        synchronizer = self.sync()
+
+        self.assertEqual(synchronizer.get_failures(), [])
+        self.assertTrue(os.path.exists(self.get_linked_file(synchronizer).sync_path))
+
+
+class TestUnchangedPageAsync(TestUnchangedPage):
+    """ The same tests run with the asynchronous sync engine """
+    def setUp(self):
+        try:
+            from CanvasSync.entities.async_synchronizer import AsyncSynchronizer
+        except ImportError:
+            self.skipTest(u"The async engine requires aiohttp")
+        self.synchronizer_class = AsyncSynchronizer
+        TestUnchangedPage.setUp(self)
+
+
+if __name__ == u"__main__":
+    unittest.main()
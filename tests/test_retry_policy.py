@@ -0,0 +1,197 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_retry_policy.py, tests
+
+Tests of the RetryPolicy and CircuitBreaker objects and of their use by the InstructureApi object, see the
+retry_policy module.
+"""
+
+# Inbuilt modules
+import time
+import unittest
+
+# CanvasSync modules
+from CanvasSync.settings.settings import Settings
+from CanvasSync.utilities.instructure_api import InstructureApi
+from CanvasSync.utilities.retry_policy import CircuitBreaker, InstructureApiError, RetryPolicy
+from CanvasSync.utilities import retry_policy
+from tests.fake_server import FakeServer, Resource
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_retryable_statuses(self):
+        policy = RetryPolicy()
+
+        for status in (429, 500, 502, 503, 504):
+            self.assertTrue(policy.is_retryable_status(status))
+        for status in (200, 304, 401, 403, 404):
+            self.assertFalse(policy.is_retryable_status(status))
+
+    def test_delay_grows_and_is_bounded(self):
+        policy = RetryPolicy(max_retries=10, backoff=1.0, max_backoff=8.0)
+
+        for attempt in range(10):
+            delay = policy.get_delay(attempt)
+            expected = min(2.0 ** attempt, 8.0)
+            self.assertTrue(expected / 2 <= delay <= expected)
+
+    def test_retry_after_is_respected(self):
+        policy = RetryPolicy(backoff=0.1, max_backoff=8.0)
+
+        self.assertGreaterEqual(policy.get_delay(0, retry_after=u"5"), 5.0)
+        self.assertLessEqual(policy.get_delay(0, retry_after=u"3600"), 8.0)
+
+    def test_no_delay_after_last_retry(self):
+        policy = RetryPolicy(max_retries=2)
+
+        self.assertIsNotNone(policy.get_delay(1))
+        self.assertIsNone(policy.get_delay(2))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=30.0)
+
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(breaker.allow())
+
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=30.0)
+
+        for _ in range(2):
+            breaker.record_failure()
+        breaker.record_success()
+        for _ in range(2):
+            breaker.record_failure()
+
+        self.assertFalse(breaker.is_open())
+
+    def test_half_open_lets_single_trial_through(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+
+        # Half-open, one trial request is let through and other requests wait for its outcome
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+    def test_successful_trial_closes_circuit(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_opens_circuit_again(self):
+        breaker = CircuitBreaker(threshold=5, cooldown=0.05)
+        for _ in range(5):
+            breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertTrue(breaker.is_open())
+        self.assertFalse(breaker.allow())
+
+    def test_threshold_zero_never_opens(self):
+        breaker = CircuitBreaker(threshold=0)
+        for _ in range(100):
+            breaker.record_failure()
+
+        self.assertFalse(breaker.is_open())
+
+    def test_breakers_are_shared_per_endpoint(self):
+        domain = u"https://breakers.example.edu"
+        breaker = retry_policy.get_breaker(domain, u"/api/v1/courses/1/files?per_page=100")
+
+        self.assertIs(retry_policy.get_breaker(domain, u"/api/v1/courses/2/files"), breaker)
+        self.assertIsNot(retry_policy.get_breaker(domain, u"/api/v1/courses/2/folders"), breaker)
+
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        self.resource = Resource.json([{u"id": 1}])
+        self.server = FakeServer({u"/api/v1/courses": self.resource}).__enter__()
+
+        settings = Settings()
+        settings.domain = self.server.url
+        settings.token = u"token"
+        settings.http_cache = False
+        settings.memo_size = 0
+        settings.breaker_threshold = 3
+        settings.breaker_cooldown = 30
+
+        self.api = InstructureApi(settings)
+        self.api.get_retry_policy = lambda: RetryPolicy(max_retries=2, backoff=0.0)
+
+    def tearDown(self):
+        self.server.__exit__()
+
+    def test_transient_failures_are_retried(self):
+        self.resource.fail_with = [503, 500]
+
+        self.assertEqual(self.api.get_json(u"/api/v1/courses"), [{u"id": 1}])
+        self.assertEqual(len(self.server.get_requests(u"/api/v1/courses")), 3)
+        self.assertFalse(self.api.get_breaker(u"/api/v1/courses").is_open())
+
+    def test_error_is_raised_after_last_retry(self):
+        self.resource.fail_with = [500, 500, 500]
+
+        with self.assertRaises(InstructureApiError) as context:
+            self.api.get_json(u"/api/v1/courses")
+        self.assertEqual(context.exception.status, 500)
+
+    def test_open_circuit_stops_requests(self):
+        self.resource.fail_with = [500, 500, 500]
+        with self.assertRaises(InstructureApiError):
+            self.api.get_json(u"/api/v1/courses")
+        self.assertTrue(self.api.get_breaker(u"/api/v1/courses").is_open())
+
+        # The endpoint is not contacted while the circuit is open
+        with self.assertRaises(InstructureApiError):
+            self.api.get_json(u"/api/v1/courses")
+        self.assertEqual(len(self.server.get_requests(u"/api/v1/courses")), 3)
+
+    def test_unexpected_error_of_trial_request_opens_circuit_again(self):
+        breaker = self.api.get_breaker(u"/api/v1/courses")
+        breaker.cooldown = 0.0
+        self.resource.fail_with = [500, 500, 500]
+        with self.assertRaises(InstructureApiError):
+            self.api.get_json(u"/api/v1/courses")
+
+        # The trial request fails with an error that is not retried
+        send = self.api._send
+
+        def fail(*args, **kwargs):
+            raise ValueError(u"Unexpected")
+        self.api._send = fail
+        with self.assertRaises(ValueError):
+            self.api.get_json(u"/api/v1/courses")
+        self.assertFalse(breaker.trial)
+
+        # The next trial request is let through and closes the circuit
+        self.api._send = send
+        self.assertEqual(self.api.get_json(u"/api/v1/courses"), [{u"id": 1}])
+        self.assertFalse(breaker.is_open())
+
+
+if __name__ == u"__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+CanvasSync by Mathias Perslev
+February 2017
+
+--------------------------------------------
+
+test_synchronizer.py, tests
+
+Tests of the incremental sync of the Synchronizer object, in particular that all courses are walked if the activity
+stream could not be downloaded, see Synchronizer.download_activity_stream.
+"""
+
+# Inbuilt modules
+import os
+import shutil
+import tempfile
+import unittest
+
+# CanvasSync modules
+from CanvasSync.entities.synchronizer import Synchronizer
+from CanvasSync.settings.settings import Settings
+from CanvasSync.utilities.instructure_api import InstructureApi
+from tests.fake_server import FakeServer, Resource, make_course_routes
+
+ACTIVITY_STREAM = u"/api/v1/users/self/activity_stream"
+
+
+class TestActivityStream(unittest.TestCase):
+    synchronizer_class = Synchronizer
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeServer().__enter__()
+        self.server.routes.update(make_course_routes(self.server.url, u"<p>No files</p>"))
+        self.server.routes[ACTIVITY_STREAM] = Resource.json([])
+
+    def tearDown(self):
+        self.server.__exit__()
+        shutil.rmtree(self.directory)
+
+    def sync(self):
+        """ Sync the course and return the Synchronizer object """
+        settings = Settings()
+        settings.sync_path = os.path.join(self.directory, u"sync")
+        settings.domain = self.server.url
+        settings.token = u"token"
+        settings.courses_to_sync = [u"Course"]
+        settings.sync_assignments = False
+        settings.cache_path = os.path.join(self.directory, u"cache")
+        settings.memo_size = 0
+        settings.incremental_sync = True
+
+        synchronizer = self.synchronizer_class(settings=settings, api=InstructureApi(settings))
+        synchronizer.sync()
+        return synchronizer
+
+    def assertFullWalk(self):
+        modules = len(self.server.get_requests(u"/api/v1/courses/1/modules"))
+        synchronizer = self.sync()
+
+        self.assertFalse(synchronizer.incremental)
+        self.assertGreater(len(self.server.get_requests(u"/api/v1/courses/1/modules")), modules)
+        self.assertEqual(synchronizer.get_failures(), [])
+
+    def test_unchanged_course_is_not_walked(self):
+        self.sync()
+        modules = len(self.server.get_requests(u"/api/v1/courses/1/modules"))
+
+        synchronizer = self.sync()
+
+        self.assertTrue(synchronizer.incremental)
+        self.assertEqual(len(self.server.get_requests(u"/api/v1/courses/1/modules")), modules)
+
+    def test_activity_stream_not_json_walks_all_courses(self):
+        self.sync()
+        self.server.routes[ACTIVITY_STREAM] = Resource(b"<html>Error</html>", content_type=u"text/html")
+
+        self.assertFullWalk()
+
+    def test_missing_activity_stream_walks_all_courses(self):
+        self.sync()
+        del self.server.routes[ACTIVITY_STREAM]
+
+        self.assertFullWalk()
+
+
+class TestActivityStreamAsync(TestActivityStream):
+    """ The same tests run with the asynchronous sync engine """
+    def setUp(self):
+        try:
+            from CanvasSync.entities.async_synchronizer import AsyncSynchronizer
+        except ImportError:
+            self.skipTest(u"The async engine requires aiohttp")
+        self.synchronizer_class = AsyncSynchronizer
+        TestActivityStream.setUp(self)
+
+
+if __name__ == u"__main__":
+    unittest.main()